@@ -0,0 +1,3 @@
+"""
+Benchmarks of the io, filter and analyze hot paths on synthetic recordings.
+"""
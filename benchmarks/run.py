@@ -0,0 +1,434 @@
+"""
+Timed scenarios of the hot paths over synthetic recordings.
+
+    python -m benchmarks.run -s 100 -s 1000 -o report.json
+    python -m benchmarks.run -s 100 -s 1000 --compare report.json
+"""
+from contextlib import contextmanager
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import coloredlogs
+import numpy as np
+
+from benchmarks.synthetic import (
+    synthetic_frames,
+    write_hdf5,
+    write_npy,
+    write_signal3,
+)
+
+logger = logging.getLogger(__name__)
+
+# scenario name -> (function, maximum number of frames by default, warm-up run)
+SCENARIOS = {}
+
+DEFAULT_SCALES = (100, 1000, 10000, 100000)
+
+# command line entry points timed by the startup scenario
+CLI_COMMANDS = (
+    ("neubio.cli.convert", ["--help"]),
+    ("neubio.cli.dataset", ["--help"]),
+    ("neubio.cli.dataset", ["regroup", "--help"]),
+    ("neubio.cli.analyze", ["--help"]),
+)
+# seconds per invocation, including interpreter startup
+STARTUP_BUDGET = 0.5
+# invocations of each command, whatever the scale
+STARTUP_REPEATS = 5
+
+
+def scenario(name, max_frames=None, warmup=True):
+    def register(func):
+        SCENARIOS[name] = (func, max_frames, warmup)
+        return func
+
+    return register
+
+
+class Workspace(object):
+    """
+    Synthetic datasets of a benchmark run, generated once per scale.
+
+    Args:
+        root (str): Working directory.
+        fs (float): Sampling frequency.
+        block_size (int): Maximum number of frames generated in memory at once.
+        seed (int): Random seed.
+    """
+
+    def __init__(self, root, fs, block_size=1000, seed=0):
+        self.root, self.fs, self.block_size, self.seed = root, fs, block_size, seed
+        self._files = {}
+
+    def blocks(self, n_frames, **kwargs):
+        """
+        Generate frames in blocks, so memory does not grow with the scale.
+        """
+        for i, start in enumerate(range(0, n_frames, self.block_size)):
+            n = min(self.block_size, n_frames - start)
+            yield synthetic_frames(n, fs=self.fs, seed=self.seed + i, **kwargs)
+
+    def _file(self, kind, n_frames, writer):
+        key = (kind, n_frames)
+        if key not in self._files:
+            path = os.path.join(self.root, "{}_{}.{}".format(kind, n_frames, kind))
+            logger.info('generating "{}"'.format(path))
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.unlink(path)
+            start = 1
+            for t, stimuli, response in self.blocks(n_frames):
+                writer(path, t, stimuli, response, start=start, mode="a")
+                start += len(response)
+            self._files[key] = path
+        return self._files[key]
+
+    def signal3(self, n_frames):
+        return self._file("txt", n_frames, write_signal3)
+
+    def hdf5(self, n_frames):
+        return self._file("h5", n_frames, write_hdf5)
+
+    def npy(self, n_frames):
+        return self._file("npy", n_frames, write_npy)
+
+
+class Stopwatch(object):
+    """
+    Accumulate wall time of the timed sections only.
+    """
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    @contextmanager
+    def __call__(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.elapsed += time.perf_counter() - t0
+
+
+def _preprocessed_blocks(ws, n_frames):
+    from neubio.filter import preprocess
+
+    for t, _, response in ws.blocks(n_frames):
+        yield preprocess(t, response, ws.fs, crop=(0.1, 0.15))
+
+
+@scenario("read_signal3", max_frames=10000)
+def bench_read_signal3(ws, n_frames, timer):
+    from neubio.cli.convert import read_signal3
+
+    path = ws.signal3(n_frames)
+    col_def = {"time": np.float32, "response": np.float32, "stimuli": np.float32}
+    with timer():
+        for _ in read_signal3(path, col_def):
+            pass
+
+
+@scenario("convert_npy", max_frames=10000)
+def bench_convert_npy(ws, n_frames, timer):
+    from neubio.cli.convert import iter_frame_batches, parse_signal3
+    from neubio.io import NpyFrameWriter
+
+    path = ws.signal3(n_frames)
+    with timer():
+        with NpyFrameWriter(os.path.join(ws.root, "convert.npy")) as fd:
+            for batch in iter_frame_batches(parse_signal3(path)):
+                fd.write_batch(*batch)
+
+
+@scenario("load_frame_group", max_frames=10000)
+def bench_load_frame_group(ws, n_frames, timer):
+    from neubio.io import load_frame_group
+
+    path = ws.hdf5(n_frames)
+    with timer():
+        load_frame_group(path)
+
+
+@scenario("load_npy_store")
+def bench_load_npy_store(ws, n_frames, timer):
+    from neubio.io import load_frame_group
+
+    path = ws.npy(n_frames)
+    with timer():
+        # touch every sample, memory-mapped reads are otherwise deferred
+        load_frame_group(path)[2].sum()
+
+
+@scenario("butter_lpf")
+def bench_butter_lpf(ws, n_frames, timer):
+    from neubio.filter import butter_lpf
+
+    for _, _, response in ws.blocks(n_frames):
+        with timer():
+            butter_lpf(response, 1e3, ws.fs)
+
+
+@scenario("find_epsp_peak", max_frames=10000)
+def bench_find_epsp_peak(ws, n_frames, timer):
+    from neubio.analyze import find_epsp_peak
+
+    for t, _, rec_filt in _preprocessed_blocks(ws, n_frames):
+        with timer():
+            for y in rec_filt:
+                try:
+                    find_epsp_peak(t, y)
+                except ValueError:
+                    pass
+
+
+@scenario("epsp_slope", max_frames=10000)
+def bench_epsp_slope(ws, n_frames, timer):
+    from neubio.analyze import batch_epsp_peak, epsp_slope
+
+    for t, rec, rec_filt in _preprocessed_blocks(ws, n_frames):
+        ipk, found = batch_epsp_peak(t, rec_filt)
+        with timer():
+            for y, i in zip(rec[found], ipk[found]):
+                try:
+                    epsp_slope(t, y, i)
+                except ValueError:
+                    pass
+
+
+@scenario("batch_epsp_peak")
+def bench_batch_epsp_peak(ws, n_frames, timer):
+    from neubio.analyze import batch_epsp_peak
+
+    for t, _, rec_filt in _preprocessed_blocks(ws, n_frames):
+        with timer():
+            batch_epsp_peak(t, rec_filt)
+
+
+@scenario("batch_epsp_slope")
+def bench_batch_epsp_slope(ws, n_frames, timer):
+    from neubio.analyze import batch_epsp_peak, batch_epsp_slope
+
+    for t, rec, rec_filt in _preprocessed_blocks(ws, n_frames):
+        ipk, _ = batch_epsp_peak(t, rec_filt)
+        with timer():
+            batch_epsp_slope(t, rec, ipk)
+
+
+@scenario("cli_startup", max_frames=100, warmup=False)
+def bench_cli_startup(ws, n_frames, timer):
+    """
+    Cycle `STARTUP_REPEATS` times through `CLI_COMMANDS`, the number of frames is not
+    used.
+
+    Returns:
+        (int): Number of invocations.
+    """
+    n = STARTUP_REPEATS * len(CLI_COMMANDS)
+    for i in range(n):
+        module, args = CLI_COMMANDS[i % len(CLI_COMMANDS)]
+        cmd = [sys.executable, "-c", "from {} import main; main()".format(module)]
+        with timer():
+            subprocess.run(cmd + args, check=True, stdout=subprocess.DEVNULL)
+    if timer.elapsed / n > STARTUP_BUDGET:
+        logger.warning(
+            "startup {:.3f}s exceeds the {:.3f}s budget".format(
+                timer.elapsed / n, STARTUP_BUDGET
+            )
+        )
+    return n
+
+
+@scenario("epsp_features")
+def bench_epsp_features(ws, n_frames, timer):
+    from neubio.analyze import epsp_features
+
+    for t, rec, rec_filt in _preprocessed_blocks(ws, n_frames):
+        with timer():
+            epsp_features(t, rec, yf=rec_filt)
+
+
+@scenario("detect_events")
+def bench_detect_events(ws, n_frames, timer):
+    from neubio.analyze import detect_events, event_template
+
+    template = event_template(ws.fs)
+    for t, _, response in ws.blocks(n_frames):
+        with timer():
+            detect_events(t, response, template)
+
+
+@scenario("pipeline_retune")
+def bench_pipeline_retune(ws, n_frames, timer):
+    """
+    Parameter changes of an evaluated pipeline, only downstream stages rerun.
+    """
+    from neubio.pipeline import epsp_pipeline
+
+    pipe = epsp_pipeline(ws.npy(n_frames), fs=ws.fs)
+    pipe["summary"]
+    for crop, r_min in (((0.1, 0.14), 0.7), ((0.1, 0.14), 0.8), ((0.1, 0.15), 0.8)):
+        with timer():
+            pipe.set(crop=crop, r_min=r_min)
+            pipe["summary"]
+
+
+def _metadata(fs):
+    import scipy
+
+    from neubio.analyze import get_backend
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "fs": fs,
+        "backend": get_backend(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare against a previous report.
+
+    Returns:
+        (list): (scenario, n_frames, ratio) of the regressed entries.
+    """
+    previous = {(r["scenario"], r["n_frames"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["scenario"], r["n_frames"]))
+        if old is None or r.get("seconds") is None or old.get("seconds") is None:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        status = "REGRESSED" if ratio > 1 + tolerance else "ok"
+        click.echo(
+            "{:<18} {:>7} {:>8.2f}x {}".format(
+                r["scenario"], r["n_frames"], ratio, status
+            )
+        )
+        if ratio > 1 + tolerance:
+            regressions.append((r["scenario"], r["n_frames"], ratio))
+    return regressions
+
+
+@click.command()
+@click.option(
+    "-s",
+    "--scale",
+    "scales",
+    type=int,
+    multiple=True,
+    help="Number of frames, repeatable. Default to 100 to 100k.",
+)
+@click.option(
+    "-b",
+    "--bench",
+    "names",
+    type=click.Choice(sorted(SCENARIOS)),
+    multiple=True,
+    help="Scenario to run, repeatable. Default to all.",
+)
+@click.option("--fs", type=float, default=10e3, show_default=True)
+@click.option(
+    "--full", is_flag=True, help="Run per-frame and io scenarios beyond 10k frames."
+)
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="JSON report.")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Previous JSON report to compare against.",
+)
+@click.option("--tolerance", type=float, default=0.2, show_default=True)
+@click.option("--workdir", type=click.Path(file_okay=False), help="Keep datasets here.")
+@click.option("-v", "--verbose", count=True)
+def main(scales, names, fs, full, output, baseline, tolerance, workdir, verbose):
+    """
+    Run benchmark scenarios and report the timings.
+    """
+    if verbose == 0:
+        verbose = "WARNING"
+    elif verbose == 1:
+        verbose = "INFO"
+    else:
+        verbose = "DEBUG"
+    coloredlogs.install(
+        level=verbose, fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S"
+    )
+    # per-frame logging in the library is not part of the measurement
+    if verbose != "DEBUG":
+        logging.getLogger("neubio").setLevel(logging.ERROR)
+
+    scales = scales or DEFAULT_SCALES
+    names = names or sorted(SCENARIOS)
+
+    root = workdir or tempfile.mkdtemp(prefix="neubio_bench_")
+    os.makedirs(root, exist_ok=True)
+    ws = Workspace(root, fs)
+
+    results, warm = [], set()
+    try:
+        for n_frames in scales:
+            for name in names:
+                func, max_frames, warmup = SCENARIOS[name]
+                entry = {"scenario": name, "n_frames": n_frames, "seconds": None}
+                if not full and max_frames is not None and n_frames > max_frames:
+                    entry["skipped"] = "exceeds {} frames, use --full".format(
+                        max_frames
+                    )
+                    results.append(entry)
+                    continue
+
+                if warmup and name not in warm:
+                    # lazy imports and JIT compilation stay out of the timings, so
+                    # they do not depend on the scenarios run before
+                    func(ws, 1, Stopwatch())
+                    warm.add(name)
+                timer = Stopwatch()
+                # scenarios not sized by the scale return their own count
+                n_units = func(ws, n_frames, timer) or n_frames
+                entry.update(
+                    {
+                        "seconds": timer.elapsed,
+                        "us_per_frame": 1e6 * timer.elapsed / n_units,
+                        "frames_per_second": n_units / timer.elapsed,
+                    }
+                )
+                results.append(entry)
+                click.echo(
+                    "{:<18} {:>7} {:>10.4f}s {:>10.1f}us/frame".format(
+                        name, n_frames, timer.elapsed, entry["us_per_frame"]
+                    )
+                )
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {"meta": _metadata(fs), "results": results}
+    if output:
+        with open(output, "w") as fd:
+            json.dump(report, fd, indent=2)
+
+    if baseline:
+        with open(baseline, "r") as fd:
+            baseline = json.load(fd)
+        if compare(results, baseline, tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
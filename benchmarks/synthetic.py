@@ -0,0 +1,142 @@
+"""
+Synthetic EPSP recordings in Signal3 ASCII and HDF5 format.
+"""
+import logging
+
+import numpy as np
+
+__all__ = ["synthetic_frames", "write_hdf5", "write_npy", "write_signal3"]
+
+logger = logging.getLogger(__name__)
+
+
+def _epsp_kernel(t, tau_rise=0.002, tau_decay=0.01):
+    """
+    Normalized difference-of-exponentials EPSP waveform.
+    """
+    t = np.maximum(t, 0)
+    y = np.exp(-t / tau_decay) - np.exp(-t / tau_rise)
+    return y / y.max()
+
+
+def synthetic_frames(
+    n_frames,
+    fs=10e3,
+    duration=0.2,
+    onsets=(0.1,),
+    latency=0.002,
+    amplitude=-0.8,
+    amplitude_cv=0.2,
+    facilitation=1.2,
+    noise=0.02,
+    artifact=0.4,
+    artifact_width=0.0005,
+    line_noise=0.01,
+    line_freq=60.0,
+    seed=None,
+):
+    """
+    Generate EPSP recordings.
+
+    Args:
+        n_frames (int): Number of frames.
+        fs (float, optional): Sampling frequency.
+        duration (float, optional): Duration of each frame.
+        onsets (tuple, optional): Stimulus onsets, more than one for paired pulses.
+        latency (float, optional): Delay between stimulus and EPSP onset.
+        amplitude (float, optional): Mean EPSP amplitude of the first pulse.
+        amplitude_cv (float, optional): Coefficient of variation of the amplitude.
+        facilitation (float, optional): Amplitude ratio between consecutive pulses.
+        noise (float, optional): Standard deviation of the white noise.
+        artifact (float, optional): Stimulus artifact amplitude.
+        artifact_width (float, optional): Stimulus artifact duration.
+        line_noise (float, optional): Amplitude of the AC line noise.
+        line_freq (float, optional): Frequency of the AC line noise.
+        seed (int, optional): Random seed.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel.
+            response (ndarray): Recordings, shape (n_frames, n_samples).
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * fs)) / fs
+
+    stimuli = np.zeros_like(t)
+    response = noise * rng.standard_normal((n_frames, len(t)))
+    for k, onset in enumerate(onsets):
+        stimuli[(t >= onset) & (t < onset + artifact_width)] = 5.0
+
+        mean = amplitude * facilitation**k
+        amp = mean * (1 + amplitude_cv * rng.standard_normal((n_frames, 1)))
+        response += amp * _epsp_kernel(t - onset - latency)
+        response[:, (t >= onset) & (t < onset + artifact_width)] += artifact
+
+    phase = rng.uniform(0, 2 * np.pi, (n_frames, 1))
+    response += line_noise * np.sin(2 * np.pi * line_freq * t + phase)
+
+    return t.astype(np.float32), stimuli.astype(np.float32), response.astype(np.float32)
+
+
+def write_signal3(path, t, stimuli, response, start=1, name="synthetic.cfs", mode="w"):
+    """
+    Write recordings as a Signal3 exported ASCII file.
+
+    Args:
+        path (str): Output path.
+        t (ndarray): Timestamps.
+        stimuli (ndarray): Stimuli channel.
+        response (ndarray): Recordings, shape (n_frames, n_samples).
+        start (int, optional): Number of the first frame.
+        name (str, optional): Source file name in the frame headers.
+        mode (str, optional): File mode, "a" to append frames.
+    """
+    with open(path, mode) as fd:
+        for i, frame in enumerate(response):
+            fd.write('"{}","Frame {}"\n'.format(name, start + i))
+            fd.write('"Time","Response","Stimuli"\n')
+            data = np.column_stack([t, frame, stimuli])
+            np.savetxt(fd, data, fmt="%.6g", delimiter=",")
+            fd.write("\n")
+
+
+def write_hdf5(path, t, stimuli, response, start=1, mode="w"):
+    """
+    Write recordings as the HDF5 layout produced by `convert`.
+
+    Args:
+        path (str): Output path.
+        t (ndarray): Timestamps.
+        stimuli (ndarray): Stimuli channel.
+        response (ndarray): Recordings, shape (n_frames, n_samples).
+        start (int, optional): Number of the first frame.
+        mode (str, optional): File mode, "a" to append frames.
+    """
+    import pandas as pd
+
+    from neubio.cli.convert import write_frame
+
+    with pd.HDFStore(path, mode=mode) as fd:
+        for i, frame in enumerate(response):
+            df = pd.DataFrame({"time": t, "response": frame, "stimuli": stimuli})
+            write_frame(fd, start + i, df)
+
+
+def write_npy(path, t, stimuli, response, start=1, mode="w"):
+    """
+    Write recordings as a memory-mapped `.npy` directory store.
+
+    Args:
+        path (str): Output directory.
+        t (ndarray): Timestamps.
+        stimuli (ndarray): Stimuli channel.
+        response (ndarray): Recordings, shape (n_frames, n_samples).
+        start (int, optional): Number of the first frame.
+        mode (str, optional): Store mode, "a" to append frames.
+    """
+    from neubio.io import NpyFrameWriter
+
+    with NpyFrameWriter(path, mode=mode) as fd:
+        for i, frame in enumerate(response):
+            fd.write(start + i, t, stimuli, frame)
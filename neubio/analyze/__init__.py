@@ -0,0 +1,22 @@
+from . import average, chunked, epsp, events, kernels, monitor, parallel, quantal, train
+from .average import *
+from .chunked import *
+from .epsp import *
+from .events import *
+from .kernels import *
+from .monitor import *
+from .parallel import *
+from .quantal import *
+from .train import *
+
+__all__ = (
+    average.__all__
+    + chunked.__all__
+    + epsp.__all__
+    + events.__all__
+    + kernels.__all__
+    + monitor.__all__
+    + parallel.__all__
+    + quantal.__all__
+    + train.__all__
+)
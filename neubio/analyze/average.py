@@ -0,0 +1,201 @@
+"""
+Streaming trial averages, frames are accumulated block by block in constant memory.
+
+    averager = TraceAverager(trim=0.1)
+    for t, stimuli, rec, frames in iter_frame_blocks("trial_1.h5", (1, 10000)):
+        averager.update(rec)
+    avg = averager.result()
+    plt.fill_between(t, avg.mean - avg.sem, avg.mean + avg.sem)
+"""
+from collections import namedtuple
+import logging
+
+import numpy as np
+
+from ..instrument import instrument
+from ..io import iter_frame_blocks
+from .monitor import RunningStats
+
+__all__ = ["AverageTrace", "TraceAverager", "average_frames"]
+
+logger = logging.getLogger(__name__)
+
+AverageTrace = namedtuple(
+    "AverageTrace", ["n", "mean", "std", "sem", "trimmed", "median"]
+)
+
+
+class TraceAverager(object):
+    """
+    Running mean, variance, trimmed mean and median of recordings.
+
+    Mean and variance are exact, merged block by block in double precision. Trimmed
+    mean and median are resolved from per-sample histograms, with bin ranges set by
+    the first block, values out of the range are gathered in the edge bins. The median
+    is interpolated within its bin, partially trimmed bins contribute in proportion to
+    their kept counts.
+
+    Args:
+        trim (float, optional): Fraction trimmed from each end for the trimmed mean.
+        bins (int, optional): Histogram bins per sample.
+        margin (float, optional): Extension of the first block span on each side, as a
+            fraction of the span.
+    """
+
+    def __init__(self, trim=0.1, bins=128, margin=0.5):
+        if not 0 <= trim < 0.5:
+            raise ValueError("trim fraction should be in [0, 0.5)")
+        self.trim, self.bins, self.margin = trim, bins, margin
+
+        self._stats = None
+        self._lo, self._width = None, None
+        self._counts, self._sums = None, None
+
+    @property
+    def n(self):
+        return 0 if self._stats is None else self._stats.n
+
+    def _init_bins(self, x):
+        lo, hi = x.min(axis=0), x.max(axis=0)
+        span = hi - lo
+        # a single frame, or a flat sample, has no spread to size the bins
+        floor = np.median(span)
+        if floor <= 0:
+            floor = np.ptp(x) or 1.0
+        span = np.maximum(span, floor)
+
+        self._lo = lo - self.margin * span
+        self._width = (1 + 2 * self.margin) * span / self.bins
+        self._counts = np.zeros((x.shape[1], self.bins), dtype=np.int64)
+        self._sums = np.zeros((x.shape[1], self.bins), dtype=np.float64)
+        self._stats = RunningStats(shape=(x.shape[1],))
+
+    @instrument("average")
+    def update(self, x):
+        """
+        Accumulate a block of recordings.
+
+        Args:
+            x (ndarray): A recording, or recordings stacked on the first axis.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        x = x.reshape(-1, x.shape[-1])
+        if x.shape[0] == 0:
+            return
+        if self._stats is None:
+            self._init_bins(x)
+        elif x.shape[1] != self._counts.shape[0]:
+            raise ValueError(
+                "expecting {} samples per recording, got {}".format(
+                    self._counts.shape[0], x.shape[1]
+                )
+            )
+
+        self._stats.add_batch(x)
+
+        # flat (sample, bin) index to accumulate every sample in one pass
+        k = np.floor((x - self._lo) / self._width)
+        k = np.clip(k, 0, self.bins - 1).astype(np.intp)
+        k += np.arange(x.shape[1]) * self.bins
+        size = self._counts.size
+        self._counts += np.bincount(k.ravel(), minlength=size).reshape(
+            self._counts.shape
+        )
+        self._sums += np.bincount(k.ravel(), weights=x.ravel(), minlength=size).reshape(
+            self._sums.shape
+        )
+
+    def quantile(self, q):
+        """
+        Approximate quantile of each sample.
+
+        Args:
+            q (float): Quantile in [0, 1].
+        """
+        if self.n == 0:
+            raise ValueError("no recording accumulated")
+        cum = np.cumsum(self._counts, axis=1)
+        target = q * self.n
+        k = np.argmax(cum >= max(target, 1e-12), axis=1)
+
+        rows = np.arange(len(k))
+        below = cum[rows, k] - self._counts[rows, k]
+        frac = (target - below) / np.maximum(self._counts[rows, k], 1)
+        return self._lo + self._width * (k + np.clip(frac, 0, 1))
+
+    def trimmed_mean(self, trim=None):
+        """
+        Approximate mean of each sample after trimming both ends.
+
+        Args:
+            trim (float, optional): Fraction trimmed from each end, default to the
+                fraction given on construction.
+        """
+        if self.n == 0:
+            raise ValueError("no recording accumulated")
+        if trim is None:
+            trim = self.trim
+        if trim == 0:
+            return self._stats.mean
+
+        lower, upper = trim * self.n, (1 - trim) * self.n
+        cum = np.cumsum(self._counts, axis=1)
+        below = cum - self._counts
+        kept = np.clip(np.minimum(cum, upper) - np.maximum(below, lower), 0, None)
+        frac = kept / np.maximum(self._counts, 1)
+        return (frac * self._sums).sum(axis=1) / (upper - lower)
+
+    def result(self):
+        """
+        Averaged trace.
+
+        Returns:
+            (AverageTrace): Number of recordings, mean, sample standard deviation,
+                standard error of the mean, trimmed mean and median of each sample.
+        """
+        if self.n == 0:
+            raise ValueError("no recording accumulated")
+        std = self._stats.std
+        return AverageTrace(
+            self.n,
+            self._stats.mean,
+            std,
+            std / np.sqrt(self.n),
+            self.trimmed_mean(),
+            self.quantile(0.5),
+        )
+
+
+def average_frames(
+    path, index=None, trim=0.1, bins=128, block_size=256, group="/_frames", qc=False
+):
+    """
+    Average a frame range streamed from storage.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        trim (float, optional): Fraction trimmed from each end for the trimmed mean.
+        bins (int, optional): Histogram bins per sample.
+        block_size (int, optional): Number of frames loaded at once.
+        group (str, optional): Frame group, HDF5 only.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel of the first frame.
+            avg (AverageTrace): Averaged recordings.
+    """
+    averager = TraceAverager(trim=trim, bins=bins)
+    t, stimuli = None, None
+    for t, stimuli_, rec, _ in iter_frame_blocks(
+        path, index, block_size=block_size, group=group, qc=qc
+    ):
+        if stimuli is None:
+            stimuli = stimuli_
+        averager.update(rec)
+    if averager.n == 0:
+        raise ValueError("no frame to average")
+    logger.info("{} frames averaged".format(averager.n))
+    return t, stimuli, averager.result()
@@ -0,0 +1,213 @@
+"""
+Out-of-core execution of the EPSP pipeline, frames are streamed from storage in blocks
+of bounded size.
+"""
+import logging
+import os
+
+import numpy as np
+
+from ..filter import _artifact_segments, ac_notch, preprocess, remove_artifact
+from ..io import PREFETCH_DEPTH, _open_matrix_store, iter_frame_blocks
+from ..precision import is_single
+from .epsp import EPSPFeatures, epsp_features
+from .train import detect_onsets
+
+__all__ = [
+    "analyze_chunked",
+    "frames_per_block",
+    "iter_features",
+    "iter_preprocessed",
+]
+
+logger = logging.getLogger(__name__)
+
+# peak working set of the filter and feature stages per raw sample with float64
+# intermediates, half of it when recordings are kept in float32, see `neubio.precision`
+BYTES_PER_SAMPLE = 64
+
+
+def _n_samples(path, group="/_frames"):
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            # the time vector is written along with the first frame
+            if fd.time is None:
+                raise ValueError('no frame in "{}"'.format(path))
+            return len(fd.time)
+
+    import pandas as pd
+
+    with pd.HDFStore(path, mode="r") as fd:
+        _, _, keys = next(fd.walk(group))
+        if not keys:
+            raise ValueError('no frame in "{}"'.format(path))
+        return len(fd.get("{}/{}".format(group, min(keys, key=int))))
+
+
+def frames_per_block(n_samples, max_memory):
+    """
+    Number of frames processed at once within a memory budget.
+
+    Args:
+        n_samples (int): Samples per frame.
+        max_memory (int): Memory budget in bytes.
+    """
+    bytes_per_sample = BYTES_PER_SAMPLE // 2 if is_single() else BYTES_PER_SAMPLE
+    return max(int(max_memory // (bytes_per_sample * n_samples)), 1)
+
+
+def _estimate_template(path, index, block_size, qc, prefetch, width):
+    """
+    Stimulus onsets and artifact template over a frame range, onsets are detected on
+    the first block with a stimulus.
+    """
+    onsets, segments = None, []
+    for t, stimuli, rec, _ in iter_frame_blocks(
+        path, index, block_size=block_size, qc=qc, prefetch=prefetch
+    ):
+        if stimuli.max() > 0:
+            if onsets is None:
+                onsets = detect_onsets(t, stimuli)
+            segments.append(_artifact_segments(t, rec, onsets, width=width))
+    if onsets is None:
+        return None, None
+    return onsets, np.median(np.concatenate(segments), axis=0)
+
+
+def iter_preprocessed(
+    path,
+    index=None,
+    fs=10e3,
+    lo_cutoff=1e3,
+    crop=None,
+    tmax=0.1,
+    notch=None,
+    artifact=None,
+    artifact_width=0.002,
+    qc=False,
+    max_memory=256 << 20,
+    prefetch=PREFETCH_DEPTH,
+):
+    """
+    Stream a frame range through the filter stages block by block.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        fs (float, optional): Sampling frequency.
+        lo_cutoff (float, optional): LPF cutoff frequency.
+        crop (tuple, optional): Timestamp range to keep.
+        tmax (float, optional): Delay till the stimulus occur.
+        notch (float, optional): AC frequency to remove before other filters.
+        artifact (str, optional): Stimulus artifact removal method, see
+            `remove_artifact`. The template is estimated over the whole range in a
+            first pass, as when the range is loaded at once.
+        artifact_width (float, optional): Duration of the stimulus artifact.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        max_memory (int, optional): Memory budget of a block in bytes, raw blocks
+            read ahead are not accounted for.
+        prefetch (int, optional): Number of blocks read ahead while the current one
+            is processed.
+
+    Yields:
+        :rtype: (ndarray, ndarray, ndarray, ndarray, ndarray): Timestamps, stimuli
+            channel, baseline subtracted recordings, their filtered counterpart and
+            frame numbers of a block.
+    """
+    block_size = frames_per_block(_n_samples(path), max_memory)
+    logger.info("{} frames per block".format(block_size))
+
+    onsets, template = None, None
+    if artifact == "template":
+        onsets, template = _estimate_template(
+            path, index, block_size, qc, prefetch, artifact_width
+        )
+    for t, stimuli, rec, frames in iter_frame_blocks(
+        path, index, block_size=block_size, qc=qc, prefetch=prefetch
+    ):
+        if artifact and stimuli.max() > 0:
+            if onsets is None:
+                onsets = detect_onsets(t, stimuli)
+            rec = remove_artifact(
+                t,
+                rec,
+                onsets,
+                width=artifact_width,
+                method=artifact,
+                template=template,
+            )
+        if notch:
+            rec = ac_notch(rec, fs, f0=notch)
+        t_, rec, rec_filt = preprocess(
+            t, rec, fs, lo_cutoff=lo_cutoff, crop=crop, tmax=tmax
+        )
+        yield t_, stimuli, rec, rec_filt, frames
+
+
+def iter_features(path, index=None, crop=(0.1, 0.15), delay=0.005, pct=0.2, **kwargs):
+    """
+    Extract per-frame EPSP features block by block.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        crop (tuple, optional): Timestamp range containing the EPSP.
+        delay (float, optional): EPSP search range delay.
+        pct (float, optional): Intensity single-sided windowing percentage.
+        **kwargs: Passed to `iter_preprocessed`.
+
+    Yields:
+        :rtype: (ndarray, EPSPFeatures): Frame numbers and features of a block.
+    """
+    for t, _, rec, rec_filt, frames in iter_preprocessed(
+        path, index=index, crop=crop, **kwargs
+    ):
+        yield frames, epsp_features(t, rec, yf=rec_filt, delay=delay, pct=pct)
+
+
+def analyze_chunked(path, output=None, index=None, **kwargs):
+    """
+    Extract per-frame EPSP features of recordings larger than memory.
+
+    Results are written after every block when `output` is given, peak memory is
+    bound by `max_memory` regardless of the number of frames.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        output (str, optional): Result table, CSV or HDF5 (.h5) by extension.
+        index (tuple, optional): Frame range (start, end).
+        **kwargs: Passed to `iter_features`.
+
+    Returns:
+        (tuple): tuple containing:
+            frames (ndarray): Frame numbers, None if written to `output`.
+            features (EPSPFeatures): Per-frame features, None if written to `output`.
+    """
+    blocks = iter_features(path, index=index, **kwargs)
+    if output is None:
+        frames, features = [], []
+        for frames_, features_ in blocks:
+            frames.append(frames_)
+            features.append(features_)
+        if not frames:
+            raise ValueError("no frame to analyze")
+        return np.concatenate(frames), EPSPFeatures(
+            *(np.concatenate(field) for field in zip(*features))
+        )
+
+    import pandas as pd
+
+    hdf5 = os.path.splitext(output)[1].lower() in (".h5", ".hdf5")
+    if os.path.exists(output):
+        os.unlink(output)
+    n_frames = 0
+    for frames, features in blocks:
+        table = pd.DataFrame({"frame": frames, **features._asdict()})
+        if hdf5:
+            table.to_hdf(output, key="results", format="table", append=True)
+        else:
+            table.to_csv(output, mode="a", header=n_frames == 0, index=False)
+        n_frames += len(frames)
+        logger.info("{} frames written".format(n_frames))
+    return None, None
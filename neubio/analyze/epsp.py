@@ -0,0 +1,297 @@
+from collections import namedtuple
+import logging
+
+import numpy as np
+
+from ..instrument import instrument
+from ..precision import row_blocks
+from . import kernels
+
+__all__ = [
+    "EPSPFeatures",
+    "batch_epsp_peak",
+    "batch_epsp_slope",
+    "epsp_features",
+    "epsp_slope",
+    "find_epsp_peak",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def _find_nearest_index(y, y0, ipk):
+    """
+    Use zero crossing detector to find the closest y.
+
+    Args:
+        y (ndarray): Recordings.
+        y0 (float): Cross over threshold.
+        ipk (int): Index of the peak.
+    """
+    iz = np.where(np.diff(np.sign(y - y0)))[0]
+    iiz = np.argmin(np.abs(iz - ipk))
+    return iz[iiz]
+
+
+def _estimate_ts(t):
+    """
+    Estimate sampling interval.
+
+    Args:
+        t (ndarray): Timestamps.
+    """
+    dt = t[1:] - t[:-1]
+    return np.mean(dt)
+
+
+@instrument("peak")
+def find_epsp_peak(t, y, delay=0.005):
+    """
+    Find EPSP peak location.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings.
+        delay (float, optional): EPSP search range delay.
+    """
+    from scipy.signal import find_peaks
+
+    # convert to unit samples
+    ts = _estimate_ts(t)
+    logger.debug("estimated sampling interval {:.4E}s".format(ts))
+
+    if np.abs(y.max()) < np.abs(y.min()):
+        logger.debug("search in reversed polarity")
+        y = -y
+
+    # ignore delay
+    delay = int(delay / ts)
+
+    # peak height must over 3*std (99%)
+    ystd = np.std(y[delay:])
+    h = 2 * ystd
+
+    peaks, props = find_peaks(y[delay:], height=h)
+    peaks += delay
+
+    # identify candidate
+    if len(peaks) > 1:
+        logger.warning("multiple candidates found, use the first one")
+        return peaks[0], {k: v[0] for k, v in props.items()}
+    elif len(peaks) == 1:
+        return peaks[0], props
+    else:
+        raise ValueError("unable to find an EPSP signature")
+
+
+@instrument("slope")
+def epsp_slope(t, y, ip, pct=0.2, yf=None, return_pos=False):
+    """
+    Find EPSP slope.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings.
+        ip (ndarray): EPSP peak index.
+        pct (float): Intensity single-sided windowing percentage.
+        yf (ndarray, optional): Filtered recordings.
+        return_pos (bool, optional): Return slope extraction details.
+    """
+    from scipy.stats import linregress
+
+    if yf is None:
+        yf = y
+
+    ypeak = y[ip]
+    ymin, ymax = pct * ypeak, (1 - pct) * ypeak
+    logger.debug("intensity window [{:.4E}, {:.4E}]".format(ymin, ymax))
+
+    imin, imax = (
+        _find_nearest_index(y[:ip], ymin, ip),
+        _find_nearest_index(y[:ip], ymax, ip),
+    )
+
+    logger.debug("linreg over @[{}, {}]".format(imin, imax))
+
+    t, y = t[imin : imax + 1], y[imin : imax + 1]
+    slope, _, r, _, _ = linregress(t, y)
+    logger.debug("slope={:4f}, r={:.4f}".format(slope, r))
+
+    if return_pos:
+        return slope, r, (t[0], t[-1]), (y[0], y[-1])
+    else:
+        return slope, r
+
+
+@instrument("peak")
+def batch_epsp_peak(t, y, delay=0.005):
+    """
+    Find EPSP peak location for a batch of recordings.
+
+    Vectorized counterpart of `find_epsp_peak`, the first local maximum over 2*std
+    after the delay is selected for every recording.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings, time on the last axis.
+        delay (float, optional): EPSP search range delay.
+
+    Returns:
+        (tuple): tuple containing:
+            ipk (ndarray): Index of the peak, -1 if not found.
+            valid (ndarray): True if an EPSP signature is found.
+    """
+    ts = _estimate_ts(t)
+    logger.debug("estimated sampling interval {:.4E}s".format(ts))
+
+    y = np.asarray(y)
+    reverse = np.abs(y.max(axis=-1)) < np.abs(y.min(axis=-1))
+    y = np.where(reverse[..., np.newaxis], -y, y)
+
+    # ignore delay
+    delay = int(delay / ts)
+    y = y[..., delay:]
+
+    h = 2 * np.std(y, axis=-1, keepdims=True)
+
+    # slope sign towards the next sample, flat segments take the sign of the next
+    # non-flat one, so plateaus resolve to their leading edge
+    s = np.sign(np.diff(y, axis=-1))
+    n = s.shape[-1]
+    inz = np.where(s != 0, np.arange(n), n - 1)
+    inz = np.flip(np.minimum.accumulate(np.flip(inz, axis=-1), axis=-1), axis=-1)
+    s_next = np.take_along_axis(s, inz, axis=-1)
+
+    is_peak = (s[..., :-1] > 0) & (s_next[..., 1:] < 0) & (y[..., 1:-1] >= h)
+    valid = is_peak.any(axis=-1)
+    ipk = np.argmax(is_peak, axis=-1) + 1 + delay
+    ipk = np.where(valid, ipk, -1)
+
+    logger.debug("{} of {} EPSP found".format(np.count_nonzero(valid), valid.size))
+    return ipk, valid
+
+
+def _last_crossing(y, y0, ipk):
+    """
+    Vectorized `_find_nearest_index`, locate the last crossing before the peak.
+
+    Args:
+        y (ndarray): Recordings, time on the last axis.
+        y0 (ndarray): Cross over threshold of each recording.
+        ipk (ndarray): Index of the peak of each recording.
+    """
+    s = np.sign(y - y0[..., np.newaxis])
+    iz = np.diff(s, axis=-1) != 0
+    n = iz.shape[-1]
+    # only y[:ipk] is searched
+    iz &= np.arange(n) < (ipk[..., np.newaxis] - 1)
+    found = iz.any(axis=-1)
+    i = (n - 1) - np.argmax(np.flip(iz, axis=-1), axis=-1)
+    return np.where(found, i, 0), found
+
+
+@instrument("slope")
+def batch_epsp_slope(t, y, ipk, pct=0.2):
+    """
+    Find EPSP slope for a batch of recordings.
+
+    Vectorized counterpart of `epsp_slope`, the linear regression is evaluated over
+    a per-recording window mask instead of a loop.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings, time on the last axis.
+        ipk (ndarray): EPSP peak index of each recording.
+        pct (float): Intensity single-sided windowing percentage.
+
+    Returns:
+        (tuple): tuple containing:
+            slope (ndarray): Slope of each recording, NaN if invalid.
+            r (ndarray): Correlation coefficient, NaN if invalid.
+            window (tuple): Index range (imin, imax) of the regression.
+            valid (ndarray): True if the regression window is well defined.
+    """
+    y = np.asarray(y)
+    ipk = np.asarray(ipk)
+    found = ipk > 0
+    ipk = np.where(found, ipk, 0)
+
+    ypeak = np.take_along_axis(y, ipk[..., np.newaxis], axis=-1)[..., 0]
+    ymin, ymax = pct * ypeak, (1 - pct) * ypeak
+
+    imin, found_min = _last_crossing(y, ymin, ipk)
+    imax, found_max = _last_crossing(y, ymax, ipk)
+    valid = found & found_min & found_max & (imax > imin)
+
+    # linreg over [imin, imax], accumulated in double precision over row blocks
+    t = np.asarray(t, dtype=np.float64)
+    slope, r = np.empty((2, int(np.prod(y.shape[:-1]))), dtype=np.float64)
+    for block in row_blocks(y.shape):
+        slope[block], r[block] = _linreg(
+            t,
+            y.reshape(-1, y.shape[-1])[block],
+            imin.reshape(-1)[block],
+            imax.reshape(-1)[block],
+        )
+    slope = np.where(valid, slope.reshape(y.shape[:-1]), np.nan)
+    r = np.where(valid, r.reshape(y.shape[:-1]), np.nan)
+
+    return slope, r, (imin, imax), valid
+
+
+def _linreg(t, y, imin, imax):
+    """
+    Slope and correlation coefficient of each recording over [imin, imax].
+    """
+    i = np.arange(y.shape[-1])
+    w = (i >= imin[..., np.newaxis]) & (i <= imax[..., np.newaxis])
+    w = w.astype(np.float64)
+    n = np.maximum(w.sum(axis=-1, keepdims=True), 1)
+    tm = (w * t).sum(axis=-1, keepdims=True) / n
+    ym = (w * y).sum(axis=-1, keepdims=True) / n
+    dt, dy = w * (t - tm), w * (y - ym)
+    sxx, syy, sxy = (
+        (dt * dt).sum(axis=-1),
+        (dy * dy).sum(axis=-1),
+        (dt * dy).sum(axis=-1),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sxy / sxx, sxy / np.sqrt(sxx * syy)
+
+
+EPSPFeatures = namedtuple("EPSPFeatures", ["peak", "amplitude", "slope", "r", "valid"])
+
+
+def epsp_features(t, y, yf=None, delay=0.005, pct=0.2):
+    """
+    Extract EPSP peak, amplitude and slope for a batch of recordings.
+
+    The compiled kernels are used when the "numba" backend is active, see
+    `neubio.analyze.kernels`.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings, time on the last axis.
+        yf (ndarray, optional): Filtered recordings, used to locate the peak.
+        delay (float, optional): EPSP search range delay.
+        pct (float): Intensity single-sided windowing percentage.
+
+    Returns:
+        (EPSPFeatures): Per-recording features, amplitude is sampled from the raw
+            recordings. Invalid entries are NaN.
+    """
+    if yf is None:
+        yf = y
+    y = np.asarray(y)
+
+    if kernels.get_backend() == "numba":
+        delay = int(delay / _estimate_ts(t))
+        return EPSPFeatures(*kernels.fused_features(t, y, np.asarray(yf), delay, pct))
+
+    ipk, found = batch_epsp_peak(t, yf, delay=delay)
+    slope, r, _, valid = batch_epsp_slope(t, y, ipk, pct=pct)
+
+    amp = np.take_along_axis(y, np.maximum(ipk, 0)[..., np.newaxis], axis=-1)[..., 0]
+    amp = np.where(found, amp, np.nan)
+
+    return EPSPFeatures(ipk, amp, slope, r, valid)
@@ -0,0 +1,347 @@
+"""
+Template matching detector of spontaneous events, e.g. miniature EPSPs.
+
+Events are located by the optimally scaled template criterion of Clements and Bekkers
+(1997), the sliding template correlation is evaluated by overlap-save FFT so the cost
+grows linearly with the trace length.
+
+    template = event_template(fs=10e3)
+    events = detect_events(t, rec, template, threshold=4)
+"""
+from collections import namedtuple
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..instrument import instrument
+from ..io import iter_frame_blocks
+
+__all__ = [
+    "Events",
+    "detect_events",
+    "detection_criterion",
+    "event_template",
+    "scan_events",
+]
+
+logger = logging.getLogger(__name__)
+
+Events = namedtuple(
+    "Events", ["frame", "index", "time", "amplitude", "criterion", "rise", "decay"]
+)
+
+# samples per FFT batch, bounds the working set of the correlation
+_BATCH_SAMPLES = 1 << 22
+# criterion positions evaluated at once across rows
+_BLOCK_SAMPLES = 1 << 20
+# width of the moving average the kinetics are measured on
+_SMOOTH_SAMPLES = 3
+
+
+def event_template(fs, tau_rise=0.5e-3, tau_decay=3e-3, duration=None, sign=-1):
+    """
+    Biexponential event waveform with unit peak.
+
+    Args:
+        fs (float): Sampling frequency.
+        tau_rise (float, optional): Rise time constant.
+        tau_decay (float, optional): Decay time constant.
+        duration (float, optional): Template length, default to 5 decay constants.
+        sign (int, optional): Polarity of the events.
+    """
+    if tau_rise >= tau_decay:
+        raise ValueError("rise time constant should be shorter than the decay")
+    if duration is None:
+        duration = 5 * tau_decay
+    t = np.arange(int(round(duration * fs))) / fs
+    y = np.exp(-t / tau_decay) - np.exp(-t / tau_rise)
+    return sign * y / y.max()
+
+
+def _correlate(y, template, nfft):
+    """
+    Sliding dot product of `template` over the last axis of `y`, overlap-save.
+    """
+    n, m = y.shape[-1], len(template)
+    n_valid = n - m + 1
+    step = nfft - m + 1
+    n_blocks = -(-n_valid // step)
+
+    pad = (n_blocks - 1) * step + nfft - n
+    y = np.concatenate([y, np.zeros(y.shape[:-1] + (pad,))], axis=-1)
+    blocks = sliding_window_view(y, nfft, axis=-1)[..., ::step, :]
+
+    h = np.conj(np.fft.rfft(template, nfft))
+    out = np.empty(y.shape[:-1] + (n_blocks, step))
+    batch = max(_BATCH_SAMPLES // (nfft * max(int(np.prod(y.shape[:-1])), 1)), 1)
+    for i in range(0, n_blocks, batch):
+        c = np.fft.irfft(np.fft.rfft(blocks[..., i : i + batch, :]) * h, nfft)
+        out[..., i : i + batch, :] = c[..., :step]
+    return out.reshape(y.shape[:-1] + (-1,))[..., :n_valid]
+
+
+def _running_sum(y, m):
+    s = np.cumsum(y, axis=-1)
+    s = np.concatenate([np.zeros(s.shape[:-1] + (1,)), s], axis=-1)
+    return s[..., m:] - s[..., :-m]
+
+
+def detection_criterion(y, template, nfft=None):
+    """
+    Optimally scaled template criterion at every template position.
+
+    Args:
+        y (ndarray): Recordings, time on the last axis.
+        template (ndarray): Event waveform.
+        nfft (int, optional): FFT block size, a power of 2 covering 8 templates by
+            default.
+
+    Returns:
+        (tuple): tuple containing:
+            criterion (ndarray): Template scale over its standard error.
+            scale (ndarray): Least-squares template scale.
+            offset (ndarray): Least-squares baseline offset.
+    """
+    template = np.asarray(template, dtype=np.float64)
+    m = len(template)
+    y = np.asarray(y, dtype=np.float64)
+    if y.shape[-1] < m:
+        raise ValueError("recording is shorter than the template")
+    # running sums lose precision on large offsets
+    y = y - y.mean(axis=-1, keepdims=True)
+
+    if nfft is None:
+        nfft = max(1 << int(np.ceil(np.log2(8 * m))), 1024)
+        nfft = min(nfft, 1 << int(np.ceil(np.log2(y.shape[-1]))))
+    if nfft < m:
+        raise ValueError("FFT block is shorter than the template")
+
+    s_t, s_tt = template.sum(), template @ template
+    s_y, s_yy = _running_sum(y, m), _running_sum(y * y, m)
+    s_ty = _correlate(y, template, nfft)
+
+    scale = (s_ty - s_t * s_y / m) / (s_tt - s_t * s_t / m)
+    offset = (s_y - scale * s_t) / m
+    sse = (
+        s_yy
+        + scale * scale * s_tt
+        + m * offset * offset
+        - 2 * (scale * s_ty + offset * s_y - scale * offset * s_t)
+    )
+    se = np.sqrt(np.maximum(sse, 0) / (m - 1))
+    criterion = scale / np.maximum(se, np.finfo(np.float64).tiny)
+    return criterion, scale, offset
+
+
+def _pick_maxima(criterion, threshold):
+    """
+    Row and position of the criterion maximum in each run over the threshold, and the
+    span of the run.
+    """
+    c = criterion.reshape(-1, criterion.shape[-1])
+    above = np.zeros((c.shape[0], c.shape[1] + 2), dtype=bool)
+    above[:, 1:-1] = c >= threshold
+    edges = np.diff(above.ravel().astype(np.int8))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, empty, empty
+
+    # label the samples of each run, maxima are first after sorting within runs
+    lengths = ends - starts
+    run = np.repeat(np.arange(len(starts)), lengths)
+    pos = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    pos += np.repeat(starts, lengths)
+    row, col = pos // above.shape[1], pos % above.shape[1]
+    values = c[row, col]
+    order = np.lexsort((-values, run))
+    first = order[np.r_[0, np.cumsum(lengths)[:-1]]]
+    return row[first], col[first], starts % above.shape[1], ends % above.shape[1]
+
+
+def _merge_runs(row, start, end, criterion):
+    """
+    Mask keeping the maximum of runs split across criterion blocks, picks are sorted
+    by row and position.
+    """
+    split = (row[1:] == row[:-1]) & (start[1:] == end[:-1])
+    if not split.any():
+        return np.ones(len(row), dtype=bool)
+    group = np.cumsum(np.r_[True, ~split])
+    order = np.lexsort((-criterion, group))
+    keep = np.zeros(len(row), dtype=bool)
+    keep[order[np.r_[True, group[order][1:] != group[order][:-1]]]] = True
+    return keep
+
+
+def _suppress(row, index, criterion, distance):
+    """
+    Mask of events kept by greedy non-maximum suppression, events are visited from the
+    strongest and remove the weaker events of the same row within `distance`. Events
+    are sorted by row and position.
+    """
+    keep = np.ones(len(row), dtype=bool)
+    if len(row) == 0:
+        return keep
+    # neighbours within distance are contiguous on a key ordered by row and position
+    span = int(index.max()) + distance + 1
+    key = row.astype(np.int64) * span + index
+    lo = np.searchsorted(key, key - distance, side="right")
+    hi = np.searchsorted(key, key + distance, side="left")
+    crowded = np.flatnonzero(hi - lo > 1)
+    # ties are visited in position order
+    for i in crowded[np.argsort(-criterion[crowded], kind="stable")]:
+        if keep[i]:
+            keep[lo[i] : i] = False
+            keep[i + 1 : hi[i]] = False
+    return keep
+
+
+@instrument("events")
+def detect_events(t, y, template, threshold=4.0, min_interval=None, nfft=None):
+    """
+    Detect events in a batch of recordings.
+
+    The criterion is evaluated over blocks of `_BLOCK_SAMPLES` positions, so the
+    working set does not grow with the trace length. Rise and decay times are
+    measured on a 3-sample moving average of each event, relative to its fitted
+    amplitude and peak position. On events of the default template, true rise 0.6 ms
+    and 1/e decay 3.6 ms at 10 kHz, the median decay is 3.4, 3.5 and 3.7 ms at
+    amplitude to noise ratios of 50, 10 and 5, single events are not reliable below
+    a ratio of about 5.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings, a single trace or frames stacked on the first axis.
+        template (ndarray): Event waveform, see `event_template`.
+        threshold (float, optional): Detection criterion threshold.
+        min_interval (float, optional): Events closer than this are merged into the
+            strongest one, default to the template decay to 1/e, the event tail
+            matches the template as well.
+        nfft (int, optional): FFT block size.
+
+    Returns:
+        (Events): Per-event row in `y`, sample index and timestamp of the onset, fitted
+            amplitude, detection criterion, 10-90% rise time and 1/e decay time.
+    """
+    y = np.asarray(y)
+    y2d = y.reshape(-1, y.shape[-1])
+    template = np.asarray(template, dtype=np.float64)
+    m = len(template)
+    sign = 1.0 if template.max() >= -template.min() else -1.0
+    ipk = int(np.argmax(sign * template))
+    peak = template[ipk]
+    if y2d.shape[-1] < m:
+        raise ValueError("recording is shorter than the template")
+
+    # criterion over bounded blocks of positions, blocks overlap by the template
+    n_valid = y2d.shape[-1] - m + 1
+    step = max(_BLOCK_SAMPLES // max(y2d.shape[0], 1), m)
+    picks = []
+    for j in range(0, n_valid, step):
+        block = np.asarray(y2d[:, j : j + step + m - 1], dtype=np.float64)
+        mean = block.mean(axis=-1)
+        criterion, scale, offset = detection_criterion(
+            block - mean[:, np.newaxis], template, nfft=nfft
+        )
+        row, col, start, end = _pick_maxima(criterion, threshold)
+        picks.append(
+            (
+                row,
+                j + col,
+                j + start,
+                j + end,
+                criterion[row, col],
+                scale[row, col],
+                mean[row] + offset[row, col],
+            )
+        )
+    row, index, start, end, criterion, scale, base = (
+        np.concatenate(field) for field in zip(*picks)
+    )
+    order = np.lexsort((index, row))
+    row, index, start, end, criterion, scale, base = (
+        x[order] for x in (row, index, start, end, criterion, scale, base)
+    )
+    keep = _merge_runs(row, start, end, criterion)
+    row, index, criterion, scale, base = (
+        x[keep] for x in (row, index, criterion, scale, base)
+    )
+
+    dt = (t[-1] - t[0]) / (len(t) - 1)
+    if min_interval is None:
+        tail = sign * template[ipk:] <= abs(peak) / np.e
+        distance = ipk + (np.argmax(tail) if tail.any() else 0)
+    else:
+        distance = int(round(min_interval / dt))
+    keep = _suppress(row, index, criterion, max(distance, 1))
+    row, index, criterion, scale, base = (
+        x[keep] for x in (row, index, criterion, scale, base)
+    )
+    logger.debug("{} events over {:.2f}".format(len(row), threshold))
+
+    # kinetics from the smoothed event segments in the event polarity, relative to the
+    # fitted amplitude, crossings are counted so noise excursions cancel out
+    seg = y2d[row[:, np.newaxis], index[:, np.newaxis] + np.arange(m)]
+    seg = sign * (seg - base[:, np.newaxis])
+    w = _SMOOTH_SAMPLES
+    seg = _running_sum(np.pad(seg, ((0, 0), (w // 2, w // 2)), mode="edge"), w) / w
+    amp = (scale * abs(peak))[:, np.newaxis]
+    k = np.arange(m)
+    rising = (k <= ipk) & (seg >= 0.1 * amp) & (seg < 0.9 * amp)
+    decaying = (k > ipk) & (seg > amp / np.e)
+
+    return Events(
+        row,
+        index,
+        t[index],
+        scale * peak,
+        criterion,
+        np.count_nonzero(rising, axis=-1) * dt,
+        np.count_nonzero(decaying, axis=-1) * dt,
+    )
+
+
+def scan_events(
+    path,
+    template=None,
+    index=None,
+    threshold=4.0,
+    min_interval=None,
+    block_size=256,
+    qc=False,
+    **kwargs
+):
+    """
+    Detect events in a frame range streamed from storage.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        template (ndarray, optional): Event waveform, default to `event_template` at
+            the sampling rate of the file.
+        index (tuple, optional): Frame range (start, end).
+        threshold (float, optional): Detection criterion threshold.
+        min_interval (float, optional): Minimum interval between events.
+        block_size (int, optional): Number of frames loaded at once.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        **kwargs: Passed to `event_template`.
+
+    Returns:
+        (Events): Events of all the frames, `frame` holds frame numbers.
+    """
+    events = []
+    for t, _, rec, frames in iter_frame_blocks(
+        path, index, block_size=block_size, qc=qc
+    ):
+        if template is None:
+            template = event_template(1.0 / np.median(np.diff(t)), **kwargs)
+        block = detect_events(
+            t, rec, template, threshold=threshold, min_interval=min_interval
+        )
+        events.append(block._replace(frame=frames[block.frame]))
+    if not events:
+        raise ValueError("no frame to scan")
+    events = Events(*(np.concatenate(field) for field in zip(*events)))
+    logger.info("{} events found".format(len(events.frame)))
+    return events
@@ -0,0 +1,199 @@
+"""
+Optional compiled kernels of the EPSP pipeline.
+
+Peak search, threshold crossings and the windowed regression are fused into a single
+pass per frame and parallelized across frames with Numba. Without Numba, or with the
+"numpy" backend selected, `epsp_features` keeps using the vectorized NumPy path.
+
+The backend is selected by `set_backend`, or the NEUBIO_BACKEND environment variable,
+out of "numpy" (default), "numba" and "auto" to use Numba if installed. The kernels
+sum in a different order than NumPy, slopes differ by about 1e-6 relative, and the
+first call includes the JIT compilation.
+"""
+import importlib.util
+import logging
+import os
+
+import numpy as np
+
+from ..instrument import stage
+
+__all__ = ["get_backend", "set_backend"]
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "numpy", "numba")
+ENV_VAR = "NEUBIO_BACKEND"
+
+_backend = None
+_kernel = None
+
+
+def _has_numba():
+    # probe without importing, Numba takes a while to load
+    return importlib.util.find_spec("numba") is not None
+
+
+def set_backend(name="numpy"):
+    """
+    Select the backend of `epsp_features`.
+
+    Args:
+        name (str, optional): "numpy", "numba", or "auto" to use Numba if installed.
+    """
+    global _backend
+
+    if name not in BACKENDS:
+        raise ValueError(
+            'unknown backend "{}", expecting one of {}'.format(
+                name, ", ".join(BACKENDS)
+            )
+        )
+    if name == "auto":
+        name = "numba" if _has_numba() else "numpy"
+    elif name == "numba" and not _has_numba():
+        raise ImportError("numba backend requires Numba")
+    logger.info('using "{}" backend'.format(name))
+    _backend = name
+
+
+def get_backend():
+    """
+    Name of the active backend, resolved from NEUBIO_BACKEND on first use.
+    """
+    if _backend is None:
+        set_backend(os.environ.get(ENV_VAR, "numpy").lower())
+    return _backend
+
+
+def _frame_features(t, y, yf, delay, pct):
+    """
+    Fused `batch_epsp_peak` and `batch_epsp_slope` of a single frame.
+
+    Returns:
+        (tuple): Peak index (-1 if not found), amplitude, slope, r and validity.
+    """
+    n = len(yf)
+
+    # polarity
+    ymax, ymin = yf[0], yf[0]
+    for i in range(1, n):
+        if yf[i] > ymax:
+            ymax = yf[i]
+        elif yf[i] < ymin:
+            ymin = yf[i]
+    sign = -1.0 if abs(ymax) < abs(ymin) else 1.0
+
+    # threshold over the search range, 2*std
+    m = n - delay
+    mean = 0.0
+    for i in range(delay, n):
+        mean += sign * yf[i]
+    mean /= m
+    var = 0.0
+    for i in range(delay, n):
+        d = sign * yf[i] - mean
+        var += d * d
+    h = 2 * np.sqrt(var / m)
+
+    # first local maximum over threshold, plateaus resolve to their leading edge
+    ipk = -1
+    k = delay + 1
+    while k < n - 1:
+        yk = sign * yf[k]
+        if yk > sign * yf[k - 1] and yk >= h:
+            j = k
+            while j < n - 1 and yf[j + 1] == yf[j]:
+                j += 1
+            if j < n - 1 and sign * yf[j + 1] < sign * yf[j]:
+                ipk = k
+                break
+            k = j + 1
+        else:
+            k += 1
+    if ipk < 0:
+        return -1, np.nan, np.nan, np.nan, False
+
+    # regression window from the last crossings of both thresholds before the peak
+    amp = y[ipk]
+    y0, y1 = pct * amp, (1 - pct) * amp
+    imin, imax = -1, -1
+    for i in range(ipk - 2, -1, -1):
+        a, b = y[i], y[i + 1]
+        # sign changes, touching the threshold counts as a crossing
+        if imin < 0 and int(b > y0) - int(b < y0) != int(a > y0) - int(a < y0):
+            imin = i
+        if imax < 0 and int(b > y1) - int(b < y1) != int(a > y1) - int(a < y1):
+            imax = i
+        if imin >= 0 and imax >= 0:
+            break
+    if imin < 0 or imax < 0 or imax <= imin:
+        return ipk, amp, np.nan, np.nan, False
+
+    # linreg over [imin, imax], accumulated in double precision
+    w = imax - imin + 1
+    tm, ym = 0.0, 0.0
+    for i in range(imin, imax + 1):
+        tm += t[i]
+        ym += y[i]
+    tm /= w
+    ym /= w
+    sxx, syy, sxy = 0.0, 0.0, 0.0
+    for i in range(imin, imax + 1):
+        dt, dy = t[i] - tm, y[i] - ym
+        sxx += dt * dt
+        syy += dy * dy
+        sxy += dt * dy
+    return ipk, amp, sxy / sxx, sxy / np.sqrt(sxx * syy), True
+
+
+def _compile():
+    import numba
+
+    frame_features = numba.njit(nogil=True)(_frame_features)
+
+    @numba.njit(parallel=True)
+    def batch(t, y, yf, delay, pct, ipk, amp, slope, r, valid):
+        for i in numba.prange(y.shape[0]):
+            ipk[i], amp[i], slope[i], r[i], valid[i] = frame_features(
+                t, y[i], yf[i], delay, pct
+            )
+
+    logger.info("compiling EPSP kernels")
+    return batch
+
+
+def fused_features(t, y, yf, delay, pct):
+    """
+    Compiled counterpart of `epsp_features`.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings, time on the last axis.
+        yf (ndarray): Filtered recordings, used to locate the peak.
+        delay (int): EPSP search range delay in samples.
+        pct (float): Intensity single-sided windowing percentage.
+
+    Returns:
+        (tuple): Peak index, amplitude, slope, r and validity of each recording.
+    """
+    global _kernel
+
+    if _kernel is None:
+        _kernel = _compile()
+
+    shape = y.shape[:-1]
+    y = np.ascontiguousarray(y).reshape(-1, y.shape[-1])
+    yf = np.ascontiguousarray(yf).reshape(-1, yf.shape[-1])
+    t = np.ascontiguousarray(t, dtype=np.float64)
+
+    n = y.shape[0]
+    ipk = np.empty(n, dtype=np.int64)
+    amp = np.empty(n, dtype=np.float64)
+    slope = np.empty(n, dtype=np.float64)
+    r = np.empty(n, dtype=np.float64)
+    valid = np.empty(n, dtype=np.bool_)
+    with stage("features"):
+        _kernel(t, y, yf, delay, pct, ipk, amp, slope, r, valid)
+
+    return tuple(a.reshape(shape) for a in (ipk, amp, slope, r, valid))
@@ -0,0 +1,255 @@
+"""
+Online LTP/LTD monitor, frames are analyzed one by one as they arrive.
+"""
+from collections import deque, namedtuple
+import logging
+
+import numpy as np
+
+from ..filter import preprocess
+from .epsp import epsp_features
+
+__all__ = ["MonitorRecord", "PlasticityMonitor", "RunningStats", "WindowStats"]
+
+logger = logging.getLogger(__name__)
+
+
+class RunningStats(object):
+    """
+    Running mean and variance using Welford's algorithm.
+
+    Args:
+        shape (tuple, optional): Shape of each sample, scalar by default.
+    """
+
+    def __init__(self, shape=()):
+        self.n = 0
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self._mean
+        self._mean = self._mean + delta / self.n
+        self._m2 = self._m2 + delta * (x - self._mean)
+
+    def add_batch(self, x):
+        """
+        Add samples stacked along the first axis, merged with Chan's update.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        m = x.shape[0]
+        if m == 0:
+            return
+        mean = x.mean(axis=0)
+        m2 = ((x - mean) ** 2).sum(axis=0)
+
+        n = self.n + m
+        delta = mean - self._mean
+        self._mean = self._mean + delta * (m / n)
+        self._m2 = self._m2 + m2 + delta**2 * (self.n * m / n)
+        self.n = n
+
+    @property
+    def mean(self):
+        return self._mean if self.n > 0 else np.full_like(self._mean, np.nan)
+
+    @property
+    def var(self):
+        """Sample variance."""
+        return self._m2 / (self.n - 1) if self.n > 1 else np.full_like(self._m2, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+class WindowStats(RunningStats):
+    """
+    Mean and variance over the most recent samples, oldest samples are removed with
+    the inverse Welford update.
+
+    Args:
+        size (int): Window size.
+        shape (tuple, optional): Shape of each sample, scalar by default.
+    """
+
+    def __init__(self, size, shape=()):
+        super().__init__(shape)
+        self.size = size
+        self._window = deque()
+
+    def add(self, x):
+        if len(self._window) == self.size:
+            self._remove(self._window.popleft())
+        self._window.append(x)
+        super().add(x)
+
+    def add_batch(self, x):
+        for x_ in x:
+            self.add(x_)
+
+    def _remove(self, x):
+        if self.n == 1:
+            self.n = 0
+            self._mean = np.zeros_like(self._mean)
+            self._m2 = np.zeros_like(self._m2)
+            return
+        self.n -= 1
+        delta = x - self._mean
+        self._mean = self._mean - delta / self.n
+        self._m2 = np.maximum(self._m2 - delta * (x - self._mean), 0)
+
+
+MonitorRecord = namedtuple(
+    "MonitorRecord",
+    [
+        "frame",
+        "amplitude",
+        "slope",
+        "r",
+        "valid",
+        "amplitude_pct",
+        "slope_pct",
+        "recent_amplitude_pct",
+        "recent_slope_pct",
+    ],
+)
+
+
+class PlasticityMonitor(object):
+    """
+    Track EPSP amplitude and slope relative to baseline during an experiment.
+
+    Every frame costs a fixed amount of work, statistics are updated incrementally
+    instead of recomputed over the session.
+
+    Args:
+        t (ndarray): Timestamps of a frame.
+        fs (float): Sampling frequency.
+        lo_cutoff (float, optional): LPF cutoff frequency.
+        crop (tuple, optional): Timestamp range containing the EPSP.
+        n_baseline (int, optional): Number of accepted frames before the baseline is
+            frozen, otherwise call `end_baseline` explicitly.
+        window (int, optional): Number of accepted frames in the sliding window.
+        delay (float, optional): EPSP search range delay.
+        pct (float, optional): Intensity single-sided windowing percentage.
+        r_min (float, optional): Minimum correlation of the slope regression.
+    """
+
+    def __init__(
+        self,
+        t,
+        fs,
+        lo_cutoff=1e3,
+        crop=(0.1, 0.15),
+        n_baseline=None,
+        window=30,
+        delay=0.005,
+        pct=0.2,
+        r_min=0.7,
+    ):
+        self.t, self.fs, self.lo_cutoff, self.crop = t, fs, lo_cutoff, crop
+        self.n_baseline = n_baseline
+        self.delay, self.pct, self.r_min = delay, pct, r_min
+
+        # (amplitude, slope)
+        self.baseline = RunningStats(shape=(2,))
+        self.baseline_window = WindowStats(window, shape=(2,))
+        self.recent = WindowStats(window, shape=(2,))
+        self.in_baseline = True
+
+        self.n_frames, self.n_discard = 0, 0
+
+    def end_baseline(self):
+        """Freeze baseline statistics, following frames are reported against it."""
+        if self.baseline.n < 2:
+            logger.warning("baseline contains {} frame(s)".format(self.baseline.n))
+        self.in_baseline = False
+
+    def update(self, y, frame=None):
+        """
+        Analyze a new frame.
+
+        Args:
+            y (ndarray): Raw recording of the frame.
+            frame (int, optional): Frame number, default to the arrival order.
+
+        Returns:
+            (MonitorRecord): Features of this frame and its percent-of-baseline, and
+                the percent-of-baseline of the sliding window mean.
+        """
+        if frame is None:
+            frame = self.n_frames
+        self.n_frames += 1
+
+        t, y, y_filt = preprocess(self.t, y, self.fs, self.lo_cutoff, self.crop)
+
+        f = epsp_features(t, y, yf=y_filt, delay=self.delay, pct=self.pct)
+        amp, slope, r = float(f.amplitude), float(f.slope), float(f.r)
+        valid = bool(f.valid) and abs(r) >= self.r_min
+
+        if valid:
+            x = np.array([amp, slope])
+            if self.in_baseline:
+                self.baseline.add(x)
+                self.baseline_window.add(x)
+                if self.n_baseline is not None and self.baseline.n >= self.n_baseline:
+                    self.end_baseline()
+            self.recent.add(x)
+        else:
+            self.n_discard += 1
+            logger.warning("discarded frame {}, r={:.4f}".format(frame, r))
+
+        amp_pct, slope_pct = (
+            100 * np.array([amp, slope]) / self.baseline.mean
+        ).tolist()
+        recent_amp_pct, recent_slope_pct = self.recent_pct().tolist()
+        return MonitorRecord(
+            frame,
+            amp,
+            slope,
+            r,
+            valid,
+            amp_pct,
+            slope_pct,
+            recent_amp_pct,
+            recent_slope_pct,
+        )
+
+    def recent_pct(self):
+        """
+        Mean of the accepted frames in the sliding window, in percent of baseline.
+
+        Returns:
+            (ndarray): (amplitude, slope), NaN before the first accepted frame.
+        """
+        return 100 * self.recent.mean / self.baseline.mean
+
+    def stability(self):
+        """
+        Stability of the baseline over the sliding window.
+
+        Returns:
+            (tuple): tuple containing:
+                drift (ndarray): Relative difference between the window mean and the
+                    baseline mean, for (amplitude, slope).
+                cv (ndarray): Coefficient of variation over the window.
+        """
+        mean = self.baseline.mean
+        drift = (self.baseline_window.mean - mean) / np.abs(mean)
+        cv = self.baseline_window.std / np.abs(self.baseline_window.mean)
+        return drift, cv
+
+    def is_stable(self, max_drift=0.05, max_cv=0.1):
+        """
+        Test whether the baseline is stable enough to induce plasticity.
+
+        Args:
+            max_drift (float, optional): Maximum relative drift of the window mean.
+            max_cv (float, optional): Maximum coefficient of variation of the window.
+        """
+        if self.baseline_window.n < self.baseline_window.size:
+            return False
+        drift, cv = self.stability()
+        return bool(np.all(np.abs(drift) <= max_drift) and np.all(cv <= max_cv))
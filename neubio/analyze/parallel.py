@@ -0,0 +1,160 @@
+"""
+Process-pool execution of the EPSP pipeline, frames are shared through shared memory.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from ..filter import preprocess
+from ..io import load_frame_group
+from ..precision import cast, get_precision, set_precision
+from . import kernels
+from .epsp import EPSPFeatures, epsp_features
+
+__all__ = ["analyze_file", "analyze_frames"]
+
+logger = logging.getLogger(__name__)
+
+# workers are not forked from the caller, whose thread pools (Numba, BLAS) do not
+# survive a fork
+START_METHOD = "forkserver" if os.name == "posix" else "spawn"
+
+# frame matrix of the worker process, attached by `_init_worker`
+_shared = {}
+
+
+def _init_worker(name, shape, dtype, precision, backend):
+    set_precision(precision)
+    kernels.set_backend(backend)
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm
+    _shared["rec"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _pool(n_workers, shm, shape, dtype):
+    """
+    Worker pool attached to the shared frame matrix, with the precision and kernel
+    backend of the caller.
+    """
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context(START_METHOD),
+        initializer=_init_worker,
+        initargs=(shm.name, shape, dtype, get_precision(), kernels.get_backend()),
+    )
+
+
+def _analyze_chunk(start, stop, t, params):
+    rec = _shared["rec"][start:stop]
+    t, rec, rec_filt = preprocess(
+        t,
+        rec,
+        params["fs"],
+        lo_cutoff=params["lo_cutoff"],
+        crop=params["crop"],
+        tmax=params["tmax"],
+    )
+    f = epsp_features(t, rec, yf=rec_filt, delay=params["delay"], pct=params["pct"])
+    return start, f
+
+
+def analyze_frames(
+    t,
+    rec,
+    fs,
+    lo_cutoff=1e3,
+    crop=(0.1, 0.15),
+    tmax=0.1,
+    delay=0.005,
+    pct=0.2,
+    n_workers=None,
+    chunk_size=None,
+):
+    """
+    Run filter, baseline, crop, peak and slope over worker processes.
+
+    Args:
+        t (ndarray): Timestamps.
+        rec (ndarray): Raw recordings, shape (n_frames, n_samples).
+        fs (float): Sampling frequency.
+        lo_cutoff (float, optional): LPF cutoff frequency.
+        crop (tuple, optional): Timestamp range containing the EPSP.
+        tmax (float, optional): Delay till the stimulus occur.
+        delay (float, optional): EPSP search range delay.
+        pct (float, optional): Intensity single-sided windowing percentage.
+        n_workers (int, optional): Number of processes, default to the CPU count.
+        chunk_size (int, optional): Number of frames per task, default to split the
+            frames into 4 tasks per worker.
+
+    Returns:
+        (EPSPFeatures): Per-frame features in frame order.
+    """
+    rec = cast(rec)
+    n_frames = rec.shape[0]
+    if n_frames == 0:
+        raise ValueError("no frame to analyze")
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    if chunk_size is None:
+        chunk_size = max(-(-n_frames // (4 * n_workers)), 1)
+    params = {
+        "fs": fs,
+        "lo_cutoff": lo_cutoff,
+        "crop": crop,
+        "tmax": tmax,
+        "delay": delay,
+        "pct": pct,
+    }
+
+    shm = shared_memory.SharedMemory(create=True, size=max(rec.nbytes, 1))
+    shared = None
+    try:
+        shared = np.ndarray(rec.shape, dtype=rec.dtype, buffer=shm.buf)
+        shared[...] = rec
+
+        logger.info(
+            "{} frames, {} workers, {} frames per task".format(
+                n_frames, n_workers, chunk_size
+            )
+        )
+        with _pool(n_workers, shm, rec.shape, rec.dtype) as executor:
+            futures = [
+                executor.submit(
+                    _analyze_chunk, start, min(start + chunk_size, n_frames), t, params
+                )
+                for start in range(0, n_frames, chunk_size)
+            ]
+            chunks = [future.result() for future in futures]
+    finally:
+        # the buffer can not be released while a view on it exists
+        shared = None
+        try:
+            shm.close()
+        finally:
+            shm.unlink()
+
+    # merge in frame order
+    chunks.sort(key=lambda chunk: chunk[0])
+    return EPSPFeatures(
+        *(np.concatenate(field) for field in zip(*(f for _, f in chunks)))
+    )
+
+
+def analyze_file(path, index=None, **kwargs):
+    """
+    Load a frame range and analyze it with `analyze_frames`.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        **kwargs: Passed to `analyze_frames`.
+
+    Returns:
+        (EPSPFeatures): Per-frame features in frame order.
+    """
+    t, _, rec = load_frame_group(path, index=index)
+    return analyze_frames(t, rec, **kwargs)
@@ -0,0 +1,233 @@
+"""
+Quantal analysis by equally spaced Gaussian mixtures.
+"""
+from collections import namedtuple
+import logging
+
+import numpy as np
+
+__all__ = ["QuantalFit", "fit_quantal", "quantal_pdf"]
+
+logger = logging.getLogger(__name__)
+
+QuantalFit = namedtuple(
+    "QuantalFit",
+    [
+        "n_sites",
+        "quantal_size",
+        "sigma",
+        "weights",
+        "release_prob",
+        "loglik",
+        "aic",
+        "bic",
+    ],
+)
+
+
+def _log_prob(x, kk, q, sigma, w):
+    """
+    Per-component log density, shape (n_models, n_samples, n_components).
+    """
+    d = x[:, np.newaxis] - (q[:, np.newaxis] * kk)[:, np.newaxis, :]
+    with np.errstate(divide="ignore"):
+        c = np.log(w) - np.log(sigma)[:, np.newaxis] - 0.5 * np.log(2 * np.pi)
+    return c[:, np.newaxis, :] - d**2 / (2 * sigma[:, np.newaxis, np.newaxis] ** 2)
+
+
+def _binom_weights(n_sites, kk, p):
+    """
+    Binomial component weights, zero beyond the number of sites.
+    """
+    from scipy.special import gammaln
+
+    n_sites = n_sites[:, np.newaxis]
+    p = np.clip(p, 1e-12, 1 - 1e-12)[:, np.newaxis]
+    with np.errstate(invalid="ignore"):
+        logw = (
+            gammaln(n_sites + 1)
+            - gammaln(kk + 1)
+            - gammaln(np.maximum(n_sites - kk, 0) + 1)
+            + kk * np.log(p)
+            + (n_sites - kk) * np.log1p(-p)
+        )
+    return np.where(kk <= n_sites, np.exp(logw), 0)
+
+
+def _fit_em(x, c, n_sites, n_restarts, binomial, max_iter, tol, rng):
+    """
+    Fit all candidate models and restarts simultaneously.
+
+    Each model has components at k*q (k = 0..n_sites) with a shared sigma, models with
+    fewer sites are padded by zero-weight components. Samples x are weighted by counts c.
+    """
+    n = c.sum()
+    n_sites = np.repeat(np.asarray(n_sites), n_restarts)
+    kk = np.arange(n_sites.max() + 1)
+    mask = kk <= n_sites[:, np.newaxis]
+
+    # random initialization around the evenly divided amplitude range
+    q = rng.uniform(0.5, 1.5, len(n_sites)) * x.max() / n_sites
+    sigma = q / 4
+    p = rng.uniform(0.2, 0.8, len(n_sites))
+    w = (
+        _binom_weights(n_sites, kk, p)
+        if binomial
+        else mask / mask.sum(1, keepdims=True)
+    )
+    sigma_min = 1e-3 * np.sqrt(np.dot(c, (x - np.dot(c, x) / n) ** 2) / n)
+
+    loglik = np.full(len(n_sites), -np.inf)
+    active = np.ones(len(n_sites), dtype=bool)
+    for i in range(max_iter):
+        # only models that have not converged are updated
+        j = np.flatnonzero(active)
+        q_, sigma_ = q[j], sigma[j]
+
+        # E-step
+        logp = _log_prob(x, kk, q_, sigma_, w[j])
+        lse = logp.max(axis=2, keepdims=True)
+        lse += np.log(np.exp(logp - lse).sum(axis=2, keepdims=True))
+        r = np.exp(logp - lse) * c[:, np.newaxis]
+        loglik_ = lse[..., 0] @ c
+
+        # M-step, sufficient statistics per component
+        nk = r.sum(axis=1)
+        sx = (r * x[:, np.newaxis]).sum(axis=1)
+        sxx = r.sum(axis=2) @ x**2
+        den = nk @ kk**2
+        q_ = np.where(den > 0, (sx @ kk) / np.maximum(den, 1e-12), q_)
+        # sum_k sum_i r_ik (x_i - k*q)^2
+        ss = sxx - 2 * q_ * (sx @ kk) + q_**2 * den
+        sigma_ = np.maximum(np.sqrt(np.maximum(ss, 0) / n), sigma_min)
+        if binomial:
+            p[j] = (nk @ kk) / (n * n_sites[j])
+            w[j] = _binom_weights(n_sites[j], kk, p[j])
+        else:
+            w[j] = nk / n
+
+        q[j], sigma[j] = q_, sigma_
+        active[j] = np.abs(loglik_ - loglik[j]) > tol * np.abs(loglik_)
+        loglik[j] = loglik_
+        if not active.any():
+            logger.debug("converged after {} iterations".format(i + 1))
+            break
+    else:
+        logger.warning(
+            "{} of {} fits did not converge".format(
+                np.count_nonzero(active), len(active)
+            )
+        )
+
+    return n_sites, q, sigma, w, loglik
+
+
+def fit_quantal(
+    amp,
+    n_sites=range(1, 9),
+    n_restarts=10,
+    binomial=True,
+    n_bins=256,
+    max_iter=500,
+    tol=1e-6,
+    criterion="bic",
+    seed=None,
+):
+    """
+    Fit equally spaced Gaussian mixtures to EPSP amplitudes.
+
+    Components are located at multiples of the quantal size, including the failure
+    component at zero. Every candidate number of release sites is fitted with random
+    restarts in one vectorized EM, the restart with highest likelihood is kept.
+
+    With free weights the quantal size is only identified up to an integer factor,
+    2N sites of size q/2 with nearly empty odd components fit as well as N sites of
+    size q, and may be selected when the peaks are broad, e.g. N=8, q=0.05 instead of
+    N=4, q=0.1. The binomial model does not have this ambiguity, check the weights of
+    free fits before reading the quantal size.
+
+    Args:
+        amp (ndarray): EPSP amplitudes, negative recordings are flipped as a whole
+            by the sign of the mean amplitude.
+        n_sites (iterable, optional): Candidate numbers of release sites.
+        n_restarts (int, optional): Random restarts per candidate.
+        binomial (bool, optional): Constrain component weights to a binomial release
+            model, otherwise weights are free and release probability is derived from
+            the mean quantal content.
+        n_bins (int, optional): Amplitudes are binned before fitting so the cost does
+            not grow with the number of samples, None to fit individual samples.
+        max_iter (int, optional): Maximum number of EM iterations.
+        tol (float, optional): Relative log-likelihood tolerance.
+        criterion (str, optional): Model selection criterion, "aic" or "bic".
+        seed (int, optional): Seed of the random initialization.
+
+    Returns:
+        (tuple): tuple containing:
+            best (QuantalFit): Selected model.
+            fits (list of QuantalFit): Best fit of each candidate.
+    """
+    if criterion not in ("aic", "bic"):
+        raise ValueError('unknown criterion "{}"'.format(criterion))
+
+    x = np.asarray(amp, dtype=np.float64)
+    x = x[np.isfinite(x)]
+    # one global polarity, noise around the failures keeps its sign
+    if np.mean(x) < 0:
+        x = -x
+    n = len(x)
+    if n_bins is None or n <= n_bins:
+        c = np.ones(n)
+    else:
+        c, edges = np.histogram(x, bins=n_bins)
+        x = (edges[:-1] + edges[1:]) / 2
+        x, c = x[c > 0], c[c > 0].astype(np.float64)
+    rng = np.random.default_rng(seed)
+
+    n_sites = sorted(set(n_sites))
+    sites, q, sigma, w, loglik = _fit_em(
+        x, c, n_sites, n_restarts, binomial, max_iter, tol, rng
+    )
+
+    fits = []
+    for k in n_sites:
+        i = np.flatnonzero(sites == k)
+        i = i[np.argmax(loglik[i])]
+
+        weights = w[i, : k + 1]
+        # quantal size and sigma, plus either p or the free weights
+        n_params = 3 if binomial else k + 2
+        fits.append(
+            QuantalFit(
+                n_sites=k,
+                quantal_size=q[i],
+                sigma=sigma[i],
+                weights=weights,
+                release_prob=np.dot(np.arange(k + 1), weights) / k,
+                loglik=loglik[i],
+                aic=2 * n_params - 2 * loglik[i],
+                bic=n_params * np.log(n) - 2 * loglik[i],
+            )
+        )
+    best = min(fits, key=lambda fit: getattr(fit, criterion))
+    logger.info(
+        "N={}, q={:.4f}, p={:.4f}".format(
+            best.n_sites, best.quantal_size, best.release_prob
+        )
+    )
+
+    return best, fits
+
+
+def quantal_pdf(x, fit):
+    """
+    Evaluate the fitted mixture density.
+
+    Args:
+        x (ndarray): Amplitudes.
+        fit (QuantalFit): Fitted model.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    mu = fit.quantal_size * np.arange(fit.n_sites + 1)
+    z = (x[..., np.newaxis] - mu) / fit.sigma
+    pdf = np.exp(-0.5 * z**2) / (fit.sigma * np.sqrt(2 * np.pi))
+    return pdf @ fit.weights
@@ -0,0 +1,150 @@
+"""
+Paired-pulse and pulse train analysis over frame batches.
+"""
+from collections import namedtuple
+import logging
+
+import numpy as np
+
+from .epsp import epsp_features
+
+__all__ = ["PulseTrain", "detect_onsets", "pulse_train", "split_pulses"]
+
+logger = logging.getLogger(__name__)
+
+
+def detect_onsets(t, stimuli, n_pulses=None, threshold=0.5):
+    """
+    Detect stimulus onsets from the stimuli channel.
+
+    Each pulse is a contiguous run over `threshold` of the maximum stimulus, its
+    onset is the location of the run maximum.
+
+    Args:
+        t (ndarray): Timestamps.
+        stimuli (ndarray): Stimuli channel.
+        n_pulses (int, optional): Expected number of pulses, extra pulses are ignored.
+        threshold (float, optional): Relative detection threshold.
+
+    Returns:
+        (ndarray): Onset timestamps.
+    """
+    stimuli = np.asarray(stimuli)
+    above = stimuli >= threshold * stimuli.max()
+
+    edges = np.flatnonzero(np.diff(above.astype(np.int8))) + 1
+    if above[0]:
+        edges = np.insert(edges, 0, 0)
+    if above[-1]:
+        edges = np.append(edges, len(above))
+    onsets = [s + np.argmax(stimuli[s:e]) for s, e in zip(edges[::2], edges[1::2])]
+
+    if n_pulses is not None:
+        if len(onsets) < n_pulses:
+            raise ValueError(
+                "expecting {} pulses, only {} found".format(n_pulses, len(onsets))
+            )
+        onsets = onsets[:n_pulses]
+    onsets = t[onsets]
+    logger.debug("stimuli timestamp: {}".format(onsets))
+
+    return onsets
+
+
+def split_pulses(t, y, onsets, width=None):
+    """
+    Split recordings into windows starting at each stimulus onset.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Recordings, time on the last axis.
+        onsets (ndarray): Onset timestamps.
+        width (float, optional): Window width, default to the shortest inter-pulse
+            interval.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Window timestamps, offset to zero.
+            y (ndarray): Windowed recordings, shape (..., n_pulses, n_samples).
+    """
+    onsets = np.atleast_1d(onsets)
+    i0 = np.argmax(t >= onsets[:, np.newaxis], axis=-1)
+    if width is None:
+        if len(i0) < 2:
+            raise ValueError("window width is required for a single pulse")
+        n = np.diff(i0).min()
+    else:
+        n = int(round(width / (t[1] - t[0])))
+    if i0[-1] + n >= len(t):
+        raise ValueError("pulse window exceeds the recording")
+
+    # inclusive window, same as `t_crop` between two onsets
+    index = i0[:, np.newaxis] + np.arange(n + 1)
+    t_ = t[index[0]] - t[index[0, 0]]
+    return t_, np.asarray(y)[..., index]
+
+
+class PulseTrain(
+    namedtuple("PulseTrain", ["t", "amplitude", "slope", "r", "peak", "valid"])
+):
+    """
+    Per-pulse EPSP features of a frame batch, all shaped (n_frames, n_pulses).
+    """
+
+    __slots__ = ()
+
+    @property
+    def n_pulses(self):
+        return self.amplitude.shape[-1]
+
+    def ratio(self, feature="amplitude", reference=0):
+        """
+        Feature ratio of every pulse against the reference pulse.
+
+        Args:
+            feature (str, optional): Either "amplitude" or "slope".
+            reference (int, optional): Index of the reference pulse.
+
+        Returns:
+            (tuple): tuple containing:
+                ratio (ndarray): Feature ratio, ratio[:, 1] is the paired-pulse ratio.
+                mask (ndarray): True if both pulses are accepted.
+        """
+        x = getattr(self, feature)
+        x0 = x[..., reference : reference + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = x / x0
+        mask = self.valid & self.valid[..., reference : reference + 1]
+        return ratio, mask
+
+
+def pulse_train(t, y, onsets, yf=None, width=None, delay=0.005, pct=0.2, r_min=0.7):
+    """
+    Extract EPSP features of every pulse in every frame.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Baseline subtracted recordings, shape (n_frames, n_samples).
+        onsets (ndarray): Onset timestamps.
+        yf (ndarray, optional): Filtered recordings, used to locate the peak.
+        width (float, optional): Window width of each pulse.
+        delay (float, optional): EPSP search range delay.
+        pct (float, optional): Intensity single-sided windowing percentage.
+        r_min (float, optional): Minimum correlation of the slope regression.
+
+    Returns:
+        (PulseTrain): Per-pulse features and rejection mask.
+    """
+    t_, y = split_pulses(t, y, onsets, width=width)
+    if yf is not None:
+        _, yf = split_pulses(t, yf, onsets, width=width)
+
+    f = epsp_features(t_, y, yf=yf, delay=delay, pct=pct)
+    with np.errstate(invalid="ignore"):
+        valid = f.valid & (np.abs(f.r) >= r_min)
+
+    n_discard = np.count_nonzero(~valid)
+    if n_discard > 0:
+        logger.warning("discarded {} of {} pulses".format(n_discard, valid.size))
+
+    return PulseTrain(t_, f.amplitude, f.slope, f.r, f.peak, valid)
@@ -0,0 +1,239 @@
+"""
+On-disk cache of preprocessed frame batches.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from .filter import ac_notch, preprocess, remove_artifact
+from .io import META_NAME, MANIFEST_NAME, QC_NAME, is_npy_store, load_frame_group
+from .precision import get_precision
+
+__all__ = ["FrameCache", "canonical_params", "load_preprocessed"]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "neubio")
+
+
+def canonical_params(obj):
+    """
+    Convert parameters to a JSON representation independent of container types, equal
+    parameters compare equal whether given as tuples, lists, arrays or NumPy scalars.
+
+    Args:
+        obj (object): Parameter value, or a dict of them.
+
+    Returns:
+        (object): JSON compatible representation.
+    """
+    if isinstance(obj, dict):
+        return {str(k): canonical_params(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple, np.ndarray)):
+        return [canonical_params(v) for v in obj]
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    elif isinstance(obj, float) and obj.is_integer():
+        # 1000 and 1e3 are the same parameter
+        return int(obj)
+    return obj
+
+
+class FrameCache(object):
+    """
+    Least-recently-used cache of arrays, bounded by total size on disk.
+
+    Entries are keyed by the identity of the source file (path, mtime and size) and
+    a canonical hash of the processing parameters, so a modified source invalidates
+    its entries.
+
+    Args:
+        root (str, optional): Cache directory.
+        max_bytes (int, optional): Size budget of the cache directory.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=4 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, path, **params):
+        """
+        Generate entry key.
+
+        Args:
+            path (str): Source file or `.npy` directory store.
+            **params: Processing parameters.
+        """
+        if is_npy_store(path):
+            # directory mtime does not follow rewrites of the frame matrices, QC and
+            # metadata tables are written next to the manifest afterwards
+            names = [
+                name
+                for name in (MANIFEST_NAME, QC_NAME, META_NAME)
+                if os.path.exists(os.path.join(path, name))
+            ]
+            stats = [os.stat(os.path.join(path, name)) for name in names]
+        else:
+            names, stats = [os.path.basename(path)], [os.stat(path)]
+        ident = {
+            "path": os.path.abspath(path),
+            "files": {
+                name: [stat.st_mtime_ns, stat.st_size]
+                for name, stat in zip(names, stats)
+            },
+            "params": canonical_params(params),
+        }
+        ident = json.dumps(ident, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key + ".npz")
+
+    def get(self, key):
+        """
+        Retrieve arrays of an entry.
+
+        Returns:
+            (dict): Arrays by name, None if not cached.
+        """
+        path = self._entry_path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (FileNotFoundError, OSError, ValueError):
+            logger.debug("cache miss {}".format(key[:8]))
+            return None
+        # mark as recently used
+        os.utime(path)
+        logger.debug("cache hit {}".format(key[:8]))
+        return arrays
+
+    def put(self, key, **arrays):
+        """
+        Store arrays as an entry, least recently used entries are evicted to stay within
+        the size budget.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        List entries as (path, size, last use), least recently used first.
+        """
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".npz"):
+                continue
+            stat = entry.stat()
+            entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """
+        Remove least recently used entries until the cache fits in the budget.
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            logger.debug('evicting "{}"'.format(os.path.basename(path)))
+            os.unlink(path)
+            total -= size
+
+    def clear(self):
+        self.evict(max_bytes=0)
+
+
+def load_preprocessed(
+    path,
+    index=None,
+    fs=10e3,
+    lo_cutoff=1e3,
+    crop=None,
+    tmax=0.1,
+    notch=None,
+    artifact=None,
+    artifact_width=0.002,
+    qc=False,
+    cache=None,
+):
+    """
+    Load a frame range, filter, subtract baseline and crop, reusing cached results.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        fs (float, optional): Sampling frequency.
+        lo_cutoff (float, optional): LPF cutoff frequency.
+        crop (tuple, optional): Timestamp range to keep.
+        tmax (float, optional): Delay till the stimulus occur.
+        notch (float, optional): AC frequency to remove before other filters.
+        artifact (str, optional): Stimulus artifact removal method, see
+            `remove_artifact`, the template is estimated over the frame range.
+        artifact_width (float, optional): Duration of the stimulus artifact.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        cache (FrameCache, optional): Cache to use, results are not cached if None.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel, uncropped.
+            rec (ndarray): Baseline subtracted recordings.
+            rec_filt (ndarray): Filtered and baseline subtracted recordings.
+            frames (ndarray): Frame numbers.
+    """
+    names = ("t", "stimuli", "rec", "rec_filt", "frames")
+
+    if cache is not None:
+        key = cache.key(
+            path,
+            index=index,
+            fs=fs,
+            lo_cutoff=lo_cutoff,
+            crop=crop,
+            tmax=tmax,
+            notch=notch,
+            artifact=artifact,
+            artifact_width=artifact_width,
+            qc=qc,
+            precision=get_precision(),
+        )
+        arrays = cache.get(key)
+        if arrays is not None:
+            return tuple(arrays[name] for name in names)
+
+    t, stimuli, rec, frames = load_frame_group(
+        path, index=index, return_index=True, qc=qc
+    )
+    if artifact and stimuli.max() > 0:
+        from .analyze import detect_onsets
+
+        onsets = detect_onsets(t, stimuli)
+        rec = remove_artifact(t, rec, onsets, width=artifact_width, method=artifact)
+    if notch:
+        rec = ac_notch(rec, fs, f0=notch)
+    t, rec, rec_filt = preprocess(t, rec, fs, lo_cutoff=lo_cutoff, crop=crop, tmax=tmax)
+    result = (t, stimuli, rec, rec_filt, frames)
+
+    if cache is not None:
+        cache.put(key, **dict(zip(names, result)))
+    return result
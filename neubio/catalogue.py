@@ -0,0 +1,250 @@
+"""
+Index of converted trials in a directory tree.
+
+    catalogue = Catalogue.scan("../data")
+    catalogue.save("../data/catalogue.h5")
+    t, stimuli, response = load_label("../data/catalogue.h5", "baseline")
+"""
+import logging
+import os
+
+import numpy as np
+
+from .io import NpyStore, StorePool, _frame_numbers, _read_labels, is_npy_store
+
+__all__ = ["Catalogue"]
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "catalogue.h5"
+
+FILE_COLUMNS = (
+    "file",
+    "n_frames",
+    "first",
+    "last",
+    "n_samples",
+    "fs",
+    "n_pulses",
+    "interval",
+    "size",
+    "mtime",
+)
+
+
+def _describe(fd, group="/_frames"):
+    """
+    Summarize frame count, sampling rate and stimulus protocol of a store.
+    """
+    from .analyze import detect_onsets
+
+    if isinstance(fd, NpyStore):
+        # `.npy` directories and files in the live layout
+        keys = fd.frames
+        t, stimuli = fd.time, np.asarray(fd.stimuli[0])
+    else:
+        keys = _frame_numbers(fd, group)
+        frame = fd.get("{}/{}".format(group, keys[0]))
+        t, stimuli = frame["time"].values, frame["stimuli"].values
+
+    if stimuli.max() > 0:
+        onsets = detect_onsets(t, stimuli)
+    else:
+        onsets = []
+    return {
+        "n_frames": len(keys),
+        "first": int(keys[0]),
+        "last": int(keys[-1]),
+        "n_samples": len(t),
+        # plain floats, so fresh and reused rows of an incremental scan share dtypes
+        "fs": float(1.0 / np.median(np.diff(t))),
+        "n_pulses": len(onsets),
+        "interval": float(np.diff(onsets).mean()) if len(onsets) > 1 else np.nan,
+    }
+
+
+def _stat(path):
+    """
+    Size and modification time of a file, or of all the files of a directory store.
+    """
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    stats = [entry.stat() for entry in os.scandir(path) if entry.is_file()]
+    return (
+        sum(stat.st_size for stat in stats),
+        max((stat.st_mtime_ns for stat in stats), default=0),
+    )
+
+
+class Catalogue(object):
+    """
+    Per-file frame counts, sampling rates, stimulus protocols and condition labels of
+    converted trials.
+
+    File paths are relative to `root`, and the root is saved relative to the index
+    file, so the catalogue stays valid when the tree is moved along with it.
+
+    Args:
+        root (str): Directory the file paths are relative to.
+        files (DataFrame): One row per file, see `FILE_COLUMNS`.
+        labels (DataFrame): File, label and inclusive frame range of each entry.
+    """
+
+    def __init__(self, root, files, labels):
+        self.root = root
+        self.files = files
+        self.labels = labels
+
+    @classmethod
+    def scan(cls, root, pattern=".h5", group="/_frames", previous=None):
+        """
+        Index all the converted trials under a directory.
+
+        Args:
+            root (str): Directory to walk.
+            pattern (str, optional): File extension of the HDF5 trials, `.npy`
+                directory stores are recognized by their manifest.
+            group (str, optional): Frame group in every file.
+            previous (Catalogue, optional): Earlier catalogue of the same root, files
+                with unchanged size and modification time are not opened again.
+        """
+        import pandas as pd
+
+        known, known_labels = {}, {}
+        if previous is not None:
+            known = {row.file: row for row in previous.files.itertuples(index=False)}
+            for name, labels in previous.labels.groupby("file"):
+                known_labels[name] = labels
+
+        files, labels = [], []
+        with StorePool(max_open=1) as pool:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                # `.npy` directory stores are trials, not directories to walk
+                stores = [
+                    name
+                    for name in dirnames
+                    if is_npy_store(os.path.join(dirpath, name))
+                ]
+                dirnames[:] = [name for name in dirnames if name not in stores]
+                trials = stores + [
+                    filename
+                    for filename in filenames
+                    if filename.endswith(pattern) and filename != INDEX_NAME
+                ]
+                for filename in sorted(trials):
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, root).replace(os.sep, "/")
+                    size, mtime = _stat(path)
+
+                    row = known.get(name)
+                    if row is not None and row.size == size and row.mtime == mtime:
+                        logger.debug('"{}" unchanged'.format(name))
+                        files.append(row._asdict())
+                        if name in known_labels:
+                            labels.append(known_labels[name])
+                        continue
+
+                    fd = pool.get(path)
+                    if isinstance(fd, NpyStore):
+                        if len(fd.frames) == 0:
+                            logger.debug('"{}" has no frames, skipped'.format(name))
+                            continue
+                    elif group not in fd:
+                        logger.debug('"{}" has no frames, skipped'.format(name))
+                        continue
+                    logger.info('indexing "{}"'.format(name))
+                    entry = {"file": name, "size": size, "mtime": mtime}
+                    entry.update(_describe(fd, group))
+                    files.append(entry)
+
+                    entry_labels = _read_labels(fd)
+                    if len(entry_labels):
+                        labels.append(entry_labels.assign(file=name))
+
+        files = pd.DataFrame(files, columns=FILE_COLUMNS)
+        if labels:
+            labels = pd.concat(labels, ignore_index=True)
+        else:
+            labels = pd.DataFrame(columns=["label", "start", "end", "file"])
+        labels = labels[["file", "label", "start", "end"]].astype(
+            {"start": np.int64, "end": np.int64}
+        )
+        return cls(root, files, labels)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a catalogue.
+        """
+        import pandas as pd
+
+        with pd.HDFStore(path, mode="r") as fd:
+            files = fd.get("files")
+            labels = fd.get("labels")
+            root = fd.get_storer("files").attrs.root
+        root = os.path.join(os.path.dirname(os.path.abspath(path)), root)
+        return cls(os.path.normpath(root), files, labels)
+
+    def save(self, path=None):
+        """
+        Write the catalogue, default to `INDEX_NAME` under the root.
+        """
+        import pandas as pd
+
+        if path is None:
+            path = os.path.join(self.root, INDEX_NAME)
+        with pd.HDFStore(path, mode="w") as fd:
+            fd.put("files", self.files, format="fixed")
+            fd.put("labels", self.labels, format="fixed")
+            root = os.path.relpath(self.root, os.path.dirname(os.path.abspath(path)))
+            fd.get_storer("files").attrs.root = root
+        logger.info('catalogue written to "{}"'.format(path))
+        return path
+
+    def path(self, name):
+        """
+        Absolute path of a catalogued file.
+        """
+        return os.path.join(self.root, *name.split("/"))
+
+    def query(self, **conditions):
+        """
+        Select files by equality constraints, e.g. `query(n_pulses=2)`.
+
+        Returns:
+            (DataFrame): Matching rows of `files`.
+        """
+        mask = np.ones(len(self.files), dtype=bool)
+        for column, value in conditions.items():
+            if column not in self.files:
+                raise ValueError('unknown file property "{}"'.format(column))
+            mask &= (self.files[column] == value).values
+        return self.files[mask]
+
+    def ranges(self, label, **conditions):
+        """
+        Frame ranges with a condition label.
+
+        Args:
+            label (str): Condition label.
+            **conditions: Equality constraints on the file properties.
+
+        Returns:
+            (list): (path, (start, end)) of each range, ordered by file.
+        """
+        files = set(self.query(**conditions)["file"])
+        labels = self.labels[
+            (self.labels["label"] == label) & self.labels["file"].isin(files)
+        ]
+        if labels.empty:
+            raise ValueError('no frames labelled "{}"'.format(label))
+        labels = labels.sort_values(["file", "start"])
+        return [
+            (self.path(row.file), (int(row.start), int(row.end)))
+            for row in labels.itertuples(index=False)
+        ]
+
+    def __len__(self):
+        return len(self.files)
@@ -0,0 +1,125 @@
+"""
+Run an experiment specification over converted trials.
+"""
+import logging
+import os
+
+import click
+import coloredlogs
+
+from neubio import instrument
+from neubio.cache import FrameCache
+from neubio.experiment import load_spec, run_experiment
+from neubio.precision import PRECISIONS, set_precision
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.argument("spec", type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    help="Result table, default to SPEC with a .csv extension.",
+)
+@click.option(
+    "--cache",
+    "cache_dir",
+    type=click.Path(file_okay=False, resolve_path=True),
+    help="Directory to cache preprocessed frame ranges.",
+)
+@click.option(
+    "--cache-size",
+    type=int,
+    default=4096,
+    show_default=True,
+    help="Cache size budget in MiB.",
+)
+@click.option(
+    "--max-memory",
+    type=int,
+    default=None,
+    help="Stream frames in blocks within this budget in MiB, disables the cache.",
+)
+@click.option(
+    "--precision",
+    type=click.Choice(PRECISIONS),
+    default=None,
+    help="Working precision of the recordings, default to NEUBIO_PRECISION or float64.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print per-stage timing and memory to stderr.",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Report format of --profile.",
+)
+@click.option("-v", "--verbose", count=True)
+def main(
+    spec,
+    output,
+    cache_dir,
+    cache_size,
+    max_memory,
+    precision,
+    profile,
+    profile_format,
+    verbose,
+):
+    """
+    Extract EPSP features of all the frame ranges listed in SPEC.
+    """
+    if verbose == 0:
+        verbose = "WARNING"
+    elif verbose == 1:
+        verbose = "INFO"
+    else:
+        verbose = "DEBUG"
+    coloredlogs.install(
+        level=verbose, fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S"
+    )
+
+    if profile:
+        instrument.enable()
+    if precision:
+        set_precision(precision)
+
+    if output is None:
+        output, _ = os.path.splitext(spec)
+        output += ".csv"
+
+    try:
+        spec = load_spec(spec)
+    except (ImportError, ValueError) as err:
+        raise click.ClickException(str(err))
+    cache = None
+    if max_memory is not None:
+        if cache_dir is not None:
+            logger.warning("cache is not used in streaming mode")
+        max_memory <<= 20
+    elif cache_dir is not None:
+        cache = FrameCache(cache_dir, max_bytes=cache_size << 20)
+    try:
+        results = run_experiment(spec, cache=cache, max_memory=max_memory)
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    results.to_csv(output, index=False)
+    logger.info('results written to "{}"'.format(output))
+
+    # summary over accepted pulses
+    summary = (
+        results[results["valid"]]
+        .drop(columns=["frame", "valid"])
+        .groupby(["file", "label", "pulse"], sort=False)
+        .agg(["count", "mean", "std"])
+    )
+    click.echo(summary.to_string())
+
+    if profile:
+        instrument.dump(profile_format)
@@ -10,16 +10,17 @@ import warnings
 
 import click
 import coloredlogs
-import numpy as np
-import pandas as pd
-import tables
 
-warnings.simplefilter('ignore', tables.NaturalNameWarning)
+from neubio import instrument
+from neubio.instrument import stage
 
 logger = logging.getLogger(__name__)
 
 
-__all__ = ["read_signal3"]
+__all__ = ["iter_frame_batches", "parse_signal3", "read_signal3"]
+
+# column order of Signal3 exports
+COLUMNS = ("time", "response", "stimuli")
 
 
 def write_frame(fd, frame_no, df):
@@ -31,10 +32,16 @@ def write_frame(fd, frame_no, df):
         frame_no (int): Frame number.
         df (pandas.DataFrame): Recorded channel data.
     """
+    import tables
+
     g_name = "/_frames/{}".format(frame_no)
-    logger.info("writing {}".format(g_name))
+    logger.debug("writing {}".format(g_name))
     # df.to_hdf(fd, g_name)
-    fd.put(g_name, df, format="fixed")
+    with stage("write") as s, warnings.catch_warnings():
+        # frame numbers are not valid Python identifiers
+        warnings.simplefilter("ignore", tables.NaturalNameWarning)
+        fd.put(g_name, df, format="fixed")
+        s.add_bytes(df.values.nbytes)
 
 
 def scan_for_frames(path, header=r'".*\.cfs","Frame (\d+)"'):
@@ -44,10 +51,10 @@ def scan_for_frames(path, header=r'".*\.cfs","Frame (\d+)"'):
     Args:
         path (str): Signal3 exported ASCII file path.
         header (str): Header regular expression formula.
-    
+
     Yields:
         :rtype: (int, StringIO): Frame number and its extracted raw data string.
-    
+
     Note:
         The raw data string does not contain header.
     """
@@ -86,6 +93,81 @@ def scan_for_frames(path, header=r'".*\.cfs","Frame (\d+)"'):
                     state = ScannerState.SCANNING
 
 
+def _scan_frame_text(path, header=r'".*\.cfs","Frame (\d+)"', chunk_size=16 << 20):
+    """
+    Scan Signal3 frame structure in large chunks, counterpart of `scan_for_frames`
+    without a Python step per line.
+
+    Yields:
+        :rtype: (int, str): Frame number and its raw data string, without header.
+    """
+    header = re.compile("^" + header, re.MULTILINE)
+    blank = re.compile(r"\n[ \t]*\n")
+
+    buf, eof = "", False
+    with open(path, "r") as fd:
+        while not eof:
+            chunk = fd.read(chunk_size)
+            eof = not chunk
+            buf += chunk
+            pos = 0
+            while True:
+                match = header.search(buf, pos)
+                if match is None:
+                    break
+                # skip the header and the column names
+                i = buf.find("\n", match.end())
+                i = buf.find("\n", i + 1) if i >= 0 else -1
+                end = blank.search(buf, i) if i >= 0 else None
+                if end is not None:
+                    start, stop, pos = i + 1, end.start() + 1, end.end()
+                elif eof and i >= 0:
+                    # last frame without trailing blank line
+                    start, stop, pos = i + 1, len(buf), len(buf)
+                else:
+                    break
+                frame_no = int(match.group(1))
+                logger.debug("frame_{}: {} bytes".format(frame_no, stop - start))
+                yield frame_no, buf[start:stop]
+            buf = buf[pos:]
+
+
+def parse_signal3(path, sep=",", dtype="float32"):
+    """
+    Read Signal3 data file into NumPy arrays, without pandas.
+
+    Args:
+        path (str): Signal3 exported ASCII file path.
+        sep (str, optional): Separator used in the file. Default to ','
+        dtype (str, optional): Sample data type.
+
+    Yields:
+        :rtype: (int, ndarray): Frame number and its samples, shape (n_samples,
+            n_columns) with columns in file order.
+    """
+    import numpy as np
+
+    logger.debug(path)
+    logger.info("reading raw data")
+
+    frames = _scan_frame_text(path)
+    while True:
+        with stage("scan") as s:
+            try:
+                frame_no, text = next(frames)
+            except StopIteration:
+                break
+            s.add_bytes(len(text))
+        with stage("parse"):
+            try:
+                values = np.loadtxt(StringIO(text), delimiter=sep, dtype=dtype, ndmin=2)
+            except ValueError as err:
+                raise ValueError(
+                    "frame {} has malformed rows, {}".format(frame_no, err)
+                ) from None
+        yield frame_no, values
+
+
 def read_signal3(path, col_def, sep=","):
     """
     Read Signal3 data file.
@@ -94,22 +176,108 @@ def read_signal3(path, col_def, sep=","):
         path (str): Signal3 exported ASCII file path.
         col_def (dict): Desired column name and data format.
         sep (str, optional): Separator used in the file. Default to ','
-    
+
     Yields:
         :rtype: (int, DataFrame): Frame number and its parsed DataFrame.
     """
-    logger.debug(path)
-    logger.info("reading raw data")
+    import numpy as np
+    import pandas as pd
+
+    dtype = np.result_type(*col_def.values())
+    for frame_no, data in parse_signal3(path, sep=sep, dtype=dtype):
+        df = pd.DataFrame(data, columns=list(col_def.keys()))
+        yield frame_no, df.astype(col_def)
+
+
+def iter_frame_batches(frames, batch_size=256, columns=COLUMNS):
+    """
+    Gather parsed frames into batches of frame matrices.
 
-    for frame_no, data in scan_for_frames(path):
-        df = pd.read_csv(data, sep=sep, names=col_def.keys(), dtype=col_def)
-        yield frame_no, df
+    Args:
+        frames (iterable): Frame number and samples of each frame, see
+            `parse_signal3`.
+        batch_size (int, optional): Maximum number of frames per batch.
+        columns (tuple, optional): Column names in file order.
+
+    Yields:
+        :rtype: (ndarray, ndarray, ndarray, ndarray): Frame numbers, timestamps of
+            the first frame, stimuli and response matrices of a batch, the matrices
+            are reused by the next batch.
+    """
+    import numpy as np
+
+    if batch_size < 1:
+        raise ValueError("batch size must be positive")
+    i_time, i_stimuli, i_response = (
+        columns.index(name) for name in ("time", "stimuli", "response")
+    )
+
+    numbers, time, stimuli, response = [], None, None, None
+    for frame_no, data in frames:
+        if time is None:
+            time = data[:, i_time].copy()
+            shape = (batch_size, len(time))
+            stimuli = np.empty(shape, dtype=data.dtype)
+            response = np.empty(shape, dtype=data.dtype)
+        elif len(data) != len(time):
+            raise ValueError(
+                "frame {} has {} samples, expecting {}".format(
+                    frame_no, len(data), len(time)
+                )
+            )
+        k = len(numbers)
+        stimuli[k], response[k] = data[:, i_stimuli], data[:, i_response]
+        numbers.append(frame_no)
+        if len(numbers) == batch_size:
+            yield np.array(numbers), time, stimuli, response
+            numbers = []
+    if numbers:
+        k = len(numbers)
+        yield np.array(numbers), time, stimuli[:k], response[:k]
 
 
 @click.command()
 @click.argument("path", type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.option(
+    "-f",
+    "--format",
+    "fmt",
+    type=click.Choice(["hdf5", "matrix", "npy", "swmr"]),
+    default="hdf5",
+    show_default=True,
+    help="Output format, hdf5 writes one pandas table per frame, frame by frame. "
+    "matrix and swmr write frame matrices to an HDF5 file in batches, swmr makes the "
+    "frames visible to readers while it is written. npy writes a memory-mappable "
+    "directory next to PATH.",
+)
+@click.option(
+    "--flush-every",
+    type=int,
+    default=16,
+    show_default=True,
+    help="Frames made visible to readers at once, swmr only.",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=256,
+    show_default=True,
+    help="Frames parsed and written at once, hdf5 writes one frame at a time.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print per-stage timing and memory to stderr.",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Report format of --profile.",
+)
 @click.option("-v", "--verbose", count=True)
-def main(path, verbose):
+def main(path, fmt, flush_every, batch_size, profile, profile_format, verbose):
     if verbose == 0:
         verbose = "WARNING"
     elif verbose == 1:
@@ -120,11 +288,39 @@ def main(path, verbose):
         level=verbose, fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S"
     )
 
-    col_def = {"time": np.float32, "response": np.float32, "stimuli": np.float32}
-    frames = read_signal3(path, col_def)
+    if profile:
+        instrument.enable()
 
     dst_root, _ = os.path.splitext(path)
-    path = dst_root + ".h5"
-    with pd.HDFStore(path) as fd:
-        for frame_no, df in frames:
-            write_frame(fd, frame_no, df)
+    if fmt != "hdf5":
+        from neubio.io import LiveFrameWriter, NpyFrameWriter
+
+        # frame matrices are written without pandas
+        if fmt == "npy":
+            writer = NpyFrameWriter(dst_root)
+        elif fmt == "swmr":
+            writer = LiveFrameWriter(dst_root + ".h5", flush_every=flush_every)
+            # readers see the frames batch by batch
+            batch_size = min(batch_size, flush_every)
+        else:
+            writer = LiveFrameWriter(dst_root + ".h5", flush_every=batch_size)
+        frames = parse_signal3(path, dtype="float32")
+        try:
+            with writer as fd:
+                for batch in iter_frame_batches(frames, batch_size=batch_size):
+                    fd.write_batch(*batch)
+        except ValueError as err:
+            raise click.ClickException(str(err))
+    else:
+        import pandas as pd
+
+        # pandas stores one table per frame, there is no batched write
+        col_def = {"time": "float32", "response": "float32", "stimuli": "float32"}
+        frames = read_signal3(path, col_def)
+        path = dst_root + ".h5"
+        with pd.HDFStore(path) as fd:
+            for frame_no, df in frames:
+                write_frame(fd, frame_no, df)
+
+    if profile:
+        instrument.dump(profile_format)
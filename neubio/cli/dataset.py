@@ -7,16 +7,28 @@ import os
 
 import click
 import coloredlogs
-import h5py
-import matplotlib.pyplot as plt
-import pandas as pd
+
+from neubio import instrument
 
 logger = logging.getLogger(__name__)
 
 
 @click.group()
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print per-stage timing and memory to stderr.",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Report format of --profile.",
+)
 @click.option("-v", "--verbose", count=True)
-def main(verbose):
+@click.pass_context
+def main(ctx, profile, profile_format, verbose):
     if verbose == 0:
         verbose = "WARNING"
     elif verbose == 1:
@@ -27,6 +39,10 @@ def main(verbose):
         level=verbose, fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S"
     )
 
+    if profile:
+        instrument.enable()
+        ctx.call_on_close(lambda: instrument.dump(profile_format))
+
 
 @main.command()
 @click.argument("path", type=click.Path(exists=True, dir_okay=False, resolve_path=True))
@@ -34,8 +50,10 @@ def main(verbose):
 @click.argument("new_key", type=str, metavar="KEY")
 def regroup(path, index, new_key):
     """
-    Group datasets in INDEX range into new group KEY. 
+    Group datasets in INDEX range into new group KEY.
     """
+    import h5py
+
     start, end = index
     with h5py.File(path, "r+") as fd:
         if new_key not in fd:
@@ -48,6 +66,168 @@ def regroup(path, index, new_key):
                 logger.warning('dataset "{}" does not exists'.format(key))
 
 
+@main.command()
+@click.argument("path", type=click.Path(exists=True, resolve_path=True))
+@click.argument("index", type=(int, int))
+@click.argument("label", type=str)
+@click.option("--replace", is_flag=True, help="Drop existing ranges of LABEL.")
+def label(path, index, label, replace):
+    """
+    Label frames in INDEX range with condition LABEL.
+    """
+    from neubio.io import read_labels, write_label
+
+    try:
+        write_label(path, index, label, replace=replace)
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    for row in read_labels(path).itertuples(index=False):
+        click.echo("{:<16} {:>6} -> {}".format(row.label, row.start, row.end))
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, resolve_path=True))
+@click.option("-i", "--index", type=(int, int), help="Frame range, default to all.")
+@click.option("--condition", type=str, help="Condition name.")
+@click.option("--drug", type=str, help="Applied drug.")
+@click.option("--calcium", type=float, help="[Ca2+] in mM.")
+@click.option("--intensity", type=float, help="Stimulus intensity.")
+@click.option(
+    "--interval",
+    type=float,
+    help="Seconds between sweeps, sets the sweep timestamps.",
+)
+def annotate(path, index, condition, drug, calcium, intensity, interval):
+    """
+    Set metadata of the frames in PATH, used by selection queries.
+    """
+    from neubio.io import annotate
+
+    values = {
+        "condition": condition,
+        "drug": drug,
+        "calcium": calcium,
+        "intensity": intensity,
+    }
+    values = {name: value for name, value in values.items() if value is not None}
+    if not values and interval is None:
+        raise click.ClickException("nothing to annotate")
+    try:
+        table = annotate(path, index=index, interval=interval, **values)
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    summary = table.groupby(
+        ["condition", "drug", "calcium", "intensity"], dropna=False
+    )["frame"].agg(["min", "max", "count"])
+    click.echo(summary.to_string())
+
+
+@main.command()
+@click.argument(
+    "root", type=click.Path(exists=True, file_okay=False, resolve_path=True)
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    help="Index file, default to catalogue.h5 under ROOT.",
+)
+@click.option("--rebuild", is_flag=True, help="Open every file, even unchanged ones.")
+def catalogue(root, output, rebuild):
+    """
+    Index all the converted trials under ROOT.
+    """
+    from neubio.catalogue import INDEX_NAME, Catalogue
+
+    index_path = output or os.path.join(root, INDEX_NAME)
+    previous = None
+    if not rebuild and os.path.exists(index_path):
+        previous = Catalogue.load(index_path)
+        if previous.root != root:
+            previous = None
+    catalogue = Catalogue.scan(root, previous=previous)
+    catalogue.save(index_path)
+
+    labels = catalogue.labels.groupby("label")["file"].nunique()
+    click.echo("{} files, {} labels".format(len(catalogue), len(labels)))
+    for name, n_files in labels.items():
+        click.echo("  {:<16} {} files".format(name, n_files))
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, resolve_path=True))
+@click.option("-i", "--index", type=(int, int), help="Frame range, default to all.")
+@click.option("--tmax", type=float, default=0.1, show_default=True)
+@click.option("--line-freq", type=float, default=60.0, show_default=True)
+@click.option(
+    "--n-mad",
+    type=float,
+    default=5.0,
+    show_default=True,
+    help="Outlier limit of metrics without absolute limit.",
+)
+@click.option(
+    "-l",
+    "--limit",
+    "limits",
+    type=(str, float),
+    multiple=True,
+    help="Absolute limit of a metric, e.g. -l baseline_rms 0.05, repeatable.",
+)
+@click.option("--dry-run", is_flag=True, help="Report without storing the mask.")
+def qc(path, index, tmax, line_freq, n_mad, limits, dry_run):
+    """
+    Screen frames in PATH and store the reject mask.
+    """
+    from neubio.qc import screen
+
+    try:
+        table = screen(
+            path,
+            index=index,
+            tmax=tmax,
+            line_freq=line_freq,
+            thresholds=dict(limits),
+            n_mad=n_mad,
+            write=not dry_run,
+        )
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    rejected = table[table["reject"]]
+    click.echo("{} of {} frames rejected".format(len(rejected), len(table)))
+    if len(rejected):
+        click.echo(rejected.to_string(index=False))
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, resolve_path=True))
+@click.option("-i", "--index", type=(int, int), help="Frame range, default to all.")
+@click.option("-c", "--crop", type=(float, float), help="Timestamp range to show.")
+@click.option("--qc", is_flag=True, help="Leave out rejected frames.")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    help="Save the figure instead of showing it.",
+)
+def overview(path, index, crop, qc, output):
+    """
+    Overlay and heatmap of all the frames in PATH.
+    """
+    import matplotlib.pyplot as plt
+
+    from neubio.viz import overview
+
+    try:
+        fig = overview(path, index=index, crop=crop, qc=qc)
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    if output:
+        fig.savefig(output, dpi=150)
+    else:
+        plt.show()
+
+
 @main.command()
 @click.argument("path")
 @click.argument("group")
@@ -57,6 +237,10 @@ def preview(path, group, start, end):
     """
     Preview all the frames in GROUP.
     """
+    import h5py
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
     # fig, ax = plt.subplots()
     # fig.canvas.mpl_connect('key_press_event', press)
 
@@ -76,7 +260,7 @@ def preview(path, group, start, end):
 
     with pd.HDFStore(path) as fd:
         fig, ax = plt.subplots()
-        h, = ax.plot([], [])
+        (h,) = ax.plot([], [])
 
         def update_plot(index):
             logger.info(index)
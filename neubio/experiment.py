@@ -0,0 +1,250 @@
+"""
+Declarative experiment specification and batched runner.
+
+A specification lists the converted trials, labelled frame ranges, the filter chain
+and the EPSP features to extract, e.g. in TOML
+
+    [filter]
+    fs = 10e3
+    lowpass = 1e3
+    # "blank", "interp" or "template"
+    artifact = "interp"
+
+    [analysis]
+    pulses = 2
+    features = ["amplitude", "slope", "ratio"]
+    # leave out frames rejected by `dataset qc`
+    qc = true
+
+    [[files]]
+    path = "02_calcium/trial_1.h5"
+    ranges = { "0.5" = [301, 355], "2.5" = [247, 300] }
+"""
+import copy
+import logging
+import os
+
+import numpy as np
+
+from .analyze import detect_onsets, epsp_features, iter_preprocessed, pulse_train
+from .cache import load_preprocessed
+from .filter import ARTIFACT_METHODS
+
+__all__ = ["load_spec", "run_experiment"]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPEC = {
+    "filter": {
+        "fs": 10e3,
+        "lowpass": 1e3,
+        "notch": None,
+        "baseline": 0.1,
+        "artifact": None,
+        "artifact_width": 0.002,
+    },
+    "analysis": {
+        "crop": [0.1, 0.15],
+        "pulses": None,
+        "window": None,
+        "delay": 0.005,
+        "pct": 0.2,
+        "r_min": 0.7,
+        "features": ["amplitude", "slope"],
+        "qc": False,
+    },
+    "files": [],
+}
+
+FEATURES = ("amplitude", "slope", "r", "ratio")
+
+
+def _read_spec_file(path):
+    _, ext = os.path.splitext(path)
+    ext = ext.lower()
+    if ext in (".yml", ".yaml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("YAML specification requires PyYAML")
+        with open(path, "r") as fd:
+            return yaml.safe_load(fd)
+    elif ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError(
+                    "TOML specification requires tomli before Python 3.11"
+                )
+        with open(path, "rb") as fd:
+            return tomllib.load(fd)
+    else:
+        raise ValueError('unknown specification format "{}"'.format(ext))
+
+
+def load_spec(path):
+    """
+    Load an experiment specification and fill in the defaults.
+
+    Args:
+        path (str): Path to a TOML or YAML specification, trial paths are relative to
+            its directory.
+
+    Returns:
+        (dict): Normalized specification.
+    """
+    raw = _read_spec_file(path) or {}
+
+    spec = copy.deepcopy(DEFAULT_SPEC)
+    for section in ("filter", "analysis"):
+        options = raw.get(section, {})
+        unknown = set(options) - set(spec[section])
+        if unknown:
+            raise ValueError(
+                "unknown options in [{}]: {}".format(
+                    section, ", ".join(sorted(unknown))
+                )
+            )
+        spec[section].update(options)
+
+    unknown = set(spec["analysis"]["features"]) - set(FEATURES)
+    if unknown:
+        raise ValueError("unknown features: {}".format(", ".join(sorted(unknown))))
+    artifact = spec["filter"]["artifact"]
+    if artifact and artifact not in ARTIFACT_METHODS:
+        raise ValueError('unknown artifact method "{}"'.format(artifact))
+
+    root = os.path.dirname(os.path.abspath(path))
+    for entry in raw.get("files", []):
+        if not os.path.exists(os.path.join(root, entry["path"])):
+            raise ValueError('"{}" does not exist'.format(entry["path"]))
+        ranges = entry.get("ranges", {})
+        if not ranges:
+            logger.warning('"{}" has no frame range'.format(entry["path"]))
+        spec["files"].append(
+            {
+                "path": os.path.join(root, entry["path"]),
+                "ranges": {str(k): tuple(v) for k, v in ranges.items()},
+            }
+        )
+    if not spec["files"]:
+        raise ValueError("no file is specified")
+
+    return spec
+
+
+def _analyze_range(t, stim, rec, rec_filt, spec):
+    """
+    Run the batched feature extraction over a preprocessed frame range.
+
+    Returns:
+        (dict): Per-pulse feature columns, each shaped (n_frames, n_pulses).
+    """
+    a_opts = spec["analysis"]
+
+    if a_opts["pulses"]:
+        onsets = detect_onsets(t, stim, n_pulses=a_opts["pulses"])
+        train = pulse_train(
+            t,
+            rec,
+            onsets,
+            yf=rec_filt,
+            width=a_opts["window"],
+            delay=a_opts["delay"],
+            pct=a_opts["pct"],
+            r_min=a_opts["r_min"],
+        )
+        columns = {
+            "amplitude": train.amplitude,
+            "slope": train.slope,
+            "r": train.r,
+            "valid": train.valid,
+        }
+        if "ratio" in a_opts["features"]:
+            for name in ("amplitude", "slope"):
+                ratio, mask = train.ratio(name)
+                columns[name + "_ratio"] = np.where(mask, ratio, np.nan)
+    else:
+        f = epsp_features(t, rec, yf=rec_filt, delay=a_opts["delay"], pct=a_opts["pct"])
+        with np.errstate(invalid="ignore"):
+            valid = f.valid & (np.abs(f.r) >= a_opts["r_min"])
+        columns = {
+            "amplitude": f.amplitude,
+            "slope": f.slope,
+            "r": f.r,
+            "valid": valid,
+        }
+        columns = {k: v[:, np.newaxis] for k, v in columns.items()}
+
+    return columns
+
+
+def _iter_range(path, index, spec, cache=None, max_memory=None):
+    """
+    Preprocessed blocks of a frame range, the whole range at once unless `max_memory`
+    is given.
+    """
+    f_opts, a_opts = spec["filter"], spec["analysis"]
+    kwargs = {
+        "index": index,
+        "fs": f_opts["fs"],
+        "lo_cutoff": f_opts["lowpass"],
+        # pulse windows are located on the full recording
+        "crop": None if a_opts["pulses"] else a_opts["crop"],
+        "tmax": f_opts["baseline"],
+        "notch": f_opts["notch"],
+        "artifact": f_opts["artifact"],
+        "artifact_width": f_opts["artifact_width"],
+        "qc": a_opts["qc"],
+    }
+    if max_memory is None:
+        yield load_preprocessed(path, cache=cache, **kwargs)
+    else:
+        yield from iter_preprocessed(path, max_memory=max_memory, **kwargs)
+
+
+def run_experiment(spec, cache=None, max_memory=None):
+    """
+    Run an experiment specification.
+
+    Args:
+        spec (dict): Specification from `load_spec`.
+        cache (FrameCache, optional): Cache of preprocessed frame ranges.
+        max_memory (int, optional): Stream frame ranges in blocks within this budget
+            in bytes, `cache` is not used.
+
+    Returns:
+        (DataFrame): One row per pulse of each frame.
+    """
+    import pandas as pd
+
+    features = spec["analysis"]["features"]
+
+    tables = []
+    for entry in spec["files"]:
+        path = entry["path"]
+        for label, index in entry["ranges"].items():
+            logger.info('analyzing "{}" {} ({}->{})'.format(path, label, *index))
+            blocks = _iter_range(path, index, spec, cache, max_memory)
+            for t, stim, rec, rec_filt, frames in blocks:
+                columns = _analyze_range(t, stim, rec, rec_filt, spec)
+
+                n_frames, n_pulses = columns["valid"].shape
+                table = {
+                    "file": os.path.basename(path),
+                    "label": label,
+                    "frame": np.repeat(frames, n_pulses),
+                    "pulse": np.tile(np.arange(n_pulses), n_frames),
+                }
+                for name, values in columns.items():
+                    if name in ("amplitude", "slope", "r") and name not in features:
+                        continue
+                    table[name] = values.ravel()
+                tables.append(pd.DataFrame(table))
+
+    if not tables:
+        raise ValueError("no frame is selected")
+    return pd.concat(tables, ignore_index=True)
@@ -1,13 +1,47 @@
 import logging
 
 import numpy as np
-from scipy.signal import butter, filtfilt, iirnotch
 
-__all__ = ["ac_notch", "butter_hpf", "butter_lpf", "subtract_baseline", "t_crop"]
+from .instrument import instrument
+from .precision import cast, is_single, row_blocks
+
+__all__ = [
+    "ARTIFACT_METHODS",
+    "ac_notch",
+    "butter_hpf",
+    "butter_lpf",
+    "estimate_artifact_template",
+    "preprocess",
+    "remove_artifact",
+    "subtract_baseline",
+    "t_crop",
+]
 
 logger = logging.getLogger(__name__)
 
+ARTIFACT_METHODS = ("blank", "interp", "template")
+
+
+def _filtfilt(b, a, data):
+    """
+    Zero-phase filter along the last axis, single precision batches are filtered in
+    double precision row blocks and stored back in single precision.
+    """
+    from scipy.signal import filtfilt
+
+    data = cast(data)
+    if not is_single() or data.ndim < 2:
+        y = filtfilt(b, a, data)
+        return y.astype(np.float32) if is_single() else y
+
+    y = np.empty(data.shape, dtype=np.float32)
+    rows, out = data.reshape(-1, data.shape[-1]), y.reshape(-1, data.shape[-1])
+    for block in row_blocks(data.shape):
+        out[block] = filtfilt(b, a, rows[block])
+    return y
+
 
+@instrument("filter")
 def ac_notch(data, fs, f0=60, Q=30.0):
     """
     Notch filter designed for common AC harmonics.
@@ -18,61 +52,68 @@ def ac_notch(data, fs, f0=60, Q=30.0):
         f0 (float, optional): Frequency to remove. Default to 60 Hz.
         Q (float, optional): Quality factor.
     """
+    from scipy.signal import iirnotch
+
     nyq = 0.5 * fs
     norm_f0 = f0 / nyq
     b, a = iirnotch(norm_f0, Q, fs)
-    y = filtfilt(b, a, data)
-    return y
+    return _filtfilt(b, a, data)
 
 
 def butter_highpass(cutoff, fs, order=5):
+    from scipy.signal import butter
+
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
     b, a = butter(order, normal_cutoff, btype="high", analog=False)
     return b, a
 
 
+@instrument("filter")
 def butter_hpf(data, cutoff, fs, order=5):
     b, a = butter_highpass(cutoff, fs, order=order)
-    y = filtfilt(b, a, data)
-    return y
+    return _filtfilt(b, a, data)
 
 
 def butter_lowpass(cutoff, fs, order=5):
+    from scipy.signal import butter
+
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
     b, a = butter(order, normal_cutoff, btype="low", analog=False)
     return b, a
 
 
+@instrument("filter")
 def butter_lpf(data, cutoff, fs, order=5):
     b, a = butter_lowpass(cutoff, fs, order=order)
-    y = filtfilt(b, a, data)
-    return y
+    return _filtfilt(b, a, data)
 
 
+@instrument("baseline")
 def subtract_baseline(t, y, tmax=0.1):
     """
-    Using recordings prior to the stimulus as baseline. Subtract the entire dataseries 
+    Using recordings prior to the stimulus as baseline. Subtract the entire dataseries
     using that baseline to zero the offset.
 
     Args:
         t (ndarray): Timestamp array.
-        y (ndarray): Recording data.
+        y (ndarray): Recording data, batches are stacked along the leading axes.
         tmax (float): Delay till the stimulus occur.
     """
     i = np.argmax(t >= tmax)
-    yb = np.median(y[:i])
+    yb = np.median(y[..., :i], axis=-1, keepdims=True)
     return y - yb
 
 
+@instrument("crop")
 def t_crop(t, y, trange):
     """
     Crop recording by timestamp range.
 
     Args:
         t (ndarray): Timestamp array.
-        y (ndarray): Recording data.
+        y (ndarray): Recording data, batches are stacked along the leading axes.
         trange: Timestamp range, (start, end).
     """
     try:
@@ -80,5 +121,137 @@ def t_crop(t, y, trange):
         imin, imax = np.argmax(t >= tmin), np.argmax(t >= tmax) + 1
     except ValueError:
         imin, imax = np.argmax(t >= trange), -1
-    return t[imin:imax], y[imin:imax]
+    return t[imin:imax], y[..., imin:imax]
+
+
+def _artifact_windows(t, onsets, width, pre):
+    """
+    First sample and length of the artifact window after each onset, windows without
+    a sample on both sides are dropped.
+    """
+    dt = (t[-1] - t[0]) / (len(t) - 1)
+    n = int(round((pre + width) / dt))
+    starts = np.searchsorted(t, np.asarray(onsets, dtype=np.float64) - pre)
+    inside = (starts >= 1) & (starts + n < len(t))
+    if not inside.all():
+        logger.warning(
+            "{} artifact windows out of the recording".format((~inside).sum())
+        )
+    return starts[inside], n
+
+
+def _artifact_segments(t, y, onsets, width=0.002, pre=0.0002):
+    """
+    Artifact windows of every recording and onset relative to the preceding sample,
+    shape (n_windows, n_samples).
+    """
+    starts, n = _artifact_windows(t, onsets, width, pre)
+    if len(starts) == 0:
+        raise ValueError("no artifact window in the recording")
+    idx = starts[:, np.newaxis] + np.arange(n)
+    y = np.asarray(y)
+    segments = y[..., idx] - y[..., starts - 1][..., np.newaxis]
+    return segments.reshape(-1, n)
+
+
+def estimate_artifact_template(t, y, onsets, width=0.002, pre=0.0002):
+    """
+    Estimate the stimulus artifact waveform of a condition.
+
+    The template is the median over all the recordings and onsets, relative to the
+    sample preceding each window.
+
+    Args:
+        t (ndarray): Timestamp array.
+        y (ndarray): Raw recordings, batches are stacked along the leading axes.
+        onsets (ndarray): Stimulus onset timestamps.
+        width (float, optional): Duration of the artifact after the onset.
+        pre (float, optional): Duration before the onset included in the window.
+
+    Returns:
+        (ndarray): Artifact template.
+    """
+    return np.median(_artifact_segments(t, y, onsets, width, pre), axis=0)
+
+
+@instrument("artifact")
+def remove_artifact(
+    t, y, onsets, width=0.002, pre=0.0002, method="interp", template=None
+):
+    """
+    Remove stimulus artifacts from a batch of recordings.
+
+    Every onset of every recording is handled at once, "blank" holds the sample before
+    the window, "interp" bridges the window linearly, and "template" subtracts a
+    template from `estimate_artifact_template`.
+
+    Args:
+        t (ndarray): Timestamp array.
+        y (ndarray): Raw recordings, batches are stacked along the leading axes.
+        onsets (ndarray): Stimulus onset timestamps.
+        width (float, optional): Duration of the artifact after the onset.
+        pre (float, optional): Duration before the onset included in the window.
+        method (str, optional): One of `ARTIFACT_METHODS`.
+        template (ndarray, optional): Artifact template, estimated from `y` if None.
+
+    Returns:
+        (ndarray): Recordings without artifacts.
+    """
+    if method not in ARTIFACT_METHODS:
+        raise ValueError(
+            'unknown artifact method "{}", expecting one of {}'.format(
+                method, ", ".join(ARTIFACT_METHODS)
+            )
+        )
+    y = np.array(y, dtype=np.result_type(y, np.float32))
+    starts, n = _artifact_windows(t, onsets, width, pre)
+    if len(starts) == 0:
+        return y
+    idx = starts[:, np.newaxis] + np.arange(n)
+    y0 = y[..., starts - 1][..., np.newaxis]
+
+    if method == "blank":
+        y[..., idx] = y0
+    elif method == "interp":
+        y1 = y[..., starts + n][..., np.newaxis]
+        w = np.arange(1, n + 1) / (n + 1)
+        y[..., idx] = y0 + (y1 - y0) * w
+    else:
+        if template is None:
+            template = estimate_artifact_template(t, y, onsets, width=width, pre=pre)
+        elif len(template) != n:
+            raise ValueError(
+                "template has {} samples, expecting {}".format(len(template), n)
+            )
+        y[..., idx] -= template
+    return y
+
+
+def preprocess(t, y, fs, lo_cutoff=1e3, crop=None, tmax=0.1):
+    """
+    Filter, subtract baseline and crop a batch of recordings.
+
+    Args:
+        t (ndarray): Timestamp array.
+        y (ndarray): Raw recordings, time on the last axis.
+        fs (float): Sampling frequency.
+        lo_cutoff (float, optional): LPF cutoff frequency.
+        crop (tuple, optional): Timestamp range to keep, timestamps are offset to zero.
+        tmax (float, optional): Delay till the stimulus occur.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            y (ndarray): Baseline subtracted recordings.
+            y_filt (ndarray): Filtered and baseline subtracted recordings.
+    """
+    y = cast(y)
+    y_filt = subtract_baseline(t, butter_lpf(y, lo_cutoff, fs), tmax=tmax)
+    y = subtract_baseline(t, y, tmax=tmax)
+
+    if crop is not None:
+        _, y_filt = t_crop(t, y_filt, crop)
+        t, y = t_crop(t, y, crop)
+        t = t - t[0]
 
+    return t, y, y_filt
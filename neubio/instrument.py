@@ -0,0 +1,255 @@
+"""
+Per-stage timing and memory instrumentation.
+
+Instrumentation is disabled by default, a disabled stage costs one flag check.
+
+    enable()
+    with stage("load") as s:
+        s.add_bytes(n)
+    print(summary_table())
+"""
+from collections import OrderedDict
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+__all__ = [
+    "disable",
+    "dump",
+    "enable",
+    "instrument",
+    "is_enabled",
+    "report",
+    "reset",
+    "stage",
+    "summary_table",
+]
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+_stats = OrderedDict()
+_lock = threading.Lock()
+# nesting depth of the active stages, per thread
+_local = threading.local()
+
+
+def _peak_rss():
+    """Peak resident set size of the process in bytes."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class _StageStats(object):
+    __slots__ = ("calls", "wall", "cpu", "bytes", "rss_growth", "peak_rss")
+
+    def __init__(self):
+        self.calls, self.wall, self.cpu, self.bytes = 0, 0.0, 0.0, 0
+        self.rss_growth, self.peak_rss = 0, 0
+
+
+def _active():
+    try:
+        return _local.active
+    except AttributeError:
+        _local.active = {}
+        return _local.active
+
+
+class _Stage(object):
+    __slots__ = ("name", "_wall", "_cpu", "_bytes", "_depth", "_rss")
+
+    def __init__(self, name):
+        self.name = name
+        self._bytes = 0
+
+    def add_bytes(self, n):
+        self._bytes += int(n)
+
+    def __enter__(self):
+        # nested stages of the same name are only accounted once
+        active = _active()
+        self._depth = active.get(self.name, 0)
+        active[self.name] = self._depth + 1
+        self._rss = _peak_rss()
+        self._wall, self._cpu = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        rss = _peak_rss()
+        _active()[self.name] = self._depth
+
+        with _lock:
+            stats = _stats.get(self.name)
+            if stats is None:
+                stats = _stats[self.name] = _StageStats()
+            stats.bytes += self._bytes
+            if self._depth == 0:
+                stats.calls += 1
+                stats.wall += wall
+                stats.cpu += cpu
+            if rss is not None:
+                if self._depth == 0:
+                    stats.rss_growth += rss - self._rss
+                stats.peak_rss = max(stats.peak_rss, rss)
+        return False
+
+
+class _NullStage(object):
+    __slots__ = ()
+
+    def add_bytes(self, n):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def disable():
+    enable(False)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def stage(name):
+    """
+    Context manager accounting the enclosed block to stage `name`.
+
+    Args:
+        name (str): Stage name, e.g. "load", "filter" or "peak".
+    """
+    return _Stage(name) if _enabled else _NULL_STAGE
+
+
+def instrument(name):
+    """
+    Decorator accounting every call of the function to stage `name`.
+
+    Args:
+        name (str): Stage name.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def report():
+    """
+    Collected statistics by stage.
+
+    CPU time is that of the thread running the stage, work of other threads during
+    the stage, e.g. blocks read ahead or BLAS and Numba thread pools, is left out.
+    The resident set size is only known as the peak of the whole process, `rss_growth`
+    is how much the stage raised that peak, `peak_rss` the process peak by the end of
+    the stage, which includes the memory of every earlier stage.
+
+    Returns:
+        (dict): Stage name to calls, wall and CPU time (s), bytes, peak RSS growth
+            and process peak RSS (bytes).
+    """
+    return OrderedDict(
+        (
+            name,
+            {
+                "calls": s.calls,
+                "wall": s.wall,
+                "cpu": s.cpu,
+                "bytes": s.bytes,
+                "rss_growth": s.rss_growth,
+                "peak_rss": s.peak_rss,
+            },
+        )
+        for name, s in list(_stats.items())
+    )
+
+
+def summary_table():
+    """
+    Collected statistics formatted as a table.
+    """
+    lines = [
+        "{:<10} {:>9} {:>10} {:>10} {:>12} {:>10} {:>12} {:>12}".format(
+            "stage",
+            "calls",
+            "wall (s)",
+            "cpu (s)",
+            "per call",
+            "MiB",
+            "peak +MiB",
+            "process MiB",
+        )
+    ]
+    for name, s in report().items():
+        per_call = s["wall"] / s["calls"] if s["calls"] else 0
+        lines.append(
+            "{:<10} {:>9} {:>10.4f} {:>10.4f} {:>10.1f}us {:>10.2f} {:>12.1f} "
+            "{:>12.1f}".format(
+                name,
+                s["calls"],
+                s["wall"],
+                s["cpu"],
+                1e6 * per_call,
+                s["bytes"] / (1 << 20),
+                s["rss_growth"] / (1 << 20),
+                s["peak_rss"] / (1 << 20),
+            )
+        )
+    return "\n".join(lines)
+
+
+def dump(fmt="table", file=None):
+    """
+    Write collected statistics.
+
+    Args:
+        fmt (str, optional): Either "table" or "json".
+        file (file, optional): Output stream, default to stderr.
+    """
+    if file is None:
+        file = sys.stderr
+    if fmt == "json":
+        json.dump(report(), file, indent=2)
+        file.write("\n")
+    else:
+        file.write(summary_table() + "\n")
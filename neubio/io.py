@@ -1,45 +1,1514 @@
+from collections import OrderedDict
+import json
 import logging
 import os
+import queue
+import threading
 
 import numpy as np
-import pandas as pd
 
-__all__ = ["load_frame_group"]
+from .instrument import stage
+from .precision import cast
+
+__all__ = [
+    "FrameIndex",
+    "NpyFrameWriter",
+    "LiveFrameWriter",
+    "LiveReader",
+    "META_COLUMNS",
+    "NpyStore",
+    "Prefetcher",
+    "StorePool",
+    "annotate",
+    "is_live_file",
+    "is_npy_store",
+    "iter_frame_blocks",
+    "load_frame_group",
+    "load_frames",
+    "load_label",
+    "query_frames",
+    "read_labels",
+    "read_meta",
+    "read_qc",
+    "rejected_frames",
+    "select",
+    "write_label",
+    "write_meta",
+    "write_qc",
+]
 
 logger = logging.getLogger(__name__)
 
+LABELS_KEY = "/_labels"
+QC_KEY = "/_qc"
+META_KEY = "/_meta"
+
+MANIFEST_NAME = "manifest.json"
+QC_NAME = "qc.npz"
+LABELS_NAME = "labels.npz"
+META_NAME = "meta.npz"
+NPY_STORE_VERSION = 1
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# fixed header size of the frame matrices, a multiple of 64 bytes
+NPY_HEADER_SIZE = 128
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+LIVE_LAYOUT = "neubio-swmr"
+LIVE_LAYOUT_VERSION = 1
+# per-frame metadata and the value of frames not annotated, sweep timestamp (t) in
+# seconds and [Ca2+] in mM
+META_COLUMNS = OrderedDict(
+    [
+        ("condition", ""),
+        ("drug", ""),
+        ("calcium", np.nan),
+        ("t", np.nan),
+        ("intensity", np.nan),
+    ]
+)
+# blocks read ahead of the consumer by default
+PREFETCH_DEPTH = 2
+
+
+def _frame_numbers(fd, group="/_frames"):
+    """
+    Sorted frame numbers stored under a group.
+    """
+    _, _, keys = zip(*fd.walk(group))
+    return sorted(int(key) for key in keys[0])
+
+
+def _iter_frames(fd, group="/_frames", index=None, skip=None):
+    keys = _frame_numbers(fd, group)
+    skip = set() if skip is None else set(int(frame_no) for frame_no in skip)
+
+    try:
+        start, end = index
+    except TypeError:
+        start, end = keys[0], keys[-1]
+    if end < 0:
+        end = keys[-1]
+    logger.info('loading "{}" ({}->{})'.format(group, start, end))
+    ignored, rejected = 0, 0
+    for frame_no in range(start, end + 1):
+        if frame_no in skip:
+            rejected += 1
+            continue
+        try:
+            key = os.path.join(group, str(frame_no))
+            with stage("load") as s:
+                frame = fd.get(key)
+                s.add_bytes(frame.values.nbytes)
+            yield frame_no, frame
+        except KeyError:
+            ignored += 1
+    if ignored > 0:
+        logger.warning("{} frames not found".format(ignored))
+    if rejected > 0:
+        logger.info("{} frames rejected".format(rejected))
+
+
+def _load_frame_group(path, group="/_frames", index=None, skip=None):
+    import pandas as pd
+
+    with pd.HDFStore(path, mode="r") as fd:
+        yield from _iter_frames(fd, group=group, index=index, skip=skip)
+
+
+def _load_matrix_group(store, index=None, stacked=True, return_index=False, skip=None):
+    with store as fd:
+        with stage("load") as s:
+            frames, response = fd.select(index, skip=skip)
+            s.add_bytes(response.nbytes)
+        if len(frames) == 0:
+            raise ValueError("no frame in range {}".format(index))
+        stimuli = fd.stimuli[fd.position(frames[0])]
+        time = fd.time
+    response = cast(response)
+    if not stacked:
+        response = list(response)
+    if return_index:
+        return time, stimuli, response, frames
+    else:
+        return time, stimuli, response
+
+
+def load_frame_group(
+    path, group="/_frames", index=None, stacked=True, return_index=False, qc=False
+):
+    """
+    Load a frame range as a batch.
+
+    HDF5 files written by `convert`, in the frame group or the live layout, and
+    memory-mapped `.npy` directories are supported, recordings from the latter are
+    read-only views into the file.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory.
+        group (str, optional): Frame group, HDF5 only.
+        index (tuple, optional): Frame range (start, end), inclusive, negative end for
+            the last frame.
+        stacked (bool, optional): Return recordings as a single array.
+        return_index (bool, optional): Return the frame numbers.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel of the first frame.
+            response (ndarray): Recordings, shape (n_frames, n_samples).
+            frames (ndarray): Frame numbers, if `return_index`.
+    """
+    skip = rejected_frames(path) if qc else None
+    store = _open_matrix_store(path)
+    if store is not None:
+        return _load_matrix_group(
+            store, index=index, stacked=stacked, return_index=return_index, skip=skip
+        )
+
+    frames = _load_frame_group(path, group=group, index=index, skip=skip)
+    time, stimuli, response, numbers = None, None, [], []
+    for frame_no, frame in frames:
+        if time is None:
+            time, stimuli = frame["time"].values, frame["stimuli"].values
+        response.append(cast(frame["response"].values))
+        numbers.append(frame_no)
+    if not response:
+        raise ValueError("no frame in range {}".format(index))
+    if stacked:
+        response = np.stack(response, axis=0)
+    if return_index:
+        return time, stimuli, response, np.array(numbers)
+    else:
+        return time, stimuli, response
+
+
+def _iter_frame_blocks(path, index, block_size, group, skip, copy):
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            frames, pos = fd.positions(index, skip=skip)
+            if len(frames) == 0:
+                return
+            stimuli = fd.stimuli[pos[0]]
+            for i in range(0, len(frames), block_size):
+                with stage("load") as s:
+                    block = fd.take(pos[i : i + block_size])
+                    # contiguous blocks are views, force the read here
+                    block = np.array(block) if copy else np.asarray(block)
+                    block = cast(block)
+                    s.add_bytes(block.nbytes)
+                yield fd.time, stimuli, block, frames[i : i + block_size]
+        return
+
+    time, stimuli, block, numbers = None, None, [], []
+    frames = _load_frame_group(path, group=group, index=index, skip=skip)
+    for frame_no, frame in frames:
+        if time is None:
+            time, stimuli = frame["time"].values, frame["stimuli"].values
+        block.append(cast(frame["response"].values))
+        numbers.append(frame_no)
+        if len(block) == block_size:
+            yield time, stimuli, np.stack(block, axis=0), np.array(numbers)
+            block, numbers = [], []
+    if block:
+        yield time, stimuli, np.stack(block, axis=0), np.array(numbers)
+
+
+def iter_frame_blocks(
+    path,
+    index=None,
+    block_size=256,
+    group="/_frames",
+    qc=False,
+    prefetch=PREFETCH_DEPTH,
+):
+    """
+    Stream a frame range in blocks of bounded size.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end), inclusive.
+        block_size (int, optional): Maximum number of frames per block.
+        group (str, optional): Frame group, HDF5 only.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        prefetch (int, optional): Number of blocks read ahead on a background thread,
+            0 to read in the calling thread.
+
+    Yields:
+        :rtype: (ndarray, ndarray, ndarray, ndarray): Timestamps, stimuli channel of
+            the first frame, recordings of the block and their frame numbers.
+    """
+    if block_size < 1:
+        raise ValueError("block size must be positive")
+    skip = rejected_frames(path) if qc else None
+
+    blocks = _iter_frame_blocks(path, index, block_size, group, skip, prefetch > 0)
+    if prefetch > 0:
+        with Prefetcher(blocks, depth=prefetch) as blocks:
+            yield from blocks
+    else:
+        yield from blocks
+
+
+class Prefetcher(object):
+    """
+    Iterate on a background thread, items are produced while the consumer works on
+    the previous ones.
+
+    At most `depth` items wait in the buffer, so memory is bound to `depth` + 2 items
+    including the one being produced and the one being consumed. The iterable is
+    consumed entirely on the background thread, open files are never shared between
+    threads. Exceptions are raised to the consumer in order.
+
+    Args:
+        iterable (iterable): Items to produce, e.g. blocks from `iter_frame_blocks`.
+        depth (int, optional): Maximum number of items read ahead.
+    """
+
+    _DONE = object()
+
+    def __init__(self, iterable, depth=PREFETCH_DEPTH):
+        if depth < 1:
+            raise ValueError("prefetch depth must be positive")
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._produce, args=(iterable,), name="neubio-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((item, None)):
+                    break
+        except BaseException as err:
+            self._put((None, err))
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+        self._put((self._DONE, None))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._thread is None:
+            raise StopIteration
+        with stage("wait"):
+            item, err = self._queue.get()
+        if err is not None:
+            self.close()
+            raise err
+        if item is self._DONE:
+            self.close()
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+        Stop the background thread and drop the items read ahead.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        # unblock a producer waiting on a full buffer
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def is_npy_store(path):
+    """
+    Test whether a path is a `.npy` directory store.
+    """
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def _write_npy_header(fd, dtype, shape):
+    """
+    Write a fixed size `.npy` header, so the shape can be rewritten in place.
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape)
+    )
+    size = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+    if len(header) + 1 > size:
+        raise ValueError("shape {} does not fit in the header".format(shape))
+    fd.seek(0)
+    fd.write(NPY_MAGIC)
+    fd.write(size.to_bytes(2, "little"))
+    fd.write((header.ljust(size - 1) + "\n").encode("latin1"))
+
+
+def _check_batch(frames, time0, time, last):
+    """
+    Validate a batch of frames against the frames already written.
+    """
+    if len(time) != len(time0):
+        raise ValueError(
+            "frame {} has {} samples, expecting {}".format(
+                frames[0], len(time), len(time0)
+            )
+        )
+    if np.any(np.diff(frames) <= 0) or (last is not None and frames[0] <= last):
+        raise ValueError("frames {}->{} are out of order".format(frames[0], frames[-1]))
+
 
-def _load_frame_group(path, group="/_frames", index=None):
-    with pd.HDFStore(path) as fd:
-        # retrieve frame numbers
-        _, _, keys = zip(*fd.walk(group))
-        keys = sorted(keys[0], key=int)
+class NpyFrameWriter(object):
+    """
+    Append frames to a `.npy` directory store.
 
+    The store holds the shared time vector (time.npy), frame matrices of the stimuli
+    and the response (stimuli.npy, response.npy) and a JSON manifest listing the frame
+    numbers. The manifest is written on close, a store without one is incomplete.
+    Frames appended to a store are listed once the writer is closed.
+
+    Args:
+        path (str): Output directory.
+        dtype (str, optional): Sample data type.
+        mode (str, optional): "w" to overwrite, "a" to append to an existing store.
+    """
+
+    def __init__(self, path, dtype="float32", mode="w"):
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        self.path, self.dtype = path, np.dtype(dtype)
+        self.time, self.frames = None, []
+        if mode == "a" and os.path.exists(manifest_path):
+            with open(manifest_path, "r") as fd:
+                manifest = json.load(fd)
+            self.dtype = np.dtype(manifest["dtype"])
+            self.frames = manifest["frames"]
+            self.time = np.load(os.path.join(path, "time.npy"))
+            file_mode = "r+b"
+        elif mode in ("w", "a"):
+            os.makedirs(path, exist_ok=True)
+            file_mode = "wb"
+            # the frames described by the manifest and the side tables are gone
+            for name in (MANIFEST_NAME, QC_NAME, META_NAME, LABELS_NAME):
+                if os.path.exists(os.path.join(path, name)):
+                    os.unlink(os.path.join(path, name))
+        else:
+            raise ValueError('unknown mode "{}"'.format(mode))
+
+        self._files = {}
+        for name in ("stimuli", "response"):
+            fd = open(os.path.join(path, name + ".npy"), file_mode)
+            if file_mode == "wb":
+                fd.seek(NPY_HEADER_SIZE)
+            else:
+                fd.seek(0, os.SEEK_END)
+            self._files[name] = fd
+
+    def write(self, frame_no, time, stimuli, response):
+        """
+        Append a frame.
+
+        Args:
+            frame_no (int): Frame number, must be increasing.
+            time (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel.
+            response (ndarray): Recorded response.
+        """
+        if self.time is None:
+            self.time = np.asarray(time, dtype=self.dtype)
+        elif len(time) != len(self.time):
+            raise ValueError(
+                "frame {} has {} samples, expecting {}".format(
+                    frame_no, len(time), len(self.time)
+                )
+            )
+        if self.frames and frame_no <= self.frames[-1]:
+            raise ValueError("frame {} is out of order".format(frame_no))
+
+        logger.debug("writing frame {}".format(frame_no))
+        with stage("write") as s:
+            for name, data in (("stimuli", stimuli), ("response", response)):
+                data = np.ascontiguousarray(data, dtype=self.dtype)
+                self._files[name].write(data.tobytes())
+                s.add_bytes(data.nbytes)
+        self.frames.append(int(frame_no))
+
+    def write_batch(self, frames, time, stimuli, response):
+        """
+        Append frames in a single write per matrix.
+
+        Args:
+            frames (ndarray): Frame numbers, must be increasing.
+            time (ndarray): Timestamps shared by the frames.
+            stimuli (ndarray): Stimuli channels, shape (n_frames, n_samples).
+            response (ndarray): Recorded responses, shape (n_frames, n_samples).
+        """
+        frames = np.asarray(frames, dtype=np.int64)
+        if len(frames) == 0:
+            return
+        if self.time is None:
+            self.time = np.asarray(time, dtype=self.dtype)
+        _check_batch(frames, self.time, time, self.frames[-1] if self.frames else None)
+
+        logger.debug("writing frames {}->{}".format(frames[0], frames[-1]))
+        with stage("write") as s:
+            for name, data in (("stimuli", stimuli), ("response", response)):
+                data = np.ascontiguousarray(data, dtype=self.dtype)
+                self._files[name].write(data.tobytes())
+                s.add_bytes(data.nbytes)
+        self.frames.extend(frames.tolist())
+
+    def close(self):
+        if not self._files:
+            return
+        shape = (len(self.frames), 0 if self.time is None else len(self.time))
+        for fd in self._files.values():
+            _write_npy_header(fd, self.dtype, shape)
+            fd.close()
+        self._files = {}
+        time = self.time if self.time is not None else np.empty(0, self.dtype)
+        np.save(os.path.join(self.path, "time.npy"), time)
+
+        manifest = {
+            "version": NPY_STORE_VERSION,
+            "dtype": self.dtype.str,
+            "n_frames": shape[0],
+            "n_samples": shape[1],
+            "frames": self.frames,
+        }
+        # readers never see a partial manifest
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        with open(manifest_path + ".tmp", "w") as fd:
+            json.dump(manifest, fd)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        logger.info('{} frames written to "{}"'.format(shape[0], self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NpyStore(object):
+    """
+    Read-only `.npy` directory store, frame matrices are memory-mapped.
+
+    Args:
+        path (str): Store directory.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST_NAME), "r") as fd:
+            manifest = json.load(fd)
+        if manifest.get("version") != NPY_STORE_VERSION:
+            raise ValueError(
+                'unsupported store version "{}"'.format(manifest.get("version"))
+            )
+        self.path = path
+        self.frames = np.array(manifest["frames"], dtype=np.int64)
+        self.time = np.load(os.path.join(path, "time.npy"))
+        self.stimuli = np.load(os.path.join(path, "stimuli.npy"), mmap_mode="r")
+        self.response = np.load(os.path.join(path, "response.npy"), mmap_mode="r")
+
+    def position(self, frame_no):
+        return int(np.searchsorted(self.frames, frame_no))
+
+    def positions(self, index=None, skip=None):
+        """
+        Frames in an inclusive range.
+
+        Args:
+            index (tuple, optional): Frame range (start, end).
+            skip (ndarray, optional): Frame numbers to leave out.
+
+        Returns:
+            (tuple): tuple containing:
+                frames (ndarray): Frame numbers.
+                pos (ndarray): Row of each frame in the matrices.
+        """
+        if len(self.frames) == 0:
+            raise ValueError('"{}" is empty'.format(self.path))
         try:
             start, end = index
         except TypeError:
-            start, end = int(keys[0]), int(keys[-1])
+            start, end = self.frames[0], self.frames[-1]
         if end < 0:
-            end = int(keys[-1])
-        logger.info('loading "{}" ({}->{})'.format(group, start, end))
-        ignored = 0
-        for frame_no in range(start, end + 1):
-            try:
-                key = os.path.join(group, str(frame_no))
-                yield fd.get(key)
-            except KeyError:
-                ignored += 1
+            end = self.frames[-1]
+        logger.info('loading "{}" ({}->{})'.format(self.path, start, end))
+
+        i0 = np.searchsorted(self.frames, start, side="left")
+        i1 = np.searchsorted(self.frames, end, side="right")
+        ignored = (end - start + 1) - (i1 - i0)
         if ignored > 0:
             logger.warning("{} frames not found".format(ignored))
+        pos = np.arange(i0, i1)
+        if skip is not None and len(skip):
+            pos = pos[~np.isin(self.frames[pos], skip)]
+            if len(pos) < i1 - i0:
+                logger.info("{} frames rejected".format(i1 - i0 - len(pos)))
+        return self.frames[pos], pos
 
+    def take(self, pos):
+        """
+        Recordings of the rows, a view into the file if the rows are contiguous.
+        """
+        if len(pos) and pos[-1] - pos[0] + 1 == len(pos):
+            return self.response[pos[0] : pos[-1] + 1]
+        return self.response[pos]
 
-def load_frame_group(*args, stacked=True, **kwargs):
-    frames = _load_frame_group(*args, **kwargs)
-    time, stimuli, response = None, None, []
-    for frame in frames:
-        if time is None:
-            time, stimuli = frame["time"].values, frame["stimuli"].values
-        response.append(frame["response"].values)
-    if stacked:
-        response = np.stack(response, axis=0)
-    return time, stimuli, response
+    def select(self, index=None, skip=None):
+        """
+        Frames in an inclusive range.
+
+        Returns:
+            (tuple): tuple containing:
+                frames (ndarray): Frame numbers.
+                response (ndarray): Memory-mapped recordings.
+        """
+        frames, pos = self.positions(index, skip=skip)
+        return frames, self.take(pos)
+
+    def close(self):
+        # memory maps are released along with the last view
+        self.stimuli = self.response = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_live_file(path):
+    """
+    Test whether a path is an HDF5 file in the live layout of `LiveFrameWriter`.
+    """
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as fd:
+        head = fd.read(len(HDF5_SIGNATURE) + 1)
+    # SWMR requires the latest file format, superblock version 3 and up
+    if head[:-1] != HDF5_SIGNATURE or head[-1] < 3:
+        return False
+
+    import h5py
+
+    try:
+        with h5py.File(path, "r", libver="latest", swmr=True) as fd:
+            return fd.attrs.get("layout") == LIVE_LAYOUT
+    except OSError:
+        return False
+
+
+def _open_matrix_store(path):
+    """
+    Open a store holding frames as matrices, None for HDF5 files in the frame group.
+    """
+    if is_npy_store(path):
+        return NpyStore(path)
+    elif is_live_file(path):
+        return LiveReader(path)
+    return None
+
+
+class LiveFrameWriter(object):
+    """
+    Append frames to an HDF5 file in single-writer/multiple-reader (SWMR) mode.
+
+    Frames are stored as matrices like the `.npy` directory store, the time vector
+    (time), resizable frame matrices of the stimuli and the response (stimuli,
+    response) and the frame numbers (frames). Rows are flushed before the frame
+    numbers, so readers only see complete frames while the file is being written.
+
+    Args:
+        path (str): Output HDF5 file.
+        dtype (str, optional): Sample data type.
+        mode (str, optional): "w" to overwrite, "a" to append to a file in the live
+            layout or create it.
+        flush_every (int, optional): Number of frames made visible to readers at once.
+        chunk_frames (int, optional): Frames per HDF5 chunk.
+    """
+
+    def __init__(self, path, dtype="float32", mode="w", flush_every=1, chunk_frames=64):
+        import h5py
+
+        if mode not in ("w", "a"):
+            raise ValueError('unknown mode "{}"'.format(mode))
+        if mode == "a":
+            if not os.path.exists(path):
+                mode = "w"
+            elif not is_live_file(path):
+                raise ValueError('"{}" is not in the live layout'.format(path))
+        self.path, self.dtype = path, np.dtype(dtype)
+        self.flush_every, self.chunk_frames = max(flush_every, 1), chunk_frames
+        self._fd = h5py.File(path, mode, libver="latest")
+        self._buffer = []
+
+        if "frames" in self._fd:
+            self.dtype = self._fd["response"].dtype
+            self.time = self._fd["time"][()]
+            self.frames = self._fd["frames"][()].tolist()
+            self._fd.swmr_mode = True
+        else:
+            self._fd.attrs["layout"] = LIVE_LAYOUT
+            self._fd.attrs["version"] = LIVE_LAYOUT_VERSION
+            self.time, self.frames = None, []
+
+    def _create(self, time):
+        # datasets can not be created once readers are allowed in
+        fd, n = self._fd, len(time)
+        fd.create_dataset("time", data=np.asarray(time, dtype=self.dtype))
+        for name in ("stimuli", "response"):
+            fd.create_dataset(
+                name,
+                shape=(0, n),
+                maxshape=(None, n),
+                chunks=(self.chunk_frames, n),
+                dtype=self.dtype,
+            )
+        fd.create_dataset(
+            "frames", shape=(0,), maxshape=(None,), chunks=(1024,), dtype=np.int64
+        )
+        fd.swmr_mode = True
+        self.time = fd["time"][()]
+
+    def write(self, frame_no, time, stimuli, response):
+        """
+        Append a frame.
+
+        Args:
+            frame_no (int): Frame number, must be increasing.
+            time (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel.
+            response (ndarray): Recorded response.
+        """
+        if self.time is None:
+            self._create(time)
+        elif len(time) != len(self.time):
+            raise ValueError(
+                "frame {} has {} samples, expecting {}".format(
+                    frame_no, len(time), len(self.time)
+                )
+            )
+        last = self._buffer[-1][0] if self._buffer else None
+        if last is None and self.frames:
+            last = self.frames[-1]
+        if last is not None and frame_no <= last:
+            raise ValueError("frame {} is out of order".format(frame_no))
+
+        logger.debug("writing frame {}".format(frame_no))
+        self._buffer.append((int(frame_no), stimuli, response))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def write_batch(self, frames, time, stimuli, response):
+        """
+        Append frames and make them visible to readers at once.
+
+        Args:
+            frames (ndarray): Frame numbers, must be increasing.
+            time (ndarray): Timestamps shared by the frames.
+            stimuli (ndarray): Stimuli channels, shape (n_frames, n_samples).
+            response (ndarray): Recorded responses, shape (n_frames, n_samples).
+        """
+        frames = np.asarray(frames, dtype=np.int64)
+        if len(frames) == 0:
+            return
+        self.flush()
+        if self.time is None:
+            self._create(time)
+        _check_batch(frames, self.time, time, self.frames[-1] if self.frames else None)
+        logger.debug("writing frames {}->{}".format(frames[0], frames[-1]))
+        self._append(frames, stimuli, response)
+
+    def _append(self, numbers, stimuli, response):
+        fd = self._fd
+        n0, n = len(self.frames), len(self.frames) + len(numbers)
+        with stage("write") as s:
+            for name, rows in (("stimuli", stimuli), ("response", response)):
+                rows = np.asarray(rows).astype(self.dtype, copy=False)
+                fd[name].resize(n, axis=0)
+                fd[name][n0:n] = rows
+                fd[name].flush()
+                s.add_bytes(rows.nbytes)
+            # frame numbers last, readers count frames from them
+            fd["frames"].resize(n, axis=0)
+            fd["frames"][n0:n] = numbers
+            fd["frames"].flush()
+        self.frames.extend(int(frame_no) for frame_no in numbers)
+
+    def flush(self):
+        """
+        Make the buffered frames visible to readers.
+        """
+        if not self._buffer:
+            return
+        self._append(
+            [frame[0] for frame in self._buffer],
+            np.stack([frame[1] for frame in self._buffer], axis=0),
+            np.stack([frame[2] for frame in self._buffer], axis=0),
+        )
+        self._buffer = []
+
+    def close(self):
+        if self._fd is None:
+            return
+        self.flush()
+        self._fd.close()
+        self._fd = None
+        logger.info('{} frames written to "{}"'.format(len(self.frames), self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LiveReader(NpyStore):
+    """
+    Read-only view of a file written by `LiveFrameWriter`, possibly still growing.
+
+    The view holds the frames committed when it was opened, `refresh` or `poll` extend
+    it to the frames written since.
+
+        reader = LiveReader("trial_1.h5")
+        for frames, response in reader.follow(interval=1.0, timeout=60):
+            ...
+
+    Args:
+        path (str): HDF5 file.
+    """
+
+    def __init__(self, path):
+        import h5py
+
+        self.path = path
+        self._fd = h5py.File(path, "r", libver="latest", swmr=True)
+        if self._fd.attrs.get("layout") != LIVE_LAYOUT:
+            self._fd.close()
+            raise ValueError('"{}" is not in the live layout'.format(path))
+        self.frames = np.empty(0, dtype=np.int64)
+        self.time = self.stimuli = self.response = None
+        self._polled = 0
+        self.refresh()
+
+    def refresh(self):
+        """
+        Extend the view to the frames committed so far.
+
+        Returns:
+            (int): Number of new frames.
+        """
+        fd = self._fd
+        if "frames" not in fd:
+            # closed before the first frame
+            return 0
+        if self.time is None:
+            self.time = fd["time"][()]
+            self.stimuli, self.response = fd["stimuli"], fd["response"]
+
+        frames = fd["frames"]
+        frames.refresh()
+        n0, n = len(self.frames), frames.shape[0]
+        if n > n0:
+            self.frames = np.concatenate([self.frames, frames[n0:n]])
+            # rows are flushed before the frame numbers
+            self.stimuli.refresh()
+            self.response.refresh()
+        return n - n0
+
+    def take(self, pos):
+        """
+        Recordings of the rows.
+        """
+        if len(pos) == 0:
+            n = 0 if self.time is None else len(self.time)
+            return np.empty((0, n), dtype=np.float32)
+        if pos[-1] - pos[0] + 1 == len(pos):
+            return self.response[pos[0] : pos[-1] + 1]
+        return self.response[np.asarray(pos)]
+
+    def poll(self):
+        """
+        Frames not returned by a previous poll, all the committed frames on the first
+        call.
+
+        Returns:
+            (tuple): tuple containing:
+                frames (ndarray): Frame numbers, empty if there is no new frame.
+                response (ndarray): Recordings of the new frames.
+        """
+        self.refresh()
+        pos = np.arange(self._polled, len(self.frames))
+        self._polled = len(self.frames)
+        return self.frames[pos], self.take(pos)
+
+    def follow(self, interval=1.0, timeout=None):
+        """
+        Poll for new frames until none arrives for `timeout` seconds.
+
+        Args:
+            interval (float, optional): Seconds between polls.
+            timeout (float, optional): Seconds without new frames before stopping,
+                poll forever if None.
+
+        Yields:
+            :rtype: (ndarray, ndarray): Frame numbers and recordings of new frames.
+        """
+        import time
+
+        idle = 0.0
+        while timeout is None or idle < timeout:
+            frames, response = self.poll()
+            if len(frames):
+                idle = 0.0
+                yield frames, response
+            else:
+                time.sleep(interval)
+                idle += interval
+
+    def close(self):
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+        self.stimuli = self.response = None
+
+
+class StorePool(object):
+    """
+    Read-only stores opened on first use, the least recently used store is closed once
+    more than `max_open` files are open.
+
+    Args:
+        max_open (int, optional): Maximum number of open files.
+    """
+
+    def __init__(self, max_open=16):
+        self.max_open = max_open
+        self._stores = OrderedDict()
+
+    def get(self, path):
+        """
+        Retrieve the store of a file, open it if necessary.
+        """
+        import pandas as pd
+
+        path = os.path.abspath(path)
+        fd = self._stores.pop(path, None)
+        if fd is None:
+            logger.debug('opening "{}"'.format(path))
+            fd = _open_matrix_store(path)
+            if fd is None:
+                fd = pd.HDFStore(path, mode="r")
+            while len(self._stores) >= self.max_open:
+                _, lru = self._stores.popitem(last=False)
+                lru.close()
+        self._stores[path] = fd
+        return fd
+
+    def close(self):
+        while self._stores:
+            _, fd = self._stores.popitem()
+            fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_frames(ranges, group="/_frames", pool=None, return_index=False, qc=False):
+    """
+    Load frame ranges across files as a single batch.
+
+    Args:
+        ranges (list): (path, (start, end)) of each frame range.
+        group (str, optional): Frame group in every file.
+        pool (StorePool, optional): Open stores to reuse, files are closed after
+            loading if None.
+        return_index (bool, optional): Return the source of each frame.
+        qc (bool, optional): Leave out frames rejected by the stored QC masks.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel of the first frame.
+            response (ndarray): Recordings, shape (n_frames, n_samples).
+            paths (ndarray): Source file of each frame, if `return_index`.
+            frames (ndarray): Frame number of each frame, if `return_index`.
+    """
+    owned = pool is None
+    if owned:
+        pool = StorePool()
+
+    time, stimuli, response, paths, index = None, None, [], [], []
+    try:
+        for path, frame_range in ranges:
+            fd = pool.get(path)
+            skip = _rejected_frames(fd) if qc else None
+            if isinstance(fd, NpyStore):
+                frames, pos = fd.positions(frame_range, skip=skip)
+                if len(frames) == 0:
+                    continue
+                t, stim, block = fd.time, fd.stimuli[pos[0]], fd.take(pos)
+            else:
+                rows = list(_iter_frames(fd, group=group, index=frame_range, skip=skip))
+                if not rows:
+                    continue
+                frames = [frame_no for frame_no, _ in rows]
+                block = [frame["response"].values for _, frame in rows]
+                t, stim = rows[0][1]["time"].values, rows[0][1]["stimuli"].values
+
+            if time is None:
+                time, stimuli = t, stim
+            elif len(t) != len(time):
+                raise ValueError(
+                    '"{}" has {} samples per frame, expecting {}'.format(
+                        path, len(t), len(time)
+                    )
+                )
+            response.extend(block)
+            paths.extend([path] * len(frames))
+            index.extend(frames)
+    finally:
+        if owned:
+            pool.close()
+
+    if not response:
+        raise ValueError("no frame to load")
+    response = cast(np.stack(response, axis=0))
+    if return_index:
+        return time, stimuli, response, np.array(paths), np.array(index)
+    else:
+        return time, stimuli, response
+
+
+def load_label(catalogue, label, pool=None, return_index=False, qc=False, **conditions):
+    """
+    Load all the frames labelled `label` across the trials of a catalogue.
+
+    Args:
+        catalogue (Catalogue or str): Catalogue or path to its index file.
+        label (str): Condition label.
+        pool (StorePool, optional): Open stores to reuse.
+        return_index (bool, optional): Return the source of each frame.
+        qc (bool, optional): Leave out frames rejected by the stored QC masks.
+        **conditions: Equality constraints on the catalogued file properties.
+    """
+    if isinstance(catalogue, str):
+        from .catalogue import Catalogue
+
+        catalogue = Catalogue.load(catalogue)
+    ranges = catalogue.ranges(label, **conditions)
+    logger.info('"{}" spans {} ranges'.format(label, len(ranges)))
+    return load_frames(ranges, pool=pool, return_index=return_index, qc=qc)
+
+
+def _read_table(fd, key, name, attrs=()):
+    """
+    Table stored by `_write_table` in an open store and its string attributes, None
+    for both if absent.
+    """
+    import pandas as pd
+
+    if isinstance(fd, LiveReader):
+        group = fd._fd.get(key)
+        if group is None:
+            return None, None
+        columns = {}
+        for column in group.attrs["columns"]:
+            values = group[column][()]
+            if values.dtype.kind == "S":
+                values = np.char.decode(values, "utf-8")
+            columns[column] = values
+        table = pd.DataFrame(columns)
+        attrs = {attr: group.attrs[attr] for attr in attrs}
+    elif isinstance(fd, NpyStore):
+        path = os.path.join(fd.path, name)
+        if not os.path.exists(path):
+            return None, None
+        with np.load(path) as data:
+            table = pd.DataFrame(
+                {column: data[column] for column in data.files if column not in attrs}
+            )
+            attrs = {attr: str(data[attr]) for attr in attrs}
+    else:
+        if key not in fd:
+            return None, None
+        table = fd.get(key)
+        storer = fd.get_storer(key)
+        attrs = {attr: getattr(storer.attrs, attr) for attr in attrs}
+    return table, attrs
+
+
+def _write_table(path, key, name, table, attrs=None):
+    """
+    Store a table under `key` of an HDF5 file, or as `name` in a `.npy` directory
+    store, replacing the previous one.
+    """
+    import pandas as pd
+
+    attrs = {} if attrs is None else attrs
+    columns = {}
+    for column in table.columns:
+        values = np.asarray(table[column])
+        columns[column] = values.astype(str) if values.dtype == object else values
+
+    if is_npy_store(path):
+        np.savez(os.path.join(path, name), **attrs, **columns)
+        return
+    elif is_live_file(path):
+        import h5py
+
+        # requires the writer to be closed
+        with h5py.File(path, "a", libver="latest") as fd:
+            if key in fd:
+                del fd[key]
+            group = fd.create_group(key)
+            for column, values in columns.items():
+                if values.dtype.kind == "U":
+                    values = np.char.encode(values, "utf-8")
+                group.create_dataset(column, data=values)
+            group.attrs["columns"] = list(columns)
+            for attr, value in attrs.items():
+                group.attrs[attr] = value
+        return
+    with pd.HDFStore(path, mode="a") as fd:
+        fd.put(key, table.reset_index(drop=True), format="fixed")
+        storer = fd.get_storer(key)
+        for attr, value in attrs.items():
+            setattr(storer.attrs, attr, value)
+
+
+def _read_qc(fd):
+    table, attrs = _read_table(fd, QC_KEY, QC_NAME, attrs=("thresholds",))
+    if table is None:
+        return None, None
+    return table, json.loads(attrs["thresholds"])
+
+
+def read_qc(path):
+    """
+    Read the stored QC metrics of a file.
+
+    Returns:
+        (tuple): tuple containing:
+            table (DataFrame): Frame number, metrics and reject flag of each frame,
+                None if the file is not screened.
+            thresholds (dict): Metric limits the frames were screened with.
+    """
+    import pandas as pd
+
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            return _read_qc(fd)
+    with pd.HDFStore(path, mode="r") as fd:
+        return _read_qc(fd)
+
+
+def write_qc(path, table, thresholds):
+    """
+    Store QC metrics and the reject flag of each frame, replacing previous results.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        table (DataFrame): Frame number, metrics and reject flag of each frame.
+        thresholds (dict): Metric limits the frames were screened with.
+    """
+    _write_table(
+        path, QC_KEY, QC_NAME, table, attrs={"thresholds": json.dumps(thresholds)}
+    )
+
+
+def _rejected_frames(fd):
+    table, _ = _read_qc(fd)
+    if table is None:
+        return np.empty(0, dtype=np.int64)
+    return table["frame"].values[table["reject"].values.astype(bool)]
+
+
+def rejected_frames(path):
+    """
+    Frame numbers rejected by the stored QC mask, empty if the file is not screened.
+    """
+    import pandas as pd
+
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            return _rejected_frames(fd)
+    with pd.HDFStore(path, mode="r") as fd:
+        return _rejected_frames(fd)
+
+
+def _read_labels(fd):
+    import pandas as pd
+
+    labels, _ = _read_table(fd, LABELS_KEY, LABELS_NAME)
+    if labels is None:
+        return pd.DataFrame(
+            {
+                "label": np.array([], dtype=object),
+                "start": np.array([], dtype=np.int64),
+                "end": np.array([], dtype=np.int64),
+            }
+        )
+    return labels
+
+
+def read_labels(path):
+    """
+    Read condition labels of a file.
+
+    Returns:
+        (DataFrame): Label and inclusive frame range (start, end) of each entry.
+    """
+    import pandas as pd
+
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            return _read_labels(fd)
+    with pd.HDFStore(path, mode="r") as fd:
+        return _read_labels(fd)
+
+
+def write_label(path, index, label, replace=False):
+    """
+    Label a frame range of a file.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple): Frame range (start, end), inclusive.
+        label (str): Condition label.
+        replace (bool, optional): Drop existing ranges of the same label.
+    """
+    import pandas as pd
+
+    start, end = index
+    if start > end:
+        raise ValueError("invalid frame range ({}, {})".format(start, end))
+    labels = read_labels(path)
+    if replace:
+        labels = labels[labels["label"] != label]
+    entry = pd.DataFrame({"label": [label], "start": [start], "end": [end]})
+    labels = pd.concat([labels, entry], ignore_index=True).drop_duplicates()
+    labels = labels.astype({"start": np.int64, "end": np.int64})
+    _write_table(path, LABELS_KEY, LABELS_NAME, labels.reset_index(drop=True))
+
+
+def _file_frames(path, group="/_frames"):
+    """
+    Sorted frame numbers of a file.
+    """
+    import pandas as pd
+
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            return np.array(fd.frames, dtype=np.int64)
+    with pd.HDFStore(path, mode="r") as fd:
+        return np.array(_frame_numbers(fd, group), dtype=np.int64)
+
+
+def read_meta(path):
+    """
+    Read the per-frame metadata of a file.
+
+    Returns:
+        (DataFrame): Frame number and the `META_COLUMNS` of each annotated frame,
+            sorted by frame number, None if the file is not annotated.
+    """
+    import pandas as pd
+
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            table, _ = _read_table(fd, META_KEY, META_NAME)
+    else:
+        with pd.HDFStore(path, mode="r") as fd:
+            table, _ = _read_table(fd, META_KEY, META_NAME)
+    return table
+
+
+def write_meta(path, table):
+    """
+    Store the per-frame metadata of a file, replacing the previous table.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        table (DataFrame): Frame number and metadata columns of each frame, missing
+            columns are filled with their defaults.
+    """
+    unknown = set(table.columns) - set(META_COLUMNS) - {"frame"}
+    if unknown:
+        raise ValueError("unknown metadata: {}".format(", ".join(sorted(unknown))))
+    table = table.copy()
+    for name, default in META_COLUMNS.items():
+        if name not in table:
+            table[name] = default
+    table = table[["frame"] + list(META_COLUMNS)]
+    table = table.astype(
+        {"frame": np.int64, "calcium": float, "t": float, "intensity": float}
+    )
+    if table["frame"].duplicated().any():
+        raise ValueError("duplicated frame numbers")
+    _write_table(
+        path, META_KEY, META_NAME, table.sort_values("frame", ignore_index=True)
+    )
+
+
+def annotate(path, index=None, interval=None, group="/_frames", **values):
+    """
+    Set metadata of the frames in a range, other frames and columns are kept.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end), inclusive, negative end for
+            the last frame, default to all the frames.
+        interval (float, optional): Seconds between sweeps, sets the sweep timestamp
+            of the frames from their offset to the first frame of the file.
+        group (str, optional): Frame group, HDF5 only.
+        **values: Value of each metadata column, see `META_COLUMNS`.
+
+    Returns:
+        (DataFrame): The updated metadata table.
+    """
+    import pandas as pd
+
+    unknown = set(values) - set(META_COLUMNS)
+    if unknown:
+        raise ValueError("unknown metadata: {}".format(", ".join(sorted(unknown))))
+
+    frames = _file_frames(path, group)
+    if len(frames) == 0:
+        raise ValueError('"{}" is empty'.format(path))
+    first = frames[0]
+    try:
+        start, end = index
+    except TypeError:
+        start, end = frames[0], frames[-1]
+    if end < 0:
+        end = frames[-1]
+    frames = frames[(frames >= start) & (frames <= end)]
+    if len(frames) == 0:
+        raise ValueError("no frame in range ({}, {})".format(start, end))
+    if interval is not None:
+        values["t"] = (frames - first) * interval
+
+    table = read_meta(path)
+    if table is None:
+        table = pd.DataFrame({"frame": np.array([], dtype=np.int64)})
+    new = np.setdiff1d(frames, table["frame"].values)
+    if len(new):
+        table = pd.concat([table, pd.DataFrame({"frame": new})], ignore_index=True)
+    for name, default in META_COLUMNS.items():
+        if name not in table:
+            table[name] = default
+        else:
+            table[name] = table[name].fillna(default)
+    table = table.sort_values("frame", ignore_index=True)
+
+    rows = np.searchsorted(table["frame"].values, frames)
+    for name, value in values.items():
+        column = table[name].values.copy()
+        column[rows] = value
+        table[name] = column
+    logger.info("{} frames annotated".format(len(frames)))
+    write_meta(path, table)
+    return table
+
+
+class FrameIndex(object):
+    """
+    Sorted indexes over the columns of a metadata table, lookups are binary searches.
+
+        index = FrameIndex(read_meta("trial_1.h5"))
+        frames = index.query(condition="Control", t_min=60)
+
+    Args:
+        table (DataFrame): Frame number and metadata of each frame.
+    """
+
+    def __init__(self, table):
+        self.frames = table["frame"].values.astype(np.int64)
+        self._order, self._sorted = {}, {}
+        for name in table.columns:
+            values = np.asarray(table[name])
+            if values.dtype == object:
+                values = values.astype(str)
+            order = np.argsort(values, kind="stable")
+            self._order[name], self._sorted[name] = order, values[order]
+
+    @property
+    def columns(self):
+        return list(self._order)
+
+    def _column(self, name):
+        try:
+            return self._order[name], self._sorted[name]
+        except KeyError:
+            raise ValueError('unknown metadata "{}"'.format(name))
+
+    def lookup(self, name, value):
+        """
+        Sorted frame numbers whose `name` equals `value`.
+        """
+        order, values = self._column(name)
+        lo = np.searchsorted(values, value, side="left")
+        hi = np.searchsorted(values, value, side="right")
+        return np.sort(self.frames[order[lo:hi]])
+
+    def range(self, name, lo=None, hi=None):
+        """
+        Sorted frame numbers whose `name` is in the inclusive range [lo, hi], missing
+        values are never in range.
+        """
+        order, values = self._column(name)
+        i0 = 0 if lo is None else np.searchsorted(values, lo, side="left")
+        if hi is None:
+            # NaN are sorted last
+            i1 = len(values)
+            if values.dtype.kind == "f":
+                i1 = np.searchsorted(values, np.inf, side="right")
+        else:
+            i1 = np.searchsorted(values, hi, side="right")
+        return np.sort(self.frames[order[i0:i1]])
+
+    def query(self, **conditions):
+        """
+        Sorted frame numbers satisfying all the conditions.
+
+        Args:
+            **conditions: Column value, or list of accepted values, suffix the column
+                with `_min` or `_max` for an inclusive bound, e.g. `t_min=60`.
+        """
+        frames = self.frames if not conditions else None
+        bounds = {}
+        for key, value in conditions.items():
+            name, _, bound = key.rpartition("_")
+            if bound in ("min", "max") and name in self._order:
+                lo, hi = bounds.get(name, (None, None))
+                bounds[name] = (value, hi) if bound == "min" else (lo, value)
+                continue
+            if isinstance(value, (list, tuple, set)):
+                match = np.unique(
+                    np.concatenate(
+                        [np.empty(0, dtype=np.int64)]
+                        + [self.lookup(key, v) for v in value]
+                    )
+                )
+            else:
+                match = self.lookup(key, value)
+            frames = match if frames is None else np.intersect1d(frames, match)
+        for name, (lo, hi) in bounds.items():
+            match = self.range(name, lo, hi)
+            frames = match if frames is None else np.intersect1d(frames, match)
+        return np.sort(frames)
+
+
+def query_frames(path, **conditions):
+    """
+    Frame numbers of a file matching metadata conditions, see `FrameIndex.query`.
+    """
+    table = read_meta(path)
+    if table is None:
+        raise ValueError('"{}" has no frame metadata, see `annotate`'.format(path))
+    return FrameIndex(table).query(**conditions)
+
+
+def _iter_frame_set(fd, group, frames):
+    ignored = 0
+    for frame_no in frames:
+        try:
+            key = os.path.join(group, str(frame_no))
+            with stage("load") as s:
+                frame = fd.get(key)
+                s.add_bytes(frame.values.nbytes)
+            yield frame_no, frame
+        except KeyError:
+            ignored += 1
+    if ignored > 0:
+        logger.warning("{} frames not found".format(ignored))
+
+
+def select(path, group="/_frames", return_index=False, qc=False, **conditions):
+    """
+    Load the frames of a file matching metadata conditions as a batch.
+
+        t, stimuli, response = select("trial_1.h5", condition="Control", t_min=60)
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        group (str, optional): Frame group, HDF5 only.
+        return_index (bool, optional): Return the frame numbers.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        **conditions: Metadata conditions, see `FrameIndex.query`.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamps.
+            stimuli (ndarray): Stimuli channel of the first frame.
+            response (ndarray): Recordings, shape (n_frames, n_samples).
+            frames (ndarray): Frame numbers, if `return_index`.
+    """
+    import pandas as pd
+
+    frames = query_frames(path, **conditions)
+    if qc:
+        frames = np.setdiff1d(frames, rejected_frames(path))
+    if len(frames) == 0:
+        raise ValueError("no frame matches {}".format(conditions))
+    logger.info('selected {} frames from "{}"'.format(len(frames), path))
+
+    store = _open_matrix_store(path)
+    if store is not None:
+        with store as fd:
+            pos = np.searchsorted(fd.frames, frames)
+            found = pos < len(fd.frames)
+            found[found] = fd.frames[pos[found]] == frames[found]
+            if not found.all():
+                logger.warning("{} frames not found".format((~found).sum()))
+                frames, pos = frames[found], pos[found]
+            if len(frames) == 0:
+                raise ValueError("no frame matches {}".format(conditions))
+            with stage("load") as s:
+                response = cast(fd.take(pos))
+                s.add_bytes(response.nbytes)
+            time, stimuli = fd.time, np.asarray(fd.stimuli[pos[0]])
+    else:
+        time, stimuli, response, index = None, None, [], []
+        with pd.HDFStore(path, mode="r") as fd:
+            for frame_no, frame in _iter_frame_set(fd, group, frames):
+                if time is None:
+                    time, stimuli = frame["time"].values, frame["stimuli"].values
+                response.append(cast(frame["response"].values))
+                index.append(frame_no)
+        if not response:
+            raise ValueError("no frame matches {}".format(conditions))
+        response, frames = np.stack(response, axis=0), np.array(index)
+    if return_index:
+        return time, stimuli, response, frames
+    else:
+        return time, stimuli, response
@@ -0,0 +1,326 @@
+"""
+Incremental processing pipelines, stage results are kept in memory and recomputed
+only when their parameters or upstream stages change.
+
+    pipe = epsp_pipeline("trial_1.h5", index=(194, 209))
+    summary = pipe["summary"]
+    pipe.set(crop=(0.1, 0.12), r_min=0.8)
+    # load, filter and baseline are reused
+    summary = pipe["summary"]
+"""
+from collections import OrderedDict
+import logging
+
+import numpy as np
+
+from .cache import canonical_params
+from .instrument import stage
+
+__all__ = ["Node", "Pipeline", "epsp_pipeline"]
+
+logger = logging.getLogger(__name__)
+
+
+class Node(object):
+    """
+    A pipeline stage.
+
+    Args:
+        name (str): Stage name.
+        func (callable): Called with the results of `deps` as positional arguments and
+            the declared parameters as keyword arguments.
+        deps (tuple): Names of the upstream stages.
+        params (tuple): Names of the parameters the stage depends on.
+    """
+
+    def __init__(self, name, func, deps=(), params=()):
+        self.name, self.func = name, func
+        self.deps, self.params = tuple(deps), tuple(params)
+
+    def __repr__(self):
+        return "Node({!r}, deps={}, params={})".format(
+            self.name, self.deps, self.params
+        )
+
+
+class Pipeline(object):
+    """
+    Directed acyclic graph of stages sharing a parameter namespace.
+
+    Stages are added after their dependencies, so insertion order is a topological
+    order. Changing a parameter drops the results of the stages declaring it and of
+    everything downstream, other results are reused.
+
+    Args:
+        **params: Initial parameter values.
+    """
+
+    def __init__(self, **params):
+        self.params = dict(params)
+        self._nodes = OrderedDict()
+        self._results = {}
+        # number of evaluations of each stage
+        self.runs = {}
+
+    @property
+    def nodes(self):
+        return list(self._nodes.values())
+
+    def add(self, name, func, deps=(), **params):
+        """
+        Add a stage.
+
+        Args:
+            name (str): Stage name.
+            func (callable): Stage function, see `Node`.
+            deps (tuple, optional): Names of the upstream stages.
+            **params: Parameters of the stage and their default, parameters already
+                set keep their value.
+        """
+        if name in self._nodes:
+            raise ValueError('stage "{}" already exists'.format(name))
+        missing = [dep for dep in deps if dep not in self._nodes]
+        if missing:
+            raise ValueError(
+                'stage "{}" depends on unknown stages: {}'.format(
+                    name, ", ".join(missing)
+                )
+            )
+        for key, value in params.items():
+            self.params.setdefault(key, value)
+        self._nodes[name] = Node(name, func, deps=deps, params=params)
+        self.runs[name] = 0
+        return self._nodes[name]
+
+    def node(self, name, deps=(), **params):
+        """
+        Decorator form of `add`.
+        """
+
+        def register(func):
+            self.add(name, func, deps=deps, **params)
+            return func
+
+        return register
+
+    def downstream(self, names):
+        """
+        Names of the stages depending on any of `names`, them included, in order.
+        """
+        affected = set(names)
+        for node in self._nodes.values():
+            if affected.intersection(node.deps):
+                affected.add(node.name)
+        return [name for name in self._nodes if name in affected]
+
+    def invalidate(self, *names):
+        """
+        Drop the results of the stages and everything downstream.
+        """
+        for name in self.downstream(names):
+            if name in self._results:
+                del self._results[name]
+                logger.debug('"{}" invalidated'.format(name))
+
+    def set(self, **params):
+        """
+        Update parameters, invalidate the stages affected by changed values.
+
+        Returns:
+            (list): Names of the invalidated stages.
+        """
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise ValueError(
+                "unknown parameters: {}".format(", ".join(sorted(unknown)))
+            )
+        changed = set()
+        for key, value in params.items():
+            if canonical_params(self.params[key]) != canonical_params(value):
+                changed.add(key)
+            self.params[key] = value
+        if not changed:
+            return []
+
+        names = [
+            node.name
+            for node in self._nodes.values()
+            if changed.intersection(node.params)
+        ]
+        stale = [name for name in self.downstream(names) if name in self._results]
+        self.invalidate(*names)
+        return stale
+
+    def get(self, name):
+        """
+        Result of a stage, upstream stages are evaluated as needed.
+        """
+        try:
+            return self._results[name]
+        except KeyError:
+            pass
+        try:
+            node = self._nodes[name]
+        except KeyError:
+            raise ValueError('unknown stage "{}"'.format(name))
+
+        args = [self.get(dep) for dep in node.deps]
+        kwargs = {key: self.params[key] for key in node.params}
+        logger.debug('evaluating "{}"'.format(name))
+        with stage(name):
+            result = node.func(*args, **kwargs)
+        self._results[name] = result
+        self.runs[name] += 1
+        return result
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def is_cached(self, name):
+        return name in self._results
+
+    def clear(self):
+        self._results.clear()
+
+
+def _load(path, index, qc):
+    from .io import load_frame_group
+
+    return load_frame_group(path, index=index, return_index=True, qc=qc)
+
+
+def _filter(load, fs, lo_cutoff, notch, artifact, artifact_width):
+    from .filter import ac_notch, butter_lpf, remove_artifact
+
+    t, stimuli, rec, _ = load
+    if artifact and stimuli.max() > 0:
+        from .analyze import detect_onsets
+
+        onsets = detect_onsets(t, stimuli)
+        rec = remove_artifact(t, rec, onsets, width=artifact_width, method=artifact)
+    if notch:
+        rec = ac_notch(rec, fs, f0=notch)
+    return rec, butter_lpf(rec, lo_cutoff, fs)
+
+
+def _baseline(load, filtered, tmax):
+    from .filter import subtract_baseline
+
+    t = load[0]
+    rec, rec_filt = filtered
+    rec = subtract_baseline(t, rec, tmax=tmax)
+    rec_filt = subtract_baseline(t, rec_filt, tmax=tmax)
+    return rec, rec_filt
+
+
+def _crop(load, baseline, crop):
+    from .filter import t_crop
+
+    t = load[0]
+    rec, rec_filt = baseline
+    if crop is None:
+        return t, rec, rec_filt
+    _, rec_filt = t_crop(t, rec_filt, crop)
+    t, rec = t_crop(t, rec, crop)
+    return t - t[0], rec, rec_filt
+
+
+def _peak(cropped, delay):
+    from .analyze import batch_epsp_peak
+
+    t, _, rec_filt = cropped
+    return batch_epsp_peak(t, rec_filt, delay=delay)
+
+
+def _slope(cropped, peak, pct):
+    from .analyze import batch_epsp_slope
+
+    t, rec, _ = cropped
+    ipk, _ = peak
+    slope, r, _, valid = batch_epsp_slope(t, rec, ipk, pct=pct)
+    return slope, r, valid
+
+
+def _summary(load, cropped, peak, slope, r_min):
+    import pandas as pd
+
+    frames = load[3]
+    t, rec, _ = cropped
+    ipk, found = peak
+    slope, r, valid = slope
+
+    i = np.maximum(ipk, 0)
+    amp = np.take_along_axis(rec, i[:, np.newaxis], axis=-1)[:, 0]
+    table = pd.DataFrame(
+        {
+            "frame": frames,
+            "peak": np.where(found, t[i], np.nan),
+            "amplitude": np.where(found, amp, np.nan),
+            "slope": slope,
+            "r": r,
+        }
+    )
+    with np.errstate(invalid="ignore"):
+        table["accepted"] = valid & (np.abs(r) >= r_min)
+    logger.info("{} of {} frames accepted".format(table["accepted"].sum(), len(table)))
+    return table
+
+
+def epsp_pipeline(
+    path,
+    index=None,
+    qc=False,
+    fs=10e3,
+    lo_cutoff=1e3,
+    notch=None,
+    artifact=None,
+    artifact_width=0.002,
+    tmax=0.1,
+    crop=(0.1, 0.15),
+    delay=0.005,
+    pct=0.2,
+    r_min=0.7,
+):
+    """
+    EPSP analysis of a frame range as an incremental pipeline.
+
+    Stages are load, filter, baseline, crop, peak, slope and summary, the summary is
+    a table of per-frame peak time, amplitude, slope, correlation coefficient and
+    whether the regression passes `r_min`.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        fs (float, optional): Sampling frequency.
+        lo_cutoff (float, optional): LPF cutoff frequency.
+        notch (float, optional): AC frequency to remove before other filters.
+        artifact (str, optional): Stimulus artifact removal method.
+        artifact_width (float, optional): Duration of the stimulus artifact.
+        tmax (float, optional): Delay till the stimulus occur.
+        crop (tuple, optional): Timestamp range containing the EPSP.
+        delay (float, optional): EPSP search range delay.
+        pct (float, optional): Intensity single-sided windowing percentage.
+        r_min (float, optional): Minimum correlation coefficient of the slope.
+
+    Returns:
+        (Pipeline): The pipeline, evaluated on first access.
+    """
+    pipe = Pipeline()
+    pipe.add("load", _load, path=path, index=index, qc=qc)
+    pipe.add(
+        "filter",
+        _filter,
+        deps=("load",),
+        fs=fs,
+        lo_cutoff=lo_cutoff,
+        notch=notch,
+        artifact=artifact,
+        artifact_width=artifact_width,
+    )
+    pipe.add("baseline", _baseline, deps=("load", "filter"), tmax=tmax)
+    pipe.add("crop", _crop, deps=("load", "baseline"), crop=crop)
+    pipe.add("peak", _peak, deps=("crop",), delay=delay)
+    pipe.add("slope", _slope, deps=("crop", "peak"), pct=pct)
+    pipe.add("summary", _summary, deps=("load", "crop", "peak", "slope"), r_min=r_min)
+    return pipe
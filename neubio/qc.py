@@ -0,0 +1,204 @@
+"""
+Per-frame quality control, frames are screened once and rejected before analysis.
+
+    table = screen("trial_1.h5")
+    t, stimuli, rec = load_frame_group("trial_1.h5", qc=True)
+"""
+from collections import namedtuple
+import logging
+
+import numpy as np
+
+from .io import iter_frame_blocks, read_qc, write_qc
+
+__all__ = ["DEFAULT_THRESHOLDS", "QCMetrics", "qc_metrics", "reject_mask", "screen"]
+
+logger = logging.getLogger(__name__)
+
+QCMetrics = namedtuple(
+    "QCMetrics", ["baseline_rms", "drift", "artifact", "saturation", "line_noise"]
+)
+
+# absolute metric limits, None to reject outliers of the batch, drift is compared in
+# magnitude
+DEFAULT_THRESHOLDS = {
+    "baseline_rms": None,
+    "drift": None,
+    "artifact": None,
+    "saturation": 0.01,
+    "line_noise": None,
+}
+
+
+def qc_metrics(t, y, tmax=0.1, onset=None, artifact_width=0.002, line_freq=60.0):
+    """
+    Compute quality metrics for a batch of recordings in one pass.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Raw recordings, time on the last axis.
+        tmax (float, optional): Delay till the stimulus occur, samples before it are
+            the baseline.
+        onset (float, optional): Stimulus onset, default to `tmax`.
+        artifact_width (float, optional): Duration of the stimulus artifact.
+        line_freq (float, optional): Frequency of the AC line noise.
+
+    Returns:
+        (QCMetrics): Per-recording metrics.
+            baseline_rms: standard deviation of the baseline.
+            drift: slope of the baseline, in units per second.
+            artifact: largest deviation from the baseline median after the onset.
+            saturation: fraction of samples pinned at the recording extremes.
+            line_noise: amplitude of the baseline at the line frequency.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y)
+    if onset is None:
+        onset = tmax
+
+    i0 = np.argmax(t >= tmax)
+    if i0 < 2:
+        raise ValueError("baseline is shorter than 2 samples")
+    base = y[..., :i0].astype(np.float64)
+    tb = t[:i0] - t[:i0].mean()
+
+    # noise and drift of the baseline, accumulated in double precision
+    mean = base.mean(axis=-1, keepdims=True)
+    dy = base - mean
+    rms = np.sqrt((dy * dy).mean(axis=-1))
+    drift = (dy @ tb) / (tb @ tb)
+
+    # stimulus artifact relative to the baseline level
+    ia, ib = np.argmax(t >= onset), np.argmax(t >= onset + artifact_width) + 1
+    median = np.median(base, axis=-1, keepdims=True)
+    artifact = np.abs(y[..., ia:ib] - median).max(axis=-1)
+
+    # a clipped recording repeats its extremes
+    n = y.shape[-1]
+    pinned = (y == y.max(axis=-1, keepdims=True)).sum(axis=-1) + (
+        y == y.min(axis=-1, keepdims=True)
+    ).sum(axis=-1)
+    saturation = (pinned - 2) / n
+
+    # single-bin DFT of the baseline at the line frequency
+    phasor = np.exp(-2j * np.pi * line_freq * t[:i0])
+    line_noise = 2 * np.abs(dy @ phasor) / i0
+
+    return QCMetrics(rms, drift, artifact, saturation, line_noise)
+
+
+def reject_mask(metrics, thresholds=None, n_mad=5.0):
+    """
+    Flag frames exceeding the metric limits.
+
+    A metric without an absolute limit rejects the outliers of the batch, over
+    `n_mad` scaled median absolute deviations above the median.
+
+    Args:
+        metrics (QCMetrics): Per-frame metrics.
+        thresholds (dict, optional): Absolute limit of each metric, see
+            `DEFAULT_THRESHOLDS`.
+        n_mad (float, optional): Outlier limit in scaled median absolute deviations.
+
+    Returns:
+        (tuple): tuple containing:
+            reject (ndarray): True for rejected frames.
+            limits (dict): Limit applied to each metric.
+    """
+    limits = dict(DEFAULT_THRESHOLDS)
+    if thresholds is not None:
+        unknown = set(thresholds) - set(limits)
+        if unknown:
+            raise ValueError("unknown metrics: {}".format(", ".join(sorted(unknown))))
+        limits.update(thresholds)
+
+    reject = np.zeros(np.shape(metrics.baseline_rms), dtype=bool)
+    for name, values in metrics._asdict().items():
+        values = np.abs(values)
+        limit = limits[name]
+        if limit is None:
+            median = np.median(values)
+            # consistent with the standard deviation of normal distributions
+            mad = 1.4826 * np.median(np.abs(values - median))
+            limit = median + n_mad * mad
+        limits[name] = float(limit)
+
+        exceeded = values > limit
+        if exceeded.any():
+            logger.info("{}: {} frames over {:.4g}".format(name, exceeded.sum(), limit))
+        reject |= exceeded
+    return reject, limits
+
+
+def screen(
+    path,
+    index=None,
+    tmax=0.1,
+    artifact_width=0.002,
+    line_freq=60.0,
+    thresholds=None,
+    n_mad=5.0,
+    block_size=1024,
+    write=True,
+):
+    """
+    Screen the frames of a file and store the reject mask in it.
+
+    Metrics are computed block by block, the stimulus onset is detected from the
+    stimuli channel of the first frame.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end), default to all the frames.
+        tmax (float, optional): Delay till the stimulus occur.
+        artifact_width (float, optional): Duration of the stimulus artifact.
+        line_freq (float, optional): Frequency of the AC line noise.
+        thresholds (dict, optional): Absolute limit of each metric.
+        n_mad (float, optional): Outlier limit of metrics without absolute limit.
+        block_size (int, optional): Number of frames loaded at once.
+        write (bool, optional): Store the result in the file, replacing the frames
+            screened before.
+
+    Returns:
+        (DataFrame): Frame number, metrics and reject flag of each frame.
+    """
+    import pandas as pd
+
+    from .analyze import detect_onsets
+
+    frames, metrics, onset = [], [], None
+    for t, stimuli, rec, frames_ in iter_frame_blocks(
+        path, index, block_size=block_size
+    ):
+        if onset is None:
+            onset = detect_onsets(t, stimuli)[0] if stimuli.max() > 0 else tmax
+            logger.debug("stimulus onset at {:.4f}s".format(onset))
+        metrics.append(
+            qc_metrics(
+                t,
+                rec,
+                tmax=tmax,
+                onset=onset,
+                artifact_width=artifact_width,
+                line_freq=line_freq,
+            )
+        )
+        frames.append(frames_)
+    if not frames:
+        raise ValueError("no frame to screen")
+    metrics = QCMetrics(*(np.concatenate(field) for field in zip(*metrics)))
+
+    reject, limits = reject_mask(metrics, thresholds=thresholds, n_mad=n_mad)
+    table = pd.DataFrame({"frame": np.concatenate(frames), **metrics._asdict()})
+    table["reject"] = reject
+    logger.info("{} of {} frames rejected".format(reject.sum(), len(reject)))
+
+    if write:
+        previous, _ = read_qc(path)
+        if previous is not None:
+            # keep frames outside of the screened range
+            previous = previous[~previous["frame"].isin(table["frame"])]
+            table = pd.concat([previous, table], ignore_index=True)
+            table = table.sort_values("frame", ignore_index=True)
+        write_qc(path, table, limits)
+    return table
@@ -0,0 +1,204 @@
+"""
+Resampling statistics over batches of resamples.
+"""
+import logging
+
+import numpy as np
+
+__all__ = ["bootstrap", "bootstrap_ci", "permutation_test"]
+
+logger = logging.getLogger(__name__)
+
+# maximum number of elements in a resampling matrix
+MAX_BATCH_ELEMENTS = 1 << 22
+# permutation batches stay in cache while they are partitioned
+PERMUTATION_BATCH_ELEMENTS = 1 << 18
+
+
+def _mean_diff(x, y, axis=-1):
+    return np.mean(y, axis=axis) - np.mean(x, axis=axis)
+
+
+def _as_samples(data):
+    """
+    Normalize input to a tuple of equal-length 1-D arrays without non-finite rows.
+
+    Only a tuple is treated as paired samples, any other input, including a list,
+    is a single sample.
+    """
+    if not isinstance(data, tuple):
+        data = (data,)
+    data = tuple(np.asarray(d, dtype=np.float64).ravel() for d in data)
+    if len(set(len(d) for d in data)) > 1:
+        raise ValueError("paired samples must have the same length")
+    mask = np.logical_and.reduce([np.isfinite(d) for d in data])
+    if not mask.all():
+        logger.debug("ignored {} non-finite samples".format(np.count_nonzero(~mask)))
+    if not mask.any():
+        raise ValueError("no valid samples")
+    return tuple(d[mask] for d in data)
+
+
+def _batches(n_resamples, n, max_elements=MAX_BATCH_ELEMENTS):
+    batch_size = max(max_elements // max(n, 1), 1)
+    for start in range(0, n_resamples, batch_size):
+        yield min(batch_size, n_resamples - start)
+
+
+def bootstrap(data, statistic=np.mean, n_resamples=10000, seed=None):
+    """
+    Bootstrap distribution of a statistic.
+
+    Resamples are drawn as index matrices and evaluated in batches, `statistic` is
+    called once per batch along the last axis.
+
+    Args:
+        data (array_like or tuple): Samples, a tuple of arrays is resampled jointly
+            as paired observations. Non-finite entries are ignored.
+        statistic (callable, optional): Function called as statistic(*samples, axis=-1).
+        n_resamples (int, optional): Number of resamples.
+        seed (int, optional): Seed of the resampling.
+
+    Returns:
+        (ndarray): Statistic of each resample.
+    """
+    data = _as_samples(data)
+    n = len(data[0])
+    rng = np.random.default_rng(seed)
+
+    dist = []
+    for b in _batches(n_resamples, n):
+        index = rng.integers(0, n, size=(b, n))
+        dist.append(statistic(*(d[index] for d in data), axis=-1))
+    return np.concatenate(dist)
+
+
+def bootstrap_ci(
+    data,
+    statistic=np.mean,
+    n_resamples=10000,
+    confidence=0.95,
+    method="percentile",
+    seed=None,
+):
+    """
+    Bootstrap confidence interval of a statistic.
+
+    Args:
+        data (array_like or tuple): Samples, a tuple of arrays is resampled jointly
+            as paired observations, e.g. (amp1, amp2) for the paired-pulse ratio.
+        statistic (callable, optional): Function called as statistic(*samples, axis=-1).
+        n_resamples (int, optional): Number of resamples.
+        confidence (float, optional): Confidence level.
+        method (str, optional): Either "percentile" or "basic".
+        seed (int, optional): Seed of the resampling.
+
+    Returns:
+        (tuple): tuple containing:
+            estimate (float): Statistic of the original samples.
+            low (float): Lower bound of the interval.
+            high (float): Upper bound of the interval.
+    """
+    if method not in ("percentile", "basic"):
+        raise ValueError('unknown method "{}"'.format(method))
+
+    samples = _as_samples(data)
+    estimate = float(statistic(*samples, axis=-1))
+    dist = bootstrap(samples, statistic, n_resamples=n_resamples, seed=seed)
+
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(dist, [alpha, 1 - alpha])
+    if method == "basic":
+        low, high = 2 * estimate - high, 2 * estimate - low
+    return estimate, float(low), float(high)
+
+
+def _permuted_statistic(pooled, nx, statistic, n_resamples, rng):
+    """
+    Statistic of each permutation, in batches.
+    """
+    n = len(pooled)
+    kth = min(nx, n - 1)
+    for b in _batches(n_resamples, n, PERMUTATION_BATCH_ELEMENTS):
+        perm = pooled[np.argpartition(rng.random((b, n)), kth, axis=-1)]
+        yield statistic(perm[:, :nx], perm[:, nx:], axis=-1)
+
+
+def _permuted_mean_diff(pooled, nx, n_resamples, rng):
+    """
+    Difference of means of each permutation, in batches, from the sum over the
+    smaller condition drawn as a mask of the smallest 32-bit random keys.
+    """
+    n = len(pooled)
+    ny = n - nx
+    k = min(nx, ny)
+    total = pooled.sum()
+    for b in _batches(n_resamples, n, PERMUTATION_BATCH_ELEMENTS):
+        raw = rng.bit_generator.random_raw(-(-b * n // 2))
+        keys = raw.view(np.uint32)[: b * n].reshape(b, n)
+        threshold = np.partition(keys, k - 1, axis=-1)[:, k - 1 : k]
+        mask = keys <= threshold
+        # rows with a tie at the threshold, drawn exactly
+        for i in np.flatnonzero(np.count_nonzero(mask, axis=-1) != k):
+            mask[i] = False
+            mask[i, np.argpartition(keys[i], k - 1)[:k]] = True
+        s = mask.astype(np.float64) @ pooled
+        sx, sy = (s, total - s) if k == nx else (total - s, s)
+        yield sy / ny - sx / nx
+
+
+def permutation_test(
+    x, y, statistic=_mean_diff, n_resamples=10000, alternative="two-sided", seed=None
+):
+    """
+    Permutation test between two conditions.
+
+    Each permutation draws the samples of the first condition as the smallest of
+    random keys over the pooled samples, by partition rather than a full shuffle, on
+    batches of `PERMUTATION_BATCH_ELEMENTS`. `statistic` is called once per batch
+    along the last axis and should not depend on the order of the samples within a
+    condition.
+
+    The default difference of means is evaluated from the sum over the smaller
+    condition only, without gathering the permuted samples.
+
+    Args:
+        x (array_like): Samples of the first condition, e.g. control.
+        y (array_like): Samples of the second condition, e.g. treatment.
+        statistic (callable, optional): Function called as statistic(x, y, axis=-1),
+            default to the difference of means, mean(y) - mean(x).
+        n_resamples (int, optional): Number of permutations.
+        alternative (str, optional): One of "two-sided", "less" or "greater".
+        seed (int, optional): Seed of the permutations.
+
+    Returns:
+        (tuple): tuple containing:
+            observed (float): Statistic of the original labelling.
+            pvalue (float): Permutation p-value.
+    """
+    if alternative not in ("two-sided", "less", "greater"):
+        raise ValueError('unknown alternative "{}"'.format(alternative))
+
+    (x,), (y,) = _as_samples(x), _as_samples(y)
+    nx = len(x)
+    pooled = np.concatenate([x, y])
+    rng = np.random.default_rng(seed)
+
+    observed = float(statistic(x, y, axis=-1))
+    if statistic is _mean_diff:
+        dists = _permuted_mean_diff(pooled, nx, n_resamples, rng)
+    else:
+        dists = _permuted_statistic(pooled, nx, statistic, n_resamples, rng)
+    # labellings as extreme as the observed one may differ by rounding
+    eps = 1e-12 * abs(observed)
+    n_extreme = 0
+    for dist in dists:
+        if alternative == "two-sided":
+            n_extreme += np.count_nonzero(np.abs(dist) >= abs(observed) - eps)
+        elif alternative == "greater":
+            n_extreme += np.count_nonzero(dist >= observed - eps)
+        else:
+            n_extreme += np.count_nonzero(dist <= observed + eps)
+
+    pvalue = float(n_extreme + 1) / (n_resamples + 1)
+    return observed, pvalue
@@ -0,0 +1,276 @@
+"""
+Rasterized views of many frames, traces are binned into images with NumPy instead of
+drawn one line at a time.
+
+    canvas = TraceCanvas(width=800, height=400)
+    for t, stimuli, rec, frames in iter_frame_blocks("trial_1.h5"):
+        canvas.add(t, rec)
+    plot_density(ax, canvas)
+"""
+import logging
+
+import numpy as np
+
+from .instrument import instrument
+from .io import iter_frame_blocks
+
+__all__ = [
+    "TraceCanvas",
+    "density_image",
+    "frame_heatmap",
+    "overview",
+    "plot_density",
+    "plot_heatmap",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class TraceCanvas(object):
+    """
+    Density image of overlaid traces.
+
+    Every trace is reduced to the minimum and maximum of the samples in each pixel
+    column, joined with the last sample of the previous column, and the vertical span
+    is accumulated through the difference of its end points along the rows. A trace
+    costs O(samples + columns) regardless of the image height.
+
+    Args:
+        width (int, optional): Image width in pixels, columns span the timestamps.
+        height (int, optional): Image height in pixels.
+        xlim (tuple, optional): Timestamp range, default to the first traces.
+        ylim (tuple, optional): Value range, default to the 0.1-99.9 percentiles of the
+            first traces, values out of the range are clipped to the edges.
+    """
+
+    def __init__(self, width=800, height=400, xlim=None, ylim=None):
+        self.width, self.height = width, height
+        self.xlim, self.ylim = xlim, ylim
+        self.n = 0
+        self._diff = np.zeros((height + 1) * width, dtype=np.int64)
+
+    @instrument("render")
+    def add(self, t, y):
+        """
+        Accumulate traces.
+
+        Args:
+            t (ndarray): Timestamps.
+            y (ndarray): A trace, or traces stacked on the first axis.
+        """
+        y = np.asarray(y)
+        y = y.reshape(-1, y.shape[-1])
+        if y.shape[0] == 0:
+            return
+        if self.xlim is None:
+            self.xlim = (float(t[0]), float(t[-1]))
+        if self.ylim is None:
+            lo, hi = np.percentile(y, [0.1, 99.9])
+            pad = 0.05 * (hi - lo) or 1.0
+            self.ylim = (float(lo - pad), float(hi + pad))
+        (x0, x1), (y0, y1) = self.xlim, self.ylim
+
+        # pixel column of each sample in range, runs of a column are contiguous
+        t = np.asarray(t)
+        i0, i1 = np.searchsorted(t, x0), np.searchsorted(t, x1, side="right")
+        if i1 <= i0:
+            return
+        col = ((t[i0:i1] - x0) / (x1 - x0) * self.width).astype(np.intp)
+        col = np.minimum(col, self.width - 1)
+        starts = np.flatnonzero(np.r_[True, np.diff(col) > 0])
+        cols = col[starts]
+        y = y[:, i0:i1]
+
+        ymin = np.minimum.reduceat(y, starts, axis=1)
+        ymax = np.maximum.reduceat(y, starts, axis=1)
+        # join columns with the last sample of the previous column
+        last = y[:, np.append(starts[1:], y.shape[1]) - 1]
+        ymin[:, 1:] = np.minimum(ymin[:, 1:], last[:, :-1])
+        ymax[:, 1:] = np.maximum(ymax[:, 1:], last[:, :-1])
+
+        # columns between samples, when zoomed in past the sampling rate, bridge the
+        # neighbouring samples
+        if len(cols) < cols[-1] - cols[0] + 1:
+            every = np.arange(cols[0], cols[-1] + 1)
+            k = np.searchsorted(cols, every)
+            empty = cols[k] != every
+            a, b = last[:, k[empty] - 1], y[:, starts[k[empty]]]
+            ymin_, ymax_ = np.empty((2, y.shape[0], len(every)), dtype=ymin.dtype)
+            ymin_[:, ~empty], ymax_[:, ~empty] = ymin, ymax
+            ymin_[:, empty], ymax_[:, empty] = np.minimum(a, b), np.maximum(a, b)
+            ymin, ymax, cols = ymin_, ymax_, every
+
+        scale = self.height / (y1 - y0)
+        lo = np.clip(np.floor((ymin - y0) * scale), 0, self.height - 1)
+        hi = np.clip(np.floor((ymax - y0) * scale), 0, self.height - 1)
+        lo, hi = lo.astype(np.intp), hi.astype(np.intp)
+
+        size = self._diff.size
+        self._diff += np.bincount((lo * self.width + cols).ravel(), minlength=size)
+        self._diff -= np.bincount(
+            ((hi + 1) * self.width + cols).ravel(), minlength=size
+        )
+        self.n += y.shape[0]
+
+    @property
+    def image(self):
+        """Number of traces through each pixel, the first row is the lowest value."""
+        diff = self._diff.reshape(self.height + 1, self.width)
+        return np.cumsum(diff, axis=0)[: self.height]
+
+    @property
+    def extent(self):
+        """(left, right, bottom, top) of the image in data coordinates."""
+        return self.xlim + self.ylim
+
+
+def density_image(t, y, width=800, height=400, xlim=None, ylim=None):
+    """
+    Rasterize overlaid traces into a density image.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Traces stacked on the first axis.
+        width (int, optional): Image width in pixels.
+        height (int, optional): Image height in pixels.
+        xlim (tuple, optional): Timestamp range.
+        ylim (tuple, optional): Value range.
+
+    Returns:
+        (tuple): tuple containing:
+            image (ndarray): Number of traces through each pixel.
+            extent (tuple): (left, right, bottom, top) in data coordinates.
+    """
+    canvas = TraceCanvas(width=width, height=height, xlim=xlim, ylim=ylim)
+    canvas.add(t, y)
+    return canvas.image, canvas.extent
+
+
+@instrument("render")
+def frame_heatmap(t, y, width=1000):
+    """
+    Bin a frames x time heatmap along the time axis.
+
+    Args:
+        t (ndarray): Timestamps.
+        y (ndarray): Traces stacked on the first axis.
+        width (int, optional): Maximum number of time bins, each bin is the mean of
+            its samples.
+
+    Returns:
+        (tuple): tuple containing:
+            t (ndarray): Timestamp of each bin.
+            image (ndarray): Binned traces, one row per frame.
+    """
+    y = np.asarray(y)
+    n = y.shape[-1]
+    if n <= width:
+        return np.asarray(t), y
+    starts = (np.arange(width) * n) // width
+    counts = np.diff(np.append(starts, n))
+    image = np.add.reduceat(y, starts, axis=-1, dtype=np.float64) / counts
+    return np.asarray(t)[starts], image
+
+
+def plot_density(ax, canvas, cmap="magma", log=True, **kwargs):
+    """
+    Draw a `TraceCanvas`.
+
+    Args:
+        ax (Axes): Matplotlib axes.
+        canvas (TraceCanvas): Accumulated traces.
+        cmap (str, optional): Colormap.
+        log (bool, optional): Logarithmic color scale.
+        **kwargs: Passed to `imshow`.
+    """
+    from matplotlib.colors import LogNorm
+
+    image = np.ma.masked_equal(canvas.image, 0)
+    norm = LogNorm(vmin=1, vmax=max(image.max(), 1)) if log else None
+    return ax.imshow(
+        image,
+        origin="lower",
+        extent=canvas.extent,
+        aspect="auto",
+        cmap=cmap,
+        norm=norm,
+        interpolation="nearest",
+        **kwargs
+    )
+
+
+def plot_heatmap(ax, t, image, frames=None, cmap="RdBu_r", **kwargs):
+    """
+    Draw a frames x time heatmap, see `frame_heatmap`.
+
+    Args:
+        ax (Axes): Matplotlib axes.
+        t (ndarray): Timestamp of each column.
+        image (ndarray): Binned traces, one row per frame.
+        frames (ndarray, optional): Frame number of each row.
+        cmap (str, optional): Colormap, centered on zero.
+        **kwargs: Passed to `imshow`.
+    """
+    if frames is None:
+        frames = np.arange(image.shape[0])
+    vmax = np.percentile(np.abs(image), 99.5) or None
+    return ax.imshow(
+        image,
+        origin="lower",
+        extent=(t[0], t[-1], frames[0] - 0.5, frames[-1] + 0.5),
+        aspect="auto",
+        cmap=cmap,
+        vmin=-vmax if vmax else None,
+        vmax=vmax,
+        interpolation="nearest",
+        **kwargs
+    )
+
+
+def overview(path, index=None, crop=None, tmax=0.1, qc=False, width=800, height=400):
+    """
+    Density overlay and heatmap of a frame range in one figure, streamed from storage.
+
+    Args:
+        path (str): Path to the HDF5 file or the `.npy` directory store.
+        index (tuple, optional): Frame range (start, end).
+        crop (tuple, optional): Timestamp range to show.
+        tmax (float, optional): Delay till the stimulus occur, the baseline is
+            subtracted from every frame.
+        qc (bool, optional): Leave out frames rejected by the stored QC mask.
+        width (int, optional): Image width in pixels.
+        height (int, optional): Density image height in pixels.
+
+    Returns:
+        (Figure): The figure.
+    """
+    import matplotlib.pyplot as plt
+
+    from .filter import subtract_baseline, t_crop
+
+    canvas = TraceCanvas(width=width, height=height)
+    t_bins, rows, frames = None, [], []
+    for t, _, rec, frames_ in iter_frame_blocks(path, index, qc=qc):
+        rec = subtract_baseline(t, rec, tmax=tmax)
+        t_, rec = t_crop(t, rec, crop) if crop is not None else (t, rec)
+        canvas.add(t_, rec)
+        t_bins, binned = frame_heatmap(t_, rec, width=width)
+        rows.append(binned)
+        frames.append(frames_)
+    if canvas.n == 0:
+        raise ValueError("no frame to show")
+    frames = np.concatenate(frames)
+    logger.info("{} frames rendered".format(canvas.n))
+
+    fig, (ax0, ax1) = plt.subplots(2, 1, sharex=True, figsize=(8, 8))
+    fig.colorbar(plot_density(ax0, canvas), ax=ax0, label="Frames")
+    ax0.set_ylabel("Intensity (mV)")
+    # frame numbers may skip rejected frames, rows are drawn in order
+    heatmap = plot_heatmap(ax1, t_bins, np.concatenate(rows))
+    fig.colorbar(heatmap, ax=ax1, label="Intensity (mV)")
+    ax1.set_xlabel("Time (s)")
+    ax1.set_ylabel("Frame")
+    ticks = np.linspace(0, len(frames) - 1, min(len(frames), 6)).astype(int)
+    ax1.set_yticks(ticks)
+    ax1.set_yticklabels(frames[ticks])
+    return fig
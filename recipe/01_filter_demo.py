@@ -2,10 +2,9 @@ import logging
 
 import coloredlogs
 import matplotlib.pyplot as plt
-import numpy as np
 
+from neubio.analyze import average_frames
 from neubio.filter import butter_lpf, subtract_baseline, t_crop
-from neubio.io import load_frame_group
 
 logger = logging.getLogger(__name__)
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
@@ -30,22 +29,19 @@ def main(index, name="filter_demo_sink"):
     plt.cla()
 
     # load data
-    t, stim, rec = load_frame_group(path, index=index, stacked=False)
-    # apply filter
-    rec_filt = []
-    for rec_ in rec:
-        rec_ = butter_lpf(rec_, lo_cutoff, fs)
-        rec_filt.append(rec_)
+    t, stim, avg = average_frames(path, index=index, qc=True)
     # mean
-    rec = np.stack(rec, axis=0).mean(axis=0)
-    rec = subtract_baseline(t, rec)
+    rec = subtract_baseline(t, avg.mean)
 
     crop = (0.1, 0.15)
 
     t_, rec = t_crop(t, rec, crop)
+    _, sem = t_crop(t, avg.sem, crop)
+    ax.fill_between(t_, rec - sem, rec + sem, color="r", alpha=0.2, linewidth=0)
     ax.plot(t_, rec, "r", label="raw", linewidth=1)
 
-    rec_filt = np.stack(rec_filt, axis=0).mean(axis=0)
+    # the LPF is linear so filtering the mean equals averaging the filtered
+    rec_filt = butter_lpf(avg.mean, lo_cutoff, fs)
     rec_filt = subtract_baseline(t, rec_filt)
 
     t_, rec_filt = t_crop(t, rec_filt, crop)
@@ -3,11 +3,9 @@ import logging
 import coloredlogs
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
-import numpy as np
 
-from neubio.analyze import find_epsp_peak, epsp_slope
+from neubio.analyze import average_frames, find_epsp_peak, epsp_slope
 from neubio.filter import butter_lpf, subtract_baseline, t_crop
-from neubio.io import load_frame_group
 
 logger = logging.getLogger(__name__)
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
@@ -32,15 +30,9 @@ def main(index, name="filter_demo_sink"):
     plt.cla()
 
     # load data
-    t, stim, rec = load_frame_group(path, index=index, stacked=False)
-    # apply filter
-    rec_filt = []
-    for rec_ in rec:
-        rec_ = butter_lpf(rec_, lo_cutoff, fs)
-        rec_filt.append(rec_)
+    t, stim, avg = average_frames(path, index=index, qc=True)
     # mean
-    rec = np.stack(rec, axis=0).mean(axis=0)
-    rec = subtract_baseline(t, rec)
+    rec = subtract_baseline(t, avg.mean)
 
     # visualize raw data
     crop = (0.1, 0.15)
@@ -51,7 +43,8 @@ def main(index, name="filter_demo_sink"):
     ax.axhline(0, color="k", linestyle=":", linewidth=0.5)
 
     # using filtered signal to extract slope
-    rec_filt = np.stack(rec_filt, axis=0).mean(axis=0)
+    # the LPF is linear so filtering the mean equals averaging the filtered
+    rec_filt = butter_lpf(avg.mean, lo_cutoff, fs)
     rec_filt = subtract_baseline(t, rec_filt)
 
     t_, rec_filt = t_crop(t, rec_filt, crop)
@@ -2,11 +2,10 @@ import logging
 
 import coloredlogs
 import matplotlib.pyplot as plt
-import numpy as np
 
-from neubio.analyze import find_epsp_peak, epsp_slope
+from neubio.analyze import TraceAverager, find_epsp_peak, epsp_slope
 from neubio.filter import butter_lpf, subtract_baseline, t_crop
-from neubio.io import load_frame_group
+from neubio.io import annotate, read_meta, select
 
 logger = logging.getLogger(__name__)
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
@@ -19,6 +18,19 @@ coloredlogs.install(
 ### data source
 path = "../data/01_drug/trial_2.h5"
 
+### conditions, annotated once and stored in the file
+conditions = {
+    "Control": (11, 123),
+    "DNQX": (244, 254),
+    "Mg-free": (441, 476),
+    "AP5": (500, 537),
+    "TTX": (538, -1),
+}
+if read_meta(path) is None:
+    for condition, index in conditions.items():
+        drug = condition if condition not in ("Control", "Mg-free") else ""
+        annotate(path, index, condition=condition, drug=drug)
+
 ### filter
 fs = 10e3
 lo_cutoff = 1e3
@@ -27,19 +39,16 @@ lo_cutoff = 1e3
 fig, ax = plt.subplots()
 
 
-def preprocess(index, crop):
+def preprocess(condition, crop):
     # load data
-    t, stim, rec = load_frame_group(path, index=index, stacked=False)
-    # apply filter
-    rec_filt = []
-    for rec_ in rec:
-        rec_ = butter_lpf(rec_, lo_cutoff, fs)
-        rec_filt.append(rec_)
+    t, stim, rec = select(path, condition=condition, qc=True)
+    averager = TraceAverager()
+    averager.update(rec)
+    avg = averager.result()
     # mean
-    rec = np.stack(rec, axis=0).mean(axis=0)
-    rec = subtract_baseline(t, rec)
-    # filter
-    rec_filt = np.stack(rec_filt, axis=0).mean(axis=0)
+    rec = subtract_baseline(t, avg.mean)
+    # filter, the LPF is linear so filtering the mean equals averaging the filtered
+    rec_filt = butter_lpf(avg.mean, lo_cutoff, fs)
     rec_filt = subtract_baseline(t, rec_filt)
 
     # crop
@@ -52,14 +61,14 @@ def preprocess(index, crop):
     return t_, rec, rec_filt
 
 
-def compare_plot(indice, labels, name="untitled", **kwargs):
+def compare_plot(conditions, labels, name="untitled", **kwargs):
     plt.cla()
 
     coarse_crop = (0.1, 0.15)
     ax.axhline(0, color="k", linestyle=":", linewidth=0.5)
 
-    for index, label, c in zip(indice, labels, ["r", "b", "k"]):
-        t, rec, rec_filt = preprocess(index, coarse_crop)
+    for condition, label, c in zip(conditions, labels, ["r", "b", "k"]):
+        t, rec, rec_filt = preprocess(condition, coarse_crop)
 
         # visualize data
         ax.plot(t, rec, c, label=label, linewidth=1)
@@ -84,22 +93,22 @@ def compare_plot(indice, labels, name="untitled", **kwargs):
     plt.waitforbuttonpress()
 
 
-compare_plot([(11, 123), (244, 254)], ["Control", "DNQX treatment"], "1_ampa_no-ampa")
+compare_plot(["Control", "DNQX"], ["Control", "DNQX treatment"], "1_ampa_no-ampa")
 
 
 
 
 compare_plot(
-    [(11, 123), (441, 476)], ["Control", "Mg$^{2+}$ free ACSF"], "2_ampa_nmda"
+    ["Control", "Mg-free"], ["Control", "Mg$^{2+}$ free ACSF"], "2_ampa_nmda"
 )
 
 
 compare_plot(
-    [(441, 476), (500, 537)], ["Mg$^{2+}$ free ACSF", "AP5 treatment"], "3_nmda_no-nmda"
+    ["Mg-free", "AP5"], ["Mg$^{2+}$ free ACSF", "AP5 treatment"], "3_nmda_no-nmda"
 )
 
 
 compare_plot(
-    [(11, 123), (441, 476), (538, -1)], ["Control", "Mg$^{2+}$ free ACSF", "TTX treatment"], "4_ampa_nmda_none"
+    ["Control", "Mg-free", "TTX"], ["Control", "Mg$^{2+}$ free ACSF", "TTX treatment"], "4_ampa_nmda_none"
 )
 
@@ -4,9 +4,8 @@ import coloredlogs
 import matplotlib.pyplot as plt
 import numpy as np
 
-from neubio.analyze import find_epsp_peak, epsp_slope
+from neubio.analyze import average_frames, find_epsp_peak, epsp_slope
 from neubio.filter import butter_lpf, subtract_baseline, t_crop
-from neubio.io import load_frame_group
 
 logger = logging.getLogger(__name__)
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
@@ -29,17 +28,11 @@ fig, ax = plt.subplots()
 
 def preprocess(index):
     # load data
-    t, stim, rec = load_frame_group(path, index=index, stacked=False)
-    # apply filter
-    rec_filt = []
-    for rec_ in rec:
-        rec_ = butter_lpf(rec_, lo_cutoff, fs)
-        rec_filt.append(rec_)
+    t, stim, avg = average_frames(path, index=index, qc=True)
     # mean
-    rec = np.stack(rec, axis=0).mean(axis=0)
-    rec = subtract_baseline(t, rec)
-    # filter
-    rec_filt = np.stack(rec_filt, axis=0).mean(axis=0)
+    rec = subtract_baseline(t, avg.mean)
+    # filter, the LPF is linear so filtering the mean equals averaging the filtered
+    rec_filt = butter_lpf(avg.mean, lo_cutoff, fs)
     rec_filt = subtract_baseline(t, rec_filt)
 
     # split data by stimuli
@@ -4,8 +4,8 @@ import coloredlogs
 import matplotlib.pyplot as plt
 import numpy as np
 
-from neubio.analyze import find_epsp_peak, epsp_slope
-from neubio.filter import butter_lpf, subtract_baseline, t_crop
+from neubio.analyze import detect_onsets, fit_quantal, pulse_train, quantal_pdf
+from neubio.filter import butter_lpf, subtract_baseline
 from neubio.io import load_frame_group
 
 logger = logging.getLogger(__name__)
@@ -29,82 +29,26 @@ fig, ax = plt.subplots()
 
 def preprocess(index):
     # load data
-    t, stim, rec = load_frame_group(path, index=index, stacked=False)
+    t, stim, rec = load_frame_group(path, index=index, qc=True)
 
     # determine stimuli split point
-    ts1 = np.argmax(stim)
-    # mask first stimuli
-    stim[ts1 : ts1 + 100] = 0
-    ts2 = np.argmax(stim)
-    ts1, ts2 = t[ts1], t[ts2]
-    logger.debug("stimuli timestamp: {}, {}".format(ts1, ts2))
+    onsets = detect_onsets(t, stim, n_pulses=2)
 
     logger.info("applying LPF and background subtraction")
     # apply filter and subtract baseline
-    rec_tmp, rec_filt = [], []
-    for rec_ in rec:
-        rec_lpf = butter_lpf(rec_, lo_cutoff, fs)
-        rec_lpf = subtract_baseline(t, rec_lpf)
-        rec_filt.append(rec_lpf)
-
-        rec_ori = subtract_baseline(t, rec_)
-        rec_tmp.append(rec_ori)
-    rec = rec_tmp
-
-    logger.info("cropping")
-    # split stimuli
-    t_ = None
-    rec1, rec2 = [], []
-    rec_filt1, rec_filt2 = [], []
-    for rec_, rec_filt_ in zip(rec, rec_filt):
-        t_, rec1_ = t_crop(t, rec_, (ts1, ts2))
-        rec1.append(rec1_)
-        _, rec_filt1_ = t_crop(t, rec_filt_, (ts1, ts2))
-        rec_filt1.append(rec_filt1_)
-
-        _, rec2_ = t_crop(t, rec_, (ts2, 2 * ts2 - ts1))
-        rec2.append(rec2_)
-        _, rec_filt2_ = t_crop(t, rec_filt_, (ts2, 2 * ts2 - ts1))
-        rec_filt2.append(rec_filt2_)
-
-    # offset t
-    t_ -= t_[0]
-    return (
-        t_,
-        [np.stack(rec1, axis=0), np.stack(rec2, axis=0)],
-        [np.stack(rec_filt1, axis=0), np.stack(rec_filt2, axis=0)],
-    )
+    rec_filt = subtract_baseline(t, butter_lpf(rec, lo_cutoff, fs))
+    rec = subtract_baseline(t, rec)
+
+    return t, onsets, rec, rec_filt
 
 
 def extract_amplitudes(index, r_min=0.7):
-    t, rec, rec_filt = preprocess(index)
-
-    i = 0
-    amp = []
-    for rec1_, rec_filt1_, rec2_, rec_filt2_ in zip(
-        rec[0], rec_filt[0], rec[1], rec_filt[1]
-    ):
-        # using filtered signal to extract slope
-        ipk, _ = find_epsp_peak(t, rec_filt1_)
-        # slope
-        _, r, _, _ = epsp_slope(t, rec1_, ipk, yf=rec_filt1_, return_pos=True)
-        if abs(r) < r_min:
-            i += 1
-            logger.warning("discarded new frame ({}), r={:.4f}, ".format(i, r))
-        else:
-            amp.append(rec1_[ipk])
-
-        # using filtered signal to extract slope
-        ipk, _ = find_epsp_peak(t, rec_filt2_)
-        # slope
-        _, r, _, _ = epsp_slope(t, rec2_, ipk, yf=rec_filt2_, return_pos=True)
-        if abs(r) < r_min:
-            i += 1
-            logger.warning("discarded new frame ({}), r={:.4f}, ".format(i, r))
-        else:
-            amp.append(rec2_[ipk])
-
-    return amp
+    t, onsets, rec, rec_filt = preprocess(index)
+
+    # using filtered signal to extract slope
+    train = pulse_train(t, rec, onsets, yf=rec_filt, r_min=r_min)
+
+    return train.amplitude[train.valid].tolist()
 
 
 mapping = {0.5: (301, 355), 2.5: (247, 300), 5.0: (400, 462)}
@@ -126,10 +70,21 @@ bins = (edges[:-1] + edges[1:])/2
 
 print(hist)
 
+# equally spaced gaussian mixture
+fit, _ = fit_quantal(amp)
+print("N={}".format(fit.n_sites))
+print(".. q={:.4f}".format(fit.quantal_size))
+print(".. p={:.4f}".format(fit.release_prob))
+print()
+
 # plot histogram
 plt.cla()
 ax.bar(bins, hist, width=0.05)
 
+# overlay fitted density, scaled to counts
+x = np.linspace(0, edges[-1], 512)
+ax.plot(x, quantal_pdf(x, fit) * len(amp) * (edges[1] - edges[0]), "k", label="fit")
+
 # labels
 ax.legend()
 plt.xlabel('EPSP amplitdue (mV)')
@@ -36,9 +36,12 @@ def preprocess(index, crop=(0.1, 0.15)):
             t (ndarray): Cropped timestamp.
             rec (ndarray): Raw recordings.
             rec_filt (ndarray): Filtered recordings.
+            frames (ndarray): Frame numbers, rejected frames are left out.
     """
     # load data
-    t, stim, rec = load_frame_group(path, index=index, stacked=False)
+    t, stim, rec, frames = load_frame_group(
+        path, index=index, stacked=False, return_index=True, qc=True
+    )
 
     t_ = None
     rec_tmp, rec_filt = [], []
@@ -56,14 +59,14 @@ def preprocess(index, crop=(0.1, 0.15)):
     # offset t
     t_ -= t_[0]
 
-    return t_, rec, rec_filt
+    return t_, rec, rec_filt, frames
 
 def extract_amplitude(index, r_min=.7):
-    t, rec, rec_filt = preprocess(index)
+    t, rec, rec_filt, frames = preprocess(index)
     
     data = []
     n_discard = 0
-    for i, rec_, rec_filt_ in zip(range(index[0], index[1]+1), rec, rec_filt):
+    for i, rec_, rec_filt_ in zip(frames, rec, rec_filt):
         # using filtered signal to extract slope
         ipk, _ = find_epsp_peak(t, rec_filt_)
         # slope
@@ -88,7 +91,7 @@ def compare_plot(indice, labels, name="untitled", **kwargs):
     ax.axhline(0, color="k", linestyle=":", linewidth=0.5)
 
     for index, label, c in zip(indice, labels, ["r", "b"]):
-        t, rec, rec_filt = preprocess(index, coarse_crop)
+        t, rec, rec_filt, _ = preprocess(index, coarse_crop)
 
         # visualize data
         ax.plot(t, rec, c, label=label, linewidth=1)
@@ -5,19 +5,27 @@ setup(
     version="0.0.1",
     description="Neurobiology lab processing utilities",
     author="Andy",
-    packages=find_packages(),
-    python_requires=">=3.6",
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    python_requires=">=3.8",
     install_requires=[
         "click",
         "coloredlogs",
+        "h5py",
         "matplotlib",
         "numpy",
         "pandas",
+        "scipy",
         "tables",
         "tqdm",
     ],
+    extras_require={
+        "numba": ["numba"],
+        "toml": ['tomli; python_version < "3.11"'],
+        "yaml": ["pyyaml"],
+    },
     entry_points={
         "console_scripts": [
+            "analyze=neubio.cli.analyze:main",
             "convert=neubio.cli.convert:main",
             "dataset=neubio.cli.dataset:main",
         ]
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_frames, write_hdf5, write_npy
+
+N_FRAMES = 40
+
+
+@pytest.fixture
+def frames():
+    return synthetic_frames(N_FRAMES, fs=10e3, seed=0)
+
+
+@pytest.fixture
+def npy_store(tmp_path, frames):
+    path = str(tmp_path / "trial")
+    write_npy(path, *frames)
+    return path
+
+
+@pytest.fixture
+def hdf5_file(tmp_path, frames):
+    path = str(tmp_path / "trial.h5")
+    write_hdf5(path, *frames)
+    return path
+
+
+def reject_table(frames, rejected):
+    """
+    QC table rejecting the given frame numbers.
+    """
+    import pandas as pd
+
+    frames = np.asarray(frames)
+    return pd.DataFrame({"frame": frames, "reject": np.isin(frames, rejected)})
@@ -0,0 +1,31 @@
+import numpy as np
+from scipy.stats import trim_mean
+
+from neubio.analyze.average import TraceAverager, average_frames
+
+
+def test_streamed_average_matches_numpy(npy_store, frames):
+    _, _, response = frames
+    x = response.astype(np.float64)
+    _, _, avg = average_frames(npy_store, block_size=7)
+
+    assert avg.n == len(x)
+    np.testing.assert_allclose(avg.mean, x.mean(axis=0), atol=1e-12)
+    np.testing.assert_allclose(avg.std, x.std(axis=0, ddof=1), atol=1e-12)
+
+    # histogram estimates, within a fraction of the spread of each sample, the
+    # median is interpolated between few frames per bin
+    std = x.std(axis=0)
+    assert np.all(np.abs(avg.median - np.median(x, axis=0)) <= 0.25 * std)
+    assert np.all(np.abs(avg.trimmed - trim_mean(x, 0.1, axis=0)) <= 0.02 * std)
+
+
+def test_blocks_match_single_update():
+    x = np.random.default_rng(0).standard_normal((300, 50))
+    a, b = TraceAverager(), TraceAverager()
+    a.update(x)
+    for block in np.array_split(x, 9):
+        b.update(block)
+    ra, rb = a.result(), b.result()
+    np.testing.assert_allclose(ra.mean, rb.mean)
+    np.testing.assert_allclose(ra.std, rb.std)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from benchmarks.synthetic import write_npy
+from neubio.cache import FrameCache, canonical_params, load_preprocessed
+from neubio.io import write_qc
+
+from conftest import N_FRAMES, reject_table
+
+
+def test_cached_load_matches_uncached(tmp_path, npy_store):
+    cache = FrameCache(str(tmp_path / "cache"))
+    uncached = load_preprocessed(npy_store, crop=(0.1, 0.15))
+    load_preprocessed(npy_store, crop=(0.1, 0.15), cache=cache)
+    cached = load_preprocessed(npy_store, crop=(0.1, 0.15), cache=cache)
+    assert len(cache.entries()) == 1
+    for a, b in zip(uncached, cached):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_qc_invalidates_entry(tmp_path, npy_store):
+    cache = FrameCache(str(tmp_path / "cache"))
+    frames = load_preprocessed(npy_store, qc=True, cache=cache)[-1]
+    assert len(frames) == N_FRAMES
+
+    write_qc(npy_store, reject_table(frames, [3, 5, 7]), {})
+    frames = load_preprocessed(npy_store, qc=True, cache=cache)[-1]
+    assert len(frames) == N_FRAMES - 3
+    assert not np.isin([3, 5, 7], frames).any()
+
+
+def test_rewrite_invalidates_entry(tmp_path, npy_store, frames):
+    cache = FrameCache(str(tmp_path / "cache"))
+    key = cache.key(npy_store, crop=None)
+    t, stimuli, response = frames
+    write_npy(npy_store, t, stimuli, response[:10])
+    assert cache.key(npy_store, crop=None) != key
+    assert len(load_preprocessed(npy_store, cache=cache)[-1]) == 10
+
+
+def test_hdf5_change_invalidates_entry(tmp_path, hdf5_file):
+    cache = FrameCache(str(tmp_path / "cache"))
+    key = cache.key(hdf5_file, crop=None)
+    write_qc(hdf5_file, reject_table(np.arange(1, N_FRAMES + 1), [2]), {})
+    assert cache.key(hdf5_file, crop=None) != key
+
+
+def test_canonical_params():
+    a = {"crop": (0.1, 0.15), "lo_cutoff": 1e3, "n": np.int64(3)}
+    b = {"crop": np.array([0.1, 0.15]), "lo_cutoff": 1000, "n": 3}
+    assert canonical_params(a) == canonical_params(b)
+    assert canonical_params({"crop": (0.1, 0.12)}) != canonical_params(
+        {"crop": (0.1, 0.15)}
+    )
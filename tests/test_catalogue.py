@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import write_hdf5, write_npy
+from neubio import catalogue as catalogue_module
+from neubio.catalogue import INDEX_NAME, Catalogue
+from neubio.io import load_label, write_label
+
+
+@pytest.fixture
+def tree(tmp_path, frames):
+    t, stimuli, response = frames
+    os.makedirs(str(tmp_path / "day_1"))
+    write_hdf5(str(tmp_path / "day_1" / "trial_1.h5"), t, stimuli, response[:20])
+    write_npy(str(tmp_path / "day_1" / "trial_2"), t, stimuli, response[20:], start=5)
+    write_label(str(tmp_path / "day_1" / "trial_1.h5"), (1, 10), "baseline")
+    write_label(str(tmp_path / "day_1" / "trial_2"), (5, 14), "baseline")
+    return str(tmp_path)
+
+
+def test_scan_save_load(tree, frames):
+    catalogue = Catalogue.scan(tree)
+    assert catalogue.files["file"].tolist() == ["day_1/trial_1.h5", "day_1/trial_2"]
+    assert catalogue.files["n_frames"].tolist() == [20, 20]
+    assert catalogue.files["first"].tolist() == [1, 5]
+    np.testing.assert_allclose(catalogue.files["fs"], 10e3, rtol=1e-3)
+    assert (catalogue.files["n_pulses"] == 1).all()
+
+    path = catalogue.save()
+    assert path == os.path.join(tree, INDEX_NAME)
+    loaded = Catalogue.load(path)
+    assert loaded.root == os.path.normpath(tree)
+    assert loaded.files.equals(catalogue.files)
+    assert loaded.labels.equals(catalogue.labels)
+
+    _, _, response = load_label(path, "baseline")
+    _, _, expected = frames
+    np.testing.assert_array_equal(response[:10], expected[:10])
+    np.testing.assert_array_equal(response[10:], expected[20:30])
+    with pytest.raises(ValueError):
+        loaded.ranges("LTP")
+
+
+def test_incremental_scan(tree, monkeypatch):
+    previous = Catalogue.scan(tree)
+
+    described = []
+    describe = catalogue_module._describe
+
+    def counting(fd, group):
+        described.append(fd)
+        return describe(fd, group)
+
+    monkeypatch.setattr(catalogue_module, "_describe", counting)
+    assert Catalogue.scan(tree, previous=previous).files.equals(previous.files)
+    assert described == []
+
+    write_label(os.path.join(tree, "day_1", "trial_2"), (15, 24), "LTP")
+    catalogue = Catalogue.scan(tree, previous=previous)
+    assert len(described) == 1
+    assert catalogue.ranges("LTP") == [
+        (os.path.join(tree, "day_1", "trial_2"), (15, 24))
+    ]
+    assert len(catalogue.ranges("baseline")) == 2
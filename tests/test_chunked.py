@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from neubio.analyze.chunked import analyze_chunked, frames_per_block, iter_preprocessed
+from neubio.cache import load_preprocessed
+from neubio.analyze.epsp import epsp_features
+from neubio.filter import preprocess
+from neubio.io import LiveFrameWriter
+
+# 8 frames of 2000 samples per block
+MAX_MEMORY = 8 * 64 * 2000
+
+
+@pytest.fixture
+def expected(frames):
+    t, _, response = frames
+    t, y, yf = preprocess(t, response, 10e3, crop=(0.1, 0.15))
+    return epsp_features(t, y, yf=yf)
+
+
+@pytest.mark.parametrize("layout", ["hdf5_file", "npy_store"])
+def test_chunked_matches_in_memory(request, expected, layout):
+    path = request.getfixturevalue(layout)
+    assert frames_per_block(2000, MAX_MEMORY) == 8
+
+    frames, features = analyze_chunked(path, max_memory=MAX_MEMORY)
+    np.testing.assert_array_equal(frames, np.arange(1, len(expected.peak) + 1))
+    for a, b in zip(features, expected):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize("artifact", ["interp", "template"])
+def test_artifact_matches_in_memory(npy_store, artifact):
+    kwargs = {"crop": (0.1, 0.15), "artifact": artifact}
+    t, _, rec, rec_filt, frames = load_preprocessed(npy_store, **kwargs)
+
+    blocks = list(iter_preprocessed(npy_store, max_memory=MAX_MEMORY, **kwargs))
+    assert len(blocks) > 1
+    np.testing.assert_array_equal(blocks[0][0], t)
+    for i, expected in ((2, rec), (3, rec_filt), (4, frames)):
+        np.testing.assert_array_equal(np.concatenate([b[i] for b in blocks]), expected)
+
+
+def test_chunked_output(tmp_path, npy_store, expected):
+    output = str(tmp_path / "result.csv")
+    result = analyze_chunked(npy_store, output=output, max_memory=MAX_MEMORY)
+    assert result == (None, None)
+    table = pd.read_csv(output)
+    np.testing.assert_allclose(table["slope"], expected.slope, rtol=1e-6)
+
+
+def test_empty_live_file(tmp_path):
+    path = str(tmp_path / "live.h5")
+    LiveFrameWriter(path).close()
+    with pytest.raises(ValueError, match="no frame in"):
+        analyze_chunked(path, max_memory=MAX_MEMORY)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from benchmarks.synthetic import write_signal3
+from neubio.cli.convert import main, parse_signal3, read_signal3, scan_for_frames
+from neubio.io import is_live_file, load_frame_group
+
+COL_DEF = {"time": "float32", "response": "float32", "stimuli": "float32"}
+
+
+@pytest.fixture
+def signal3(tmp_path, frames):
+    t, stimuli, response = frames
+    path = str(tmp_path / "trial.txt")
+    write_signal3(path, t, stimuli, response[:10])
+    return path
+
+
+def test_parser_matches_read_csv(signal3):
+    import pandas as pd
+
+    expected = [
+        (frame_no, pd.read_csv(data, names=list(COL_DEF), dtype=COL_DEF))
+        for frame_no, data in scan_for_frames(signal3)
+    ]
+    result = list(read_signal3(signal3, COL_DEF))
+    assert [frame_no for frame_no, _ in result] == list(range(1, 11))
+    assert len(result) == len(expected)
+    for (n0, df0), (n1, df1) in zip(expected, result):
+        assert n0 == n1
+        pd.testing.assert_frame_equal(df0, df1)
+
+
+def test_incomplete_rows(signal3):
+    with open(signal3, "a") as fd:
+        fd.write('"synthetic.cfs","Frame 11"\n"Time","Response","Stimuli"\n')
+        fd.write("0,0.1,0\n0.0001,0.2\n\n")
+    with pytest.raises(ValueError, match="frame 11 has malformed rows"):
+        list(parse_signal3(signal3))
+
+
+@pytest.mark.parametrize("row", ["0.0001,x,0", "0.0001,,0", "0.0001,0.2,0,0"])
+def test_malformed_rows(signal3, row):
+    with open(signal3, "a") as fd:
+        fd.write('"synthetic.cfs","Frame 11"\n"Time","Response","Stimuli"\n')
+        fd.write("0,0.1,0\n{}\n\n".format(row))
+    with pytest.raises(ValueError, match="frame 11 has malformed rows"):
+        list(parse_signal3(signal3))
+
+
+@pytest.mark.parametrize("fmt", ["hdf5", "matrix", "npy", "swmr"])
+def test_convert_formats(signal3, frames, fmt):
+    result = CliRunner().invoke(main, [signal3, "--format", fmt, "--batch-size", "3"])
+    assert result.exit_code == 0, result.output
+
+    dst = signal3[: -len(".txt")]
+    t, stimuli, response = load_frame_group(dst if fmt == "npy" else dst + ".h5")
+    np.testing.assert_allclose(t, frames[0], rtol=1e-5)
+    np.testing.assert_allclose(response, frames[2][:10], rtol=1e-5, atol=1e-6)
+
+
+def test_default_format_is_pandas(signal3):
+    import pandas as pd
+
+    result = CliRunner().invoke(main, [signal3])
+    assert result.exit_code == 0, result.output
+    path = signal3[: -len(".txt")] + ".h5"
+    assert not is_live_file(path)
+    df = pd.read_hdf(path, "/_frames/1")
+    assert list(df.columns) == ["time", "response", "stimuli"]
+
+
+@pytest.mark.parametrize(
+    "args", [["--profile"], ["--profile", "--profile-format", "json"]]
+)
+def test_profile_flag(signal3, args):
+    from neubio import instrument
+
+    try:
+        result = CliRunner().invoke(main, args + [signal3])
+    finally:
+        instrument.disable()
+        instrument.reset()
+    assert result.exit_code == 0, result.output
+    assert "write" in result.output
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from neubio.analyze.epsp import (
+    batch_epsp_peak,
+    batch_epsp_slope,
+    epsp_features,
+    epsp_slope,
+    find_epsp_peak,
+)
+from neubio.filter import preprocess
+from neubio.precision import precision
+
+
+@pytest.fixture
+def cropped(frames):
+    t, _, response = frames
+    return preprocess(t, response, 10e3, crop=(0.1, 0.15))
+
+
+@pytest.mark.parametrize("name", ["float64", "float32"])
+def test_single_recording_matches_batch(cropped, name):
+    t, y, yf = cropped
+    with precision(name):
+        batch = epsp_features(t, y, yf=yf)
+        for i in (0, 7, 39):
+            single = epsp_features(t, y[i], yf=yf[i])
+            for a, b in zip(single, batch):
+                np.testing.assert_array_equal(a, b[i])
+
+
+def test_batch_matches_per_frame(cropped):
+    t, y, yf = cropped
+    ipk, found = batch_epsp_peak(t, yf)
+    slope, r, _, valid = batch_epsp_slope(t, y, ipk)
+    assert found.all() and valid.all()
+    for i in range(len(y)):
+        ip, _ = find_epsp_peak(t, yf[i])
+        assert ipk[i] == ip
+        expected = epsp_slope(t, y[i], ip)
+        np.testing.assert_allclose([slope[i], r[i]], expected, rtol=1e-6)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from neubio.analyze import events
+from neubio.analyze.events import detect_events, event_template
+
+FS = 10e3
+
+
+def event_trains(noise, n_rows=8, duration=2.0, amplitude=0.05, seed=0):
+    """
+    Template events every 50 ms over white noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * FS)) / FS
+    template = event_template(FS)
+    y = noise * rng.standard_normal((n_rows, len(t)))
+    onsets = (np.arange(0.05, duration - 0.03, 0.05) * FS).astype(int)
+    for i in onsets:
+        y[:, i : i + len(template)] += amplitude * template
+    return t, y, template, onsets
+
+
+def test_blocks_match_single_pass(monkeypatch):
+    t, y, template, _ = event_trains(0.005, n_rows=2, duration=5.0)
+    expected = detect_events(t, y, template)
+    # blocks as short as the template, runs over the threshold are split
+    monkeypatch.setattr(events, "_BLOCK_SAMPLES", 1)
+    result = detect_events(t, y, template)
+    for a, b in zip(expected, result):
+        np.testing.assert_allclose(a, b)
+
+
+@pytest.mark.parametrize("noise", [0.001, 0.005, 0.01])
+def test_kinetics_robust_to_noise(noise):
+    t, y, template, onsets = event_trains(noise)
+    found = detect_events(t, y, template)
+    assert np.isin(onsets, found.index).mean() > 0.95
+    # true rise 0.6 ms, 1/e decay 3.6 ms
+    assert np.median(found.rise) == pytest.approx(0.6e-3, abs=0.15e-3)
+    assert np.median(found.decay) == pytest.approx(3.6e-3, rel=0.1)
+
+
+@pytest.mark.parametrize(
+    "index, criterion, expected",
+    [
+        # just under the distance, the weakest is only near the suppressed one
+        ([0, 9, 18], [3.0, 2.0, 1.0], [True, False, True]),
+        ([0, 9, 18], [1.0, 3.0, 2.0], [False, True, False]),
+        # just over the distance
+        ([0, 10, 20], [3.0, 2.0, 1.0], [True, True, True]),
+        # ties keep the first
+        ([0, 9, 18], [1.0, 1.0, 1.0], [True, False, True]),
+    ],
+)
+def test_suppress(index, criterion, expected):
+    index, criterion = np.array(index), np.array(criterion)
+    keep = events._suppress(np.zeros(3, dtype=int), index, criterion, 10)
+    np.testing.assert_array_equal(keep, expected)
+    # rows do not interact
+    keep = events._suppress(np.arange(3), index, criterion, 10)
+    assert keep.all()
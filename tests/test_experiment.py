@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from conftest import N_FRAMES
+from neubio import instrument
+from neubio.cli.analyze import main
+
+SPEC = """
+[filter]
+fs = 10e3
+
+[analysis]
+features = ["amplitude", "slope"]
+
+[[files]]
+path = "{path}"
+ranges = {{ "first" = [1, 20], "second" = [{start}, {end}] }}
+"""
+
+
+def write_spec(tmp_path, path, start=21, end=N_FRAMES):
+    spec = str(tmp_path / "spec.toml")
+    with open(spec, "w") as fd:
+        fd.write(SPEC.format(path=os.path.basename(path), start=start, end=end))
+    return spec
+
+
+@pytest.fixture
+def run(tmp_path):
+    def invoke(spec, *args):
+        output = str(tmp_path / "result_{}.csv".format(len(os.listdir(tmp_path))))
+        try:
+            result = CliRunner().invoke(main, [spec, "-o", output] + list(args))
+        finally:
+            instrument.disable()
+            instrument.reset()
+        assert result.exit_code == 0, result.output
+        return pd.read_csv(output)
+
+    return invoke
+
+
+def test_analyze_modes(tmp_path, npy_store, run):
+    spec = write_spec(tmp_path, npy_store)
+    results = run(spec)
+    assert results["frame"].tolist() == list(range(1, N_FRAMES + 1))
+    assert (results["label"] == "first").sum() == 20
+    assert results["valid"].all()
+
+    cache = str(tmp_path / "cache")
+    for args in (["--max-memory", "1"], ["--cache", cache], ["--cache", cache]):
+        other = run(spec, *args)
+        np.testing.assert_allclose(other["slope"], results["slope"], rtol=1e-6)
+    assert os.listdir(cache)
+
+    other = run(spec, "--profile", "--profile-format", "json")
+    pd.testing.assert_frame_equal(other, results)
+
+
+@pytest.mark.parametrize("layout", ["hdf5_file", "npy_store"])
+def test_no_frame_selected(request, tmp_path, layout):
+    path = request.getfixturevalue(layout)
+    spec = write_spec(tmp_path, path, start=N_FRAMES + 1, end=N_FRAMES + 10)
+    result = CliRunner().invoke(main, [spec])
+    assert result.exit_code == 1
+    assert "no frame" in result.output
+
+
+def test_missing_file(tmp_path):
+    spec = write_spec(tmp_path, str(tmp_path / "missing.h5"))
+    result = CliRunner().invoke(main, [spec])
+    assert result.exit_code == 1
+    assert '"missing.h5" does not exist' in result.output
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_frames
+from neubio.filter import (
+    ARTIFACT_METHODS,
+    _artifact_windows,
+    estimate_artifact_template,
+    remove_artifact,
+)
+
+NOISE = 0.02
+# covers the 0.5 ms artifact, ends before the EPSP onset
+WIDTH = 0.001
+
+
+@pytest.fixture
+def recordings():
+    kwargs = {"fs": 10e3, "noise": NOISE, "line_noise": 0, "seed": 0}
+    t, _, clean = synthetic_frames(20, artifact=0, **kwargs)
+    _, _, raw = synthetic_frames(20, artifact=0.4, **kwargs)
+    return t, clean, raw
+
+
+def artifact_window(t):
+    (start,), n = _artifact_windows(t, [0.1], WIDTH, 0.0002)
+    return start, n
+
+
+@pytest.mark.parametrize("method", ARTIFACT_METHODS)
+def test_remove_artifact(recordings, method):
+    t, clean, raw = recordings
+    start, n = artifact_window(t)
+    window = np.zeros(len(t), dtype=bool)
+    window[start : start + n] = True
+    assert np.abs(raw - clean)[:, window].max() > 0.3
+
+    y = remove_artifact(t, raw, [0.1], width=WIDTH, method=method)
+    residual = (y - clean)[:, window]
+    assert np.sqrt(np.mean(residual**2)) < 2 * NOISE
+    assert np.abs(residual).max() < 5 * NOISE
+    np.testing.assert_array_equal(y[:, ~window], raw[:, ~window])
+
+
+def test_template(recordings):
+    t, clean, raw = recordings
+    template = estimate_artifact_template(t, raw, [0.1], width=WIDTH)
+    start, n = artifact_window(t)
+    assert template.shape == (n,)
+    # relative to the sample before the window
+    artifact = (raw - clean)[0, start : start + n]
+    np.testing.assert_allclose(template, artifact, atol=2 * NOISE)
+
+    with pytest.raises(ValueError):
+        remove_artifact(t, raw, [0.1], method="template", template=template[1:])
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+import pytest
+
+from neubio import instrument
+
+
+@pytest.fixture
+def enabled():
+    instrument.reset()
+    instrument.enable()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def test_concurrent_stages(enabled):
+    # both threads are inside the stage at once
+    barrier = threading.Barrier(2)
+
+    def run():
+        with instrument.stage("load"):
+            barrier.wait(timeout=10)
+            with instrument.stage("load"):
+                pass
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert instrument.report()["load"]["calls"] == 2
+
+
+def test_cpu_of_stage_thread(enabled):
+    # another thread is busy while the stage waits
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    thread = threading.Thread(target=spin)
+    thread.start()
+    try:
+        with instrument.stage("wait"):
+            stop.wait(0.2)
+    finally:
+        stop.set()
+        thread.join()
+    report = instrument.report()["wait"]
+    assert report["wall"] >= 0.2
+    assert report["cpu"] < 0.05
+
+
+@pytest.mark.skipif(instrument.resource is None, reason="no resource module")
+def test_rss_growth(enabled):
+    with instrument.stage("small"):
+        pass
+    # raise the process peak whatever earlier tests allocated
+    n = instrument._peak_rss() + (16 << 20)
+    with instrument.stage("alloc"):
+        x = np.ones(n, dtype=np.uint8)
+        del x
+    report = instrument.report()
+    assert report["alloc"]["rss_growth"] >= 16 << 20
+    assert report["small"]["rss_growth"] < 16 << 20
+    assert report["alloc"]["peak_rss"] >= report["small"]["peak_rss"]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from neubio.analyze import kernels
+from neubio.analyze.epsp import _estimate_ts, epsp_features
+from neubio.filter import preprocess
+
+
+@pytest.fixture
+def cropped(frames):
+    t, _, response = frames
+    return preprocess(t, response, 10e3, crop=(0.1, 0.15))
+
+
+@pytest.fixture
+def backend():
+    yield kernels.set_backend
+    kernels.set_backend("numpy")
+
+
+def assert_features_close(result, expected):
+    ipk, amp, slope, r, valid = result
+    np.testing.assert_array_equal(ipk, expected.peak)
+    np.testing.assert_array_equal(valid, expected.valid)
+    np.testing.assert_allclose(amp, expected.amplitude, rtol=1e-6)
+    np.testing.assert_allclose(slope, expected.slope, rtol=1e-5)
+    np.testing.assert_allclose(r, expected.r, rtol=1e-5)
+
+
+def test_default_backend(monkeypatch, backend):
+    monkeypatch.delenv(kernels.ENV_VAR, raising=False)
+    monkeypatch.setattr(kernels, "_backend", None)
+    assert kernels.get_backend() == "numpy"
+
+
+def test_frame_features_match_numpy(cropped):
+    t, y, yf = cropped
+    expected = epsp_features(t, y, yf=yf)
+    delay = int(0.005 / _estimate_ts(t))
+    result = [kernels._frame_features(t, y[i], yf[i], delay, 0.2) for i in range(len(y))]
+    assert_features_close([np.array(a) for a in zip(*result)], expected)
+
+
+def test_numba_matches_numpy(cropped, backend):
+    pytest.importorskip("numba")
+    t, y, yf = cropped
+    expected = epsp_features(t, y, yf=yf)
+    backend("numba")
+    assert_features_close(epsp_features(t, y, yf=yf), expected)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import write_hdf5, write_npy
+from neubio.catalogue import Catalogue
+from neubio.io import (
+    LiveFrameWriter,
+    LiveReader,
+    is_live_file,
+    load_frame_group,
+    load_label,
+    write_label,
+)
+
+
+def write_live(path, t, stimuli, response, start=1, **kwargs):
+    with LiveFrameWriter(path, **kwargs) as fd:
+        for i, frame in enumerate(response):
+            fd.write(start + i, t, stimuli, frame)
+
+
+def test_reader_follows_writer(tmp_path, frames):
+    t, stimuli, response = frames
+    path = str(tmp_path / "live.h5")
+
+    writer = LiveFrameWriter(path, flush_every=5)
+    for i in range(12):
+        writer.write(i + 1, t, stimuli, response[i])
+    reader = LiveReader(path)
+    try:
+        # only flushed frames are visible
+        polled, rec = reader.poll()
+        np.testing.assert_array_equal(polled, np.arange(1, 11))
+        np.testing.assert_array_equal(rec, response[:10])
+
+        writer.write_batch(np.arange(13, 21), t, stimuli[np.newaxis], response[12:20])
+        polled, rec = reader.poll()
+        np.testing.assert_array_equal(polled, np.arange(11, 21))
+        np.testing.assert_array_equal(rec[:2], response[10:12])
+        assert len(reader.poll()[0]) == 0
+    finally:
+        reader.close()
+        writer.close()
+    assert is_live_file(path)
+
+
+def test_append_and_load(tmp_path, frames):
+    t, stimuli, response = frames
+    path = str(tmp_path / "live.h5")
+    write_live(path, t, stimuli, response[:20])
+    write_live(path, t, stimuli, response[20:], start=21, mode="a")
+
+    _, _, rec, index = load_frame_group(path, index=(5, 30), return_index=True)
+    np.testing.assert_array_equal(index, np.arange(5, 31))
+    np.testing.assert_array_equal(rec, response[4:30])
+
+
+def test_append_refuses_other_layouts(hdf5_file):
+    with open(hdf5_file, "rb") as fd:
+        before = fd.read()
+    with pytest.raises(ValueError):
+        LiveFrameWriter(hdf5_file, mode="a")
+    with open(hdf5_file, "rb") as fd:
+        assert fd.read() == before
+
+
+def test_out_of_order_frame(tmp_path, frames):
+    t, stimuli, response = frames
+    with LiveFrameWriter(str(tmp_path / "live.h5")) as fd:
+        fd.write(2, t, stimuli, response[0])
+        with pytest.raises(ValueError):
+            fd.write(2, t, stimuli, response[1])
+
+
+def test_catalogue_all_layouts(tmp_path, frames, monkeypatch):
+    t, stimuli, response = frames
+    root = tmp_path / "data"
+    (root / "day1").mkdir(parents=True)
+    paths = {
+        "day1/a.h5": write_hdf5,
+        "day1/b": write_npy,
+        "c.h5": write_live,
+    }
+    for name, write in paths.items():
+        path = str(root / name)
+        write(path, t, stimuli, response)
+        write_label(path, (3, 7), "baseline")
+
+    catalogue = Catalogue.scan(str(root))
+    assert sorted(catalogue.files["file"]) == sorted(paths)
+    assert (catalogue.files["n_frames"] == len(response)).all()
+    assert (catalogue.files["n_pulses"] == 1).all()
+    assert len(catalogue.labels) == len(paths)
+
+    _, _, rec, _, index = load_label(catalogue, "baseline", return_index=True)
+    np.testing.assert_array_equal(index, np.tile(np.arange(3, 8), len(paths)))
+    np.testing.assert_allclose(rec, np.tile(response[2:7], (len(paths), 1)))
+
+    # directory stores are not rescanned unless one of their files changes
+    monkeypatch.setattr("neubio.catalogue._describe", None)
+    rescan = Catalogue.scan(str(root), previous=catalogue)
+    assert len(rescan) == len(paths) and len(rescan.labels) == len(paths)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import N_FRAMES, reject_table
+from neubio.io import FrameIndex, annotate, read_meta, select, write_meta, write_qc
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(0)
+    n = 500
+    calcium = rng.choice([1.0, 2.0, 4.0, np.nan], n)
+    return pd.DataFrame(
+        {
+            "frame": rng.permutation(n) + 1,
+            "condition": rng.choice(["Control", "LTP", ""], n),
+            "calcium": calcium,
+            "t": rng.uniform(0, 600, n),
+        }
+    )
+
+
+def expected_frames(table, mask):
+    return np.sort(table.loc[mask, "frame"].values)
+
+
+def test_query_matches_masks(table):
+    index = FrameIndex(table)
+    np.testing.assert_array_equal(
+        index.query(condition="LTP"),
+        expected_frames(table, table["condition"] == "LTP"),
+    )
+    np.testing.assert_array_equal(
+        index.query(condition=["Control", "LTP"], calcium=2.0),
+        expected_frames(
+            table, table["condition"].isin(["Control", "LTP"]) & (table["calcium"] == 2)
+        ),
+    )
+    np.testing.assert_array_equal(
+        index.query(t_min=60, t_max=120.5, condition="Control"),
+        expected_frames(
+            table,
+            (table["t"] >= 60)
+            & (table["t"] <= 120.5)
+            & (table["condition"] == "Control"),
+        ),
+    )
+    # missing values are never in range
+    np.testing.assert_array_equal(
+        index.query(calcium_min=2.0),
+        expected_frames(table, table["calcium"] >= 2),
+    )
+    np.testing.assert_array_equal(index.query(), np.sort(table["frame"].values))
+    with pytest.raises(ValueError):
+        index.query(temperature=32)
+
+
+@pytest.mark.parametrize("layout", ["hdf5_file", "npy_store"])
+def test_select(request, frames, layout):
+    path = request.getfixturevalue(layout)
+    _, _, response = frames
+    annotate(path, index=(1, 20), condition="Control", interval=10.0)
+    annotate(path, index=(21, -1), condition="LTP", calcium=4.0)
+    meta = read_meta(path)
+    assert meta["frame"].tolist() == list(range(1, N_FRAMES + 1))
+    assert meta["t"].iloc[19] == 190.0 and np.isnan(meta["t"].iloc[20])
+
+    _, _, rec, index = select(path, condition="Control", t_min=50, return_index=True)
+    np.testing.assert_array_equal(index, np.arange(6, 21))
+    np.testing.assert_array_equal(rec, response[5:20])
+
+    write_qc(path, reject_table(np.arange(1, N_FRAMES + 1), [22, 30]), {})
+    _, _, rec, index = select(path, calcium=4.0, qc=True, return_index=True)
+    np.testing.assert_array_equal(
+        index, np.setdiff1d(np.arange(21, N_FRAMES + 1), [22, 30])
+    )
+    with pytest.raises(ValueError):
+        select(path, condition="LTD")
+
+
+@pytest.mark.parametrize("layout", ["hdf5_file", "npy_store"])
+def test_select_missing_frames(request, layout):
+    path = request.getfixturevalue(layout)
+    # annotated frames the file does not hold
+    frames = np.arange(N_FRAMES + 1, N_FRAMES + 6)
+    write_meta(path, pd.DataFrame({"frame": frames, "condition": "LTD"}))
+    with pytest.raises(ValueError, match="no frame matches"):
+        select(path, condition="LTD")
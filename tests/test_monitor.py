@@ -0,0 +1,37 @@
+import numpy as np
+
+from neubio.analyze.monitor import PlasticityMonitor, RunningStats, WindowStats
+
+
+def test_running_stats_match_numpy():
+    x = np.random.default_rng(0).normal(5.0, 2.0, (1000, 2))
+    stats = RunningStats(shape=(2,))
+    for x_ in x[:10]:
+        stats.add(x_)
+    for block in np.array_split(x[10:], 7):
+        stats.add_batch(block)
+    assert stats.n == len(x)
+    np.testing.assert_allclose(stats.mean, x.mean(axis=0))
+    np.testing.assert_allclose(stats.var, x.var(axis=0, ddof=1))
+
+
+def test_window_stats_match_numpy():
+    x = np.random.default_rng(1).normal(5.0, 2.0, 200)
+    stats = WindowStats(30)
+    stats.add_batch(x)
+    np.testing.assert_allclose(stats.mean, x[-30:].mean())
+    np.testing.assert_allclose(stats.var, x[-30:].var(ddof=1))
+
+
+def test_recent_window_in_output(frames):
+    t, _, response = frames
+    monitor = PlasticityMonitor(t, fs=10e3, n_baseline=10, window=5)
+    records = [monitor.update(y, frame=i) for i, y in enumerate(response)]
+
+    accepted = np.array([[r.amplitude, r.slope] for r in records if r.valid])
+    assert len(accepted) > 10
+    expected = 100 * accepted[-5:].mean(axis=0) / accepted[:10].mean(axis=0)
+    last = records[-1]
+    np.testing.assert_allclose(
+        [last.recent_amplitude_pct, last.recent_slope_pct], expected
+    )
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from benchmarks.synthetic import write_npy
+from conftest import N_FRAMES, reject_table
+from neubio.io import (
+    MANIFEST_NAME,
+    NpyFrameWriter,
+    NpyStore,
+    annotate,
+    read_labels,
+    read_meta,
+    read_qc,
+    write_label,
+    write_qc,
+)
+
+
+def test_rewrite_drops_side_tables(npy_store, frames):
+    write_qc(npy_store, reject_table(np.arange(1, N_FRAMES + 1), [3]), {})
+    annotate(npy_store, drug="APV")
+    write_label(npy_store, (1, 10), "baseline")
+
+    write_npy(npy_store, *frames)
+    assert read_qc(npy_store)[0] is None
+    assert read_meta(npy_store) is None
+    assert read_labels(npy_store).empty
+
+
+def test_append_keeps_store_readable(npy_store, frames):
+    t, stimuli, response = frames
+    with NpyFrameWriter(npy_store, mode="a") as fd:
+        fd.write(N_FRAMES + 1, t, stimuli, response[0])
+        # frames appended so far are listed on close
+        with NpyStore(npy_store) as store:
+            assert len(store.frames) == N_FRAMES
+            np.testing.assert_array_equal(store.response, response)
+
+    assert os.listdir(npy_store).count(MANIFEST_NAME + ".tmp") == 0
+    with NpyStore(npy_store) as store:
+        assert store.frames[-1] == N_FRAMES + 1
+        np.testing.assert_array_equal(store.response[-1], response[0])
@@ -0,0 +1,38 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from neubio.analyze import kernels
+from neubio.analyze.epsp import epsp_features
+from neubio.analyze.parallel import _pool, analyze_frames
+from neubio.filter import preprocess
+
+
+def test_parallel_matches_serial(frames):
+    t, _, response = frames
+    t_, y, yf = preprocess(t, response, 10e3, crop=(0.1, 0.15))
+    expected = epsp_features(t_, y, yf=yf)
+
+    result = analyze_frames(t, response, 10e3, n_workers=2, chunk_size=7)
+    for a, b in zip(result, expected):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_no_frame(frames):
+    t, _, response = frames
+    with pytest.raises(ValueError, match="no frame to analyze"):
+        analyze_frames(t, response[:0], 10e3, n_workers=2)
+
+
+def test_worker_backend():
+    pytest.importorskip("numba")
+    shm = shared_memory.SharedMemory(create=True, size=8)
+    try:
+        kernels.set_backend("numba")
+        with _pool(1, shm, (1,), np.float64) as executor:
+            assert executor.submit(kernels.get_backend).result() == "numba"
+    finally:
+        kernels.set_backend("numpy")
+        shm.close()
+        shm.unlink()
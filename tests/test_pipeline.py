@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from neubio.pipeline import Pipeline, epsp_pipeline
+
+
+@pytest.fixture
+def pipe():
+    pipe = Pipeline()
+    pipe.add("a", lambda x: x, x=1)
+    pipe.add("b", lambda a, y: a + y, deps=("a",), y=10)
+    pipe.add("c", lambda a, z: a * z, deps=("a",), z=2)
+    pipe.add("d", lambda b, c: (b, c), deps=("b", "c"))
+    return pipe
+
+
+def test_set_invalidates_downstream(pipe):
+    assert pipe["d"] == (11, 2)
+    assert pipe.set(y=20) == ["b", "d"]
+    assert pipe.is_cached("a") and pipe.is_cached("c")
+    assert pipe["d"] == (21, 2)
+    assert pipe.runs == {"a": 1, "b": 2, "c": 1, "d": 2}
+
+    # unchanged values keep every result
+    assert pipe.set(y=20, z=2) == []
+    assert pipe.set(x=2) == ["a", "b", "c", "d"]
+    assert pipe["d"] == (22, 4)
+
+
+def test_invalid_graph(pipe):
+    with pytest.raises(ValueError):
+        pipe.add("e", lambda f: f, deps=("f",))
+    with pytest.raises(ValueError):
+        pipe.add("a", lambda: None)
+    with pytest.raises(ValueError):
+        pipe.set(w=1)
+
+
+def test_epsp_retune_reuses_filtering(hdf5_file):
+    pipe = epsp_pipeline(hdf5_file, r_min=0.7)
+    summary = pipe["summary"]
+    pipe.set(r_min=0.95)
+    retuned = pipe["summary"]
+    assert pipe.runs["filter"] == 1 and pipe.runs["summary"] == 2
+    np.testing.assert_array_equal(retuned["slope"], summary["slope"])
+    assert retuned["accepted"].sum() <= summary["accepted"].sum()
+
+    pipe.set(crop=(0.1, 0.12))
+    pipe["summary"]
+    assert pipe.runs["filter"] == 1 and pipe.runs["crop"] == 2
+    assert pipe.runs["peak"] == 2
@@ -0,0 +1,35 @@
+import numpy as np
+
+from neubio.analyze import epsp_features
+from neubio.filter import ac_notch, butter_lpf, preprocess
+from neubio.precision import precision
+
+# documented error of the filtered recordings, 1 float32 ulp of the signal range
+FILTER_RTOL = np.finfo(np.float32).eps
+
+
+def run(name, t, response):
+    with precision(name):
+        filtered = ac_notch(butter_lpf(response, 1e3, 10e3), 10e3)
+        t_, y, yf = preprocess(t, response, 10e3, crop=(0.1, 0.15))
+        return filtered, y, yf, epsp_features(t_, y, yf=yf)
+
+
+def test_filter_error(frames):
+    t, _, response = frames
+    double, _, double_yf, _ = run("float64", t, response)
+    single, _, single_yf, _ = run("float32", t, response)
+    assert single.dtype == single_yf.dtype == np.float32
+    assert double.dtype == double_yf.dtype == np.float64
+
+    for a, b in ((double, single), (double_yf, single_yf)):
+        assert np.abs(a - b).max() <= FILTER_RTOL * np.ptp(a)
+
+
+def test_features_identical(frames):
+    t, _, response = frames
+    _, double_y, _, double_f = run("float64", t, response)
+    _, single_y, _, single_f = run("float32", t, response)
+    np.testing.assert_array_equal(single_y, double_y)
+    for a, b in zip(single_f, double_f):
+        np.testing.assert_array_equal(a, b)
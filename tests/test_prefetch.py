@@ -0,0 +1,62 @@
+import itertools
+import time
+
+import pytest
+
+from neubio.io import Prefetcher
+
+
+def counting(produced, closed):
+    try:
+        for i in itertools.count():
+            produced.append(i)
+            yield i
+    finally:
+        closed.append(True)
+
+
+def test_order():
+    with Prefetcher(range(100), depth=3) as items:
+        assert list(items) == list(range(100))
+
+
+def test_reader_error():
+    def reader():
+        yield 0
+        yield 1
+        raise RuntimeError("read failed")
+
+    items = Prefetcher(reader(), depth=2)
+    assert next(items) == 0
+    assert next(items) == 1
+    with pytest.raises(RuntimeError, match="read failed"):
+        next(items)
+    # the thread is stopped with the error
+    with pytest.raises(StopIteration):
+        next(items)
+
+
+def test_early_exit():
+    produced, closed = [], []
+    with Prefetcher(counting(produced, closed), depth=2) as items:
+        assert next(items) == 0
+        thread = items._thread
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert closed == [True]
+
+
+def test_bounded_read_ahead():
+    produced, closed = [], []
+    depth = 3
+    items = Prefetcher(counting(produced, closed), depth=depth)
+    try:
+        for consumed in range(5):
+            # let the producer fill the buffer
+            time.sleep(0.2)
+            assert items._queue.qsize() <= depth
+            # items waiting in the buffer and the one blocked on it
+            assert len(produced) - consumed <= depth + 1
+            assert next(items) == consumed
+    finally:
+        items.close()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_hdf5, write_npy
+from conftest import N_FRAMES
+from neubio.io import LiveFrameWriter, load_frame_group, read_qc, rejected_frames
+from neubio.qc import screen
+
+BAD_FRAMES = [5, 17]
+
+
+def write_live(path, t, stimuli, response):
+    with LiveFrameWriter(path) as fd:
+        fd.write_batch(np.arange(1, len(response) + 1), t, stimuli, response)
+
+
+@pytest.fixture(params=["hdf5", "npy", "swmr"])
+def noisy_file(request, tmp_path, frames):
+    t, stimuli, response = frames
+    response = response.copy()
+    # frame numbers start at 1
+    response[BAD_FRAMES[0] - 1] += 0.5 * np.random.default_rng(1).standard_normal(
+        len(t)
+    )
+    response[BAD_FRAMES[1] - 1] += 2.0 * t
+    write = {"hdf5": write_hdf5, "npy": write_npy, "swmr": write_live}[request.param]
+    path = str(tmp_path / ("trial" if request.param == "npy" else "trial.h5"))
+    write(path, t, stimuli, response)
+    return path
+
+
+def test_screen_round_trip(noisy_file):
+    table = screen(noisy_file, thresholds={"saturation": 0.05})
+    assert table.loc[table["reject"], "frame"].tolist() == BAD_FRAMES
+
+    stored, thresholds = read_qc(noisy_file)
+    pd.testing.assert_frame_equal(stored, table, check_dtype=False)
+    assert thresholds["saturation"] == 0.05
+    np.testing.assert_array_equal(rejected_frames(noisy_file), BAD_FRAMES)
+
+    _, _, rec, frames = load_frame_group(noisy_file, qc=True, return_index=True)
+    assert len(rec) == len(table) - len(BAD_FRAMES)
+    assert not np.isin(frames, BAD_FRAMES).any()
+
+
+def test_screen_range_keeps_other_frames(noisy_file):
+    screen(noisy_file)
+    screen(noisy_file, index=(11, N_FRAMES))
+    stored, _ = read_qc(noisy_file)
+    assert stored["frame"].tolist() == list(range(1, N_FRAMES + 1))
+    assert stored.loc[stored["reject"], "frame"].tolist() == BAD_FRAMES
+
+
+def test_dry_run(noisy_file):
+    screen(noisy_file, write=False)
+    assert read_qc(noisy_file)[0] is None
+    _, _, rec = load_frame_group(noisy_file, qc=True)
+    assert len(rec) == N_FRAMES
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from neubio.analyze.quantal import fit_quantal, quantal_pdf
+
+
+def test_binomial_recovery():
+    rng = np.random.default_rng(0)
+    amp = 0.1 * rng.binomial(4, 0.4, 2000) + rng.normal(0, 0.01, 2000)
+    best, fits = fit_quantal(amp, seed=0)
+    assert [fit.n_sites for fit in fits] == list(range(1, 9))
+    assert best.n_sites == 4
+    assert best.quantal_size == pytest.approx(0.1, rel=0.01)
+    assert best.release_prob == pytest.approx(0.4, rel=0.01)
+    assert best.sigma == pytest.approx(0.01, rel=0.1)
+
+    x = np.linspace(-0.1, 0.6, 7001)
+    assert quantal_pdf(x, best).sum() * (x[1] - x[0]) == pytest.approx(1, rel=1e-3)
+
+
+def test_failures_keep_their_sign():
+    # mostly failures, recorded with negative polarity
+    rng = np.random.default_rng(0)
+    amp = -(0.1 * rng.binomial(3, 0.15, 4000) + rng.normal(0, 0.03, 4000))
+    best, _ = fit_quantal(amp, seed=0)
+    assert best.n_sites == 3
+    assert best.quantal_size == pytest.approx(0.1, rel=0.02)
+    assert best.release_prob == pytest.approx(0.15, rel=0.05)
+    assert best.weights[0] == pytest.approx(0.85**3, abs=0.02)
+    assert best.sigma == pytest.approx(0.03, rel=0.05)
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+import pytest
+
+from neubio.stats import bootstrap_ci, permutation_test
+
+
+def test_permutation_subsets_uniform():
+    # 2 of 4 samples in the first condition, 6 equally likely sums
+    x, y = np.array([1.0, 2.0]), np.array([4.0, 8.0])
+    seen = []
+
+    def statistic(x, y, axis=-1):
+        seen.append(np.sum(x, axis=axis))
+        return np.mean(y, axis=axis) - np.mean(x, axis=axis)
+
+    permutation_test(x, y, statistic=statistic, n_resamples=60000, seed=0)
+    sums, counts = np.unique(np.concatenate(seen[1:]), return_counts=True)
+    np.testing.assert_array_equal(sums, [3, 5, 6, 9, 10, 12])
+    np.testing.assert_allclose(counts / counts.sum(), 1 / 6, rtol=0.05)
+
+
+def test_permutation_pvalue():
+    rng = np.random.default_rng(0)
+    x, y = rng.standard_normal(200), rng.standard_normal(300) + 1.0
+    observed, pvalue = permutation_test(x, y, n_resamples=2000, seed=1)
+    assert observed == pytest.approx(y.mean() - x.mean())
+    assert pvalue == pytest.approx(1 / 2001)
+
+    _, pvalue = permutation_test(x, y, alternative="less", n_resamples=2000, seed=1)
+    assert pvalue == 1.0
+
+
+def test_permutation_mean_diff_matches_statistic():
+    # the default statistic takes the fast path, both are valid permutation tests
+    rng = np.random.default_rng(2)
+    x, y = rng.standard_normal(30), rng.standard_normal(70) + 0.3
+
+    def statistic(x, y, axis=-1):
+        return np.mean(y, axis=axis) - np.mean(x, axis=axis)
+
+    for a, b in ((x, y), (y, x)):
+        observed, pvalue = permutation_test(a, b, n_resamples=20000, seed=0)
+        expected, reference = permutation_test(
+            a, b, statistic=statistic, n_resamples=20000, seed=0
+        )
+        assert observed == pytest.approx(expected)
+        assert pvalue == pytest.approx(reference, abs=0.01)
+
+
+def test_permutation_speed():
+    rng = np.random.default_rng(0)
+    x, y = rng.standard_normal(5000), rng.standard_normal(5000)
+    t0 = time.perf_counter()
+    permutation_test(x, y, seed=0)
+    assert time.perf_counter() - t0 < 1.0
+
+
+def test_list_is_single_sample():
+    estimate, low, high = bootstrap_ci([1.0, 2.0, 3.0, 4.0], seed=0)
+    assert estimate == pytest.approx(2.5)
+    assert 1.0 <= low <= estimate <= high <= 4.0
+
+    observed, _ = permutation_test([1.0, 2.0, 3.0], [4.0, 5.0, 6.0], seed=0)
+    assert observed == pytest.approx(3.0)
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda: bootstrap_ci([]),
+        lambda: bootstrap_ci([np.nan, np.inf]),
+        lambda: permutation_test([], [1.0, 2.0]),
+        lambda: permutation_test([1.0, 2.0], []),
+    ],
+)
+def test_empty_samples(call):
+    with pytest.raises(ValueError, match="no valid samples"):
+        call()
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_frames
+from neubio.analyze import PulseTrain, detect_onsets, pulse_train, split_pulses
+
+ONSETS = (0.1, 0.15)
+
+
+@pytest.fixture
+def paired():
+    # noise-free amplitudes, the paired-pulse ratio is the facilitation
+    return synthetic_frames(
+        8,
+        fs=10e3,
+        duration=0.25,
+        onsets=ONSETS,
+        amplitude_cv=0,
+        facilitation=1.2,
+        noise=0.002,
+        artifact=0,
+        line_noise=0,
+        seed=0,
+    )
+
+
+def test_detect_onsets(paired):
+    t, stimuli, _ = paired
+    np.testing.assert_allclose(detect_onsets(t, stimuli), ONSETS, atol=1e-4)
+
+
+def test_detect_onsets_n_pulses():
+    t, stimuli, _ = synthetic_frames(1, onsets=(0.05, 0.1, 0.15), seed=0)
+    np.testing.assert_allclose(
+        detect_onsets(t, stimuli, n_pulses=2), (0.05, 0.1), atol=1e-4
+    )
+    with pytest.raises(ValueError, match="expecting 4 pulses"):
+        detect_onsets(t, stimuli, n_pulses=4)
+
+
+def test_split_pulses(paired):
+    t, _, y = paired
+    t_, y_ = split_pulses(t, y, ONSETS)
+    # inclusive window over the inter-pulse interval
+    assert t_.shape == (501,)
+    assert y_.shape == (8, 2, 501)
+    assert t_[0] == 0
+    assert t_[-1] == pytest.approx(0.05, abs=1e-6)
+
+    _, y_ = split_pulses(t, y, ONSETS, width=0.02)
+    assert y_.shape == (8, 2, 201)
+
+    with pytest.raises(ValueError, match="exceeds the recording"):
+        split_pulses(t, y, ONSETS, width=0.2)
+
+
+def test_pulse_train_ratio(paired):
+    t, stimuli, y = paired
+    train = pulse_train(t, y, detect_onsets(t, stimuli))
+    assert isinstance(train, PulseTrain)
+    assert train.n_pulses == 2
+    assert train.amplitude.shape == (8, 2)
+    assert train.valid.all()
+
+    ratio, mask = train.ratio()
+    assert mask.all()
+    np.testing.assert_array_equal(ratio[:, 0], 1.0)
+    assert np.mean(ratio[:, 1]) == pytest.approx(1.2, rel=0.05)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from neubio.viz import TraceCanvas, density_image, frame_heatmap
+
+# 0.2 s at 10 kHz over 20 columns of 10 rows, 100 samples per column
+T = np.arange(2000) / 10e3
+XLIM, YLIM = (0.0, T[-1]), (0.0, 1.0)
+WIDTH, HEIGHT = 20, 10
+
+
+def test_density_shape():
+    y = np.full((3, len(T)), 0.55)
+    image, extent = density_image(
+        T, y, width=WIDTH, height=HEIGHT, xlim=XLIM, ylim=YLIM
+    )
+    assert image.shape == (HEIGHT, WIDTH)
+    assert extent == XLIM + YLIM
+    # one pixel per column and trace, on row floor(0.55 * 10)
+    np.testing.assert_array_equal(image[5], 3)
+    assert image.sum() == 3 * WIDTH
+
+
+def test_density_step():
+    # the column of the step spans rows 1 to 8, other columns a single row
+    y = np.where(T < 0.1, 0.15, 0.85)
+    image, _ = density_image(T, y, width=WIDTH, height=HEIGHT, xlim=XLIM, ylim=YLIM)
+    assert image.sum() == (WIDTH - 1) + 8
+    column = image[:, np.argmax(image.sum(axis=0))]
+    np.testing.assert_array_equal(np.flatnonzero(column), np.arange(1, 9))
+
+
+def test_density_clipping():
+    # values out of ylim land on the edge rows
+    y = np.stack([np.full(len(T), 5.0), np.full(len(T), -5.0)])
+    image, _ = density_image(T, y, width=WIDTH, height=HEIGHT, xlim=XLIM, ylim=YLIM)
+    np.testing.assert_array_equal(image[-1], 1)
+    np.testing.assert_array_equal(image[0], 1)
+    assert image.sum() == 2 * WIDTH
+
+    # samples out of xlim are left out
+    y = np.where(T < 0.1, 0.55, 0.95)
+    image, extent = density_image(
+        T, y, width=WIDTH, height=HEIGHT, xlim=(0.0, 0.09), ylim=YLIM
+    )
+    assert extent[:2] == (0.0, 0.09)
+    np.testing.assert_array_equal(image[5], 1)
+    assert image.sum() == WIDTH
+
+
+def test_canvas_accumulates():
+    canvas = TraceCanvas(width=WIDTH, height=HEIGHT, xlim=XLIM, ylim=YLIM)
+    canvas.add(T, np.full(len(T), 0.55))
+    canvas.add(T, np.full((2, len(T)), 0.55))
+    assert canvas.n == 3
+    np.testing.assert_array_equal(canvas.image[5], 3)
+
+
+def test_heatmap_bins():
+    t = np.arange(10) * 0.1
+    y = np.stack([np.arange(10.0), -np.arange(10.0)])
+    t_, image = frame_heatmap(t, y, width=3)
+    # bins of 3, 3 and 4 samples
+    np.testing.assert_allclose(t_, [0.0, 0.3, 0.6])
+    np.testing.assert_allclose(image, [[1.0, 4.0, 7.5], [-1.0, -4.0, -7.5]])
+
+
+def test_heatmap_short_frames():
+    t = np.arange(10) * 0.1
+    y = np.ones((2, 10))
+    t_, image = frame_heatmap(t, y, width=10)
+    np.testing.assert_array_equal(t_, t)
+    assert image is y
+
+
+def test_plot(npy_store):
+    pytest.importorskip("matplotlib")
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    from neubio.viz import overview, plot_density, plot_heatmap
+
+    y = np.full((3, len(T)), 0.55)
+    canvas = TraceCanvas(width=WIDTH, height=HEIGHT, xlim=XLIM, ylim=YLIM)
+    canvas.add(T, y)
+    fig, (ax0, ax1) = plt.subplots(2, 1)
+    assert plot_density(ax0, canvas).get_extent() == list(canvas.extent)
+    t_, image = frame_heatmap(T, y, width=WIDTH)
+    assert plot_heatmap(ax1, t_, image).get_array().shape == (3, WIDTH)
+    plt.close(fig)
+
+    fig = overview(npy_store, crop=(0.1, 0.15))
+    assert len(fig.axes) == 4
+    plt.close(fig)